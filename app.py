@@ -1,39 +1,17 @@
 import os
+import json
+import time
 import logging
 import sys
-import uuid
-import shutil
-from flask import Flask, render_template, request, send_file, redirect, url_for, jsonify, session
+from flask import Flask, Response, render_template, request, send_file, redirect, url_for, jsonify, session
 from werkzeug.utils import secure_filename
-import threading
-import time
 import atexit
 
-from tools.merge_pdf import merge_pdfs
-from tools.split_pdf import split_pdf
-from tools.compress_pdf import compress_pdf
-from tools.rotate_pdf import rotate_pdf
-from tools.crop_pdf import crop_pdf
-from tools.remove_pages import remove_pages
-from tools.organize_pdf import organize_pdf
-from tools.pdf_to_jpg import pdf_to_jpg
-from tools.jpg_to_pdf import jpg_to_pdf
-from tools.pdf_to_word import pdf_to_word
-from tools.word_to_pdf import word_to_pdf
-from tools.excel_to_pdf import excel_to_pdf
-from tools.pptx_to_pdf import pptx_to_pdf
-from tools.extract_pdf import extract_text, extract_images
-from tools.ocr_pdf import ocr_pdf
-from tools.unlock_pdf import unlock_pdf
-from tools.protect_pdf import protect_pdf
-from tools.sign_pdf import sign_pdf
-from tools.watermark_pdf import watermark_pdf
-from tools.edit_pdf import edit_pdf, extract_text_blocks
-from tools.pdf_to_excel import pdf_to_excel
-from tools.pdf_to_powerpoint import pdf_to_powerpoint
 from content.tool_articles import get_article
-
-import tempfile
+from services.storage import BASE_TEMP_DIR, UPLOAD_FOLDER, PROCESSED_FOLDER, DIAGNOSTICS_FOLDER, generate_unique_filename, save_stream
+from services.processing import SUPPORTED_TOOLS
+from services import jobs, expiry, result_cache, uploads, zipstream, static_assets, metrics, profiling, thumbnails
+from services.page_cache import cached_page
 
 
 # Configure logging
@@ -49,200 +27,163 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 1000 * 1024 * 1024  # 500MB limit
 app.secret_key = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
+static_assets.init_app(app)
 
-# Use system temp directory
-BASE_TEMP_DIR = os.path.join(tempfile.gettempdir(), 'pdf-forge')
-UPLOAD_FOLDER = os.path.join(BASE_TEMP_DIR, 'uploads')
-PROCESSED_FOLDER = os.path.join(BASE_TEMP_DIR, 'processed')
 ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png', 'docx', 'xlsx', 'pptx'}
 
-# Ensure directories exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(PROCESSED_FOLDER, exist_ok=True)
-
 def allowed_file(filename, extensions=None):
     if extensions is None:
         extensions = ALLOWED_EXTENSIONS
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in extensions
 
-def generate_unique_filename(original_filename):
-    ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
-    unique_id = str(uuid.uuid4())[:8]
-    base_name = secure_filename(original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename)
-    return f"{base_name}_{unique_id}.{ext}" if ext else f"{base_name}_{unique_id}"
-
 def cleanup_file(filepath, delay=300):
-    def delete_after_delay():
-        time.sleep(delay)
-        try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        except Exception as e:
-            logger.error(f"Error cleaning up {filepath}: {e}")
-    thread = threading.Thread(target=delete_after_delay)
-    thread.daemon = True
-    thread.start()
+    expiry.register(filepath, delay)
 
 def cleanup_folder(folderpath, delay=300):
-    def delete_after_delay():
-        time.sleep(delay)
-        try:
-            if os.path.exists(folderpath):
-                shutil.rmtree(folderpath)
-        except Exception as e:
-            logger.error(f"Error cleaning up {folderpath}: {e}")
-    thread = threading.Thread(target=delete_after_delay)
-    thread.daemon = True
-    thread.start()
+    expiry.register(folderpath, delay)
 
 FILE_MAX_AGE_SECONDS = 1800
-CLEANUP_INTERVAL_SECONDS = 300
-cleanup_thread_running = True
 
-def auto_cleanup_old_files():
-    while cleanup_thread_running:
-        try:
-            current_time = time.time()
-            for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER]:
-                if not os.path.exists(folder):
-                    continue
-                for item in os.listdir(folder):
-                    item_path = os.path.join(folder, item)
-                    try:
-                        if os.path.isfile(item_path):
-                            file_age = current_time - os.path.getmtime(item_path)
-                            if file_age > FILE_MAX_AGE_SECONDS:
-                                os.remove(item_path)
-                                logger.info(f"Auto-deleted old file: {item_path}")
-                        elif os.path.isdir(item_path):
-                            folder_age = current_time - os.path.getmtime(item_path)
-                            if folder_age > FILE_MAX_AGE_SECONDS:
-                                shutil.rmtree(item_path)
-                                logger.info(f"Auto-deleted old folder: {item_path}")
-                    except Exception as e:
-                        logger.error(f"Error deleting {item_path}: {e}")
-        except Exception as e:
-            logger.error(f"Error in auto cleanup: {e}")
-        time.sleep(CLEANUP_INTERVAL_SECONDS)
-
-def start_cleanup_scheduler():
-    cleanup_thread = threading.Thread(target=auto_cleanup_old_files, daemon=True)
-    cleanup_thread.start()
-    logger.info(f"Background cleanup scheduler started (deletes files older than {FILE_MAX_AGE_SECONDS // 60} minutes)")
-
-def stop_cleanup_scheduler():
-    global cleanup_thread_running
-    cleanup_thread_running = False
-
-start_cleanup_scheduler()
-atexit.register(stop_cleanup_scheduler)
+def housekeeping():
+    jobs.purge_old_jobs(FILE_MAX_AGE_SECONDS)
+    result_cache.purge_input_hashes()
+    uploads.purge_stale_uploads()
+
+expiry.start_reaper(housekeeping)
+atexit.register(expiry.stop_reaper)
+atexit.register(jobs.shutdown_executor)
+
+ALL_TOOLS = [
+    {'name': 'Merge PDF', 'icon': 'merge', 'description': 'Combine multiple PDFs into one', 'url': '/tool/merge', 'color': '#e74c3c'},
+    {'name': 'Split PDF', 'icon': 'split', 'description': 'Separate PDF pages', 'url': '/tool/split', 'color': '#3498db'},
+    {'name': 'Compress PDF', 'icon': 'compress', 'description': 'Reduce PDF file size', 'url': '/tool/compress', 'color': '#2ecc71'},
+    {'name': 'Rotate PDF', 'icon': 'rotate', 'description': 'Rotate PDF pages', 'url': '/tool/rotate', 'color': '#9b59b6'},
+    {'name': 'Crop PDF', 'icon': 'crop', 'description': 'Crop PDF page margins', 'url': '/tool/crop', 'color': '#f39c12'},
+    {'name': 'Remove Pages', 'icon': 'remove', 'description': 'Delete pages from PDF', 'url': '/tool/remove-pages', 'color': '#e67e22'},
+    {'name': 'Organize PDF', 'icon': 'organize', 'description': 'Reorder PDF pages', 'url': '/tool/organize', 'color': '#1abc9c'},
+    {'name': 'PDF to JPG', 'icon': 'image', 'description': 'Convert PDF to images', 'url': '/tool/pdf-to-jpg', 'color': '#e91e63'},
+    {'name': 'JPG to PDF', 'icon': 'pdf', 'description': 'Convert images to PDF', 'url': '/tool/jpg-to-pdf', 'color': '#673ab7'},
+    {'name': 'PDF to Word', 'icon': 'word', 'description': 'Extract PDF text to DOCX', 'url': '/tool/pdf-to-word', 'color': '#2196f3'},
+    {'name': 'Word to PDF', 'icon': 'word-pdf', 'description': 'Convert Word text to PDF', 'url': '/tool/word-to-pdf', 'color': '#00bcd4'},
+    {'name': 'Excel to PDF', 'icon': 'excel', 'description': 'Convert Excel data to PDF', 'url': '/tool/excel-to-pdf', 'color': '#4caf50'},
+    {'name': 'PowerPoint to PDF', 'icon': 'pptx', 'description': 'Convert slides text to PDF', 'url': '/tool/pptx-to-pdf', 'color': '#ff5722'},
+    {'name': 'Extract Content', 'icon': 'extract', 'description': 'Extract text & images', 'url': '/tool/extract', 'color': '#795548'},
+    {'name': 'OCR PDF', 'icon': 'ocr', 'description': 'Extract text from scans', 'url': '/tool/ocr', 'color': '#607d8b'},
+    {'name': 'Unlock PDF', 'icon': 'unlock', 'description': 'Remove PDF password', 'url': '/tool/unlock', 'color': '#ff9800'},
+    {'name': 'Protect PDF', 'icon': 'lock', 'description': 'Add password to PDF', 'url': '/tool/protect', 'color': '#f44336'},
+    {'name': 'Sign PDF', 'icon': 'sign', 'description': 'Add signature to PDF', 'url': '/tool/sign', 'color': '#3f51b5'},
+    {'name': 'Watermark PDF', 'icon': 'watermark', 'description': 'Add watermark to PDF', 'url': '/tool/watermark', 'color': '#009688'},
+    {'name': 'Edit PDF', 'icon': 'edit', 'description': 'Add text & images', 'url': '/tool/edit', 'color': '#8bc34a'},
+    {'name': 'PDF to Excel', 'icon': 'excel', 'description': 'Convert PDF to Excel', 'url': '/tool/pdf-to-excel', 'color': '#2e7d32'},
+    {'name': 'PDF to PowerPoint', 'icon': 'pptx', 'description': 'Convert PDF to PPTX', 'url': '/tool/pdf-to-powerpoint', 'color': '#d84315'},
+]
+
+POPULAR_TOOL_NAMES = ['Merge PDF', 'Compress PDF', 'Split PDF', 'Edit PDF', 'PDF to JPG', 'JPG to PDF']
+POPULAR_TOOLS = sorted(
+    [t for t in ALL_TOOLS if t['name'] in POPULAR_TOOL_NAMES],
+    key=lambda x: POPULAR_TOOL_NAMES.index(x['name'])
+)
+
+TOOL_INFO = {
+    'merge': {'title': 'Merge PDF', 'description': 'Combine multiple PDF files into a single document', 'accept': '.pdf', 'multiple': True, 'icon': 'merge', 'color': '#e74c3c'},
+    'split': {'title': 'Split PDF', 'description': 'Separate a PDF into individual pages or custom ranges', 'accept': '.pdf', 'multiple': False, 'icon': 'split', 'color': '#3498db'},
+    'compress': {'title': 'Compress PDF', 'description': 'Reduce the file size of your PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'compress', 'color': '#2ecc71'},
+    'rotate': {'title': 'Rotate PDF', 'description': 'Rotate PDF pages to any angle', 'accept': '.pdf', 'multiple': False, 'icon': 'rotate', 'color': '#9b59b6'},
+    'crop': {'title': 'Crop PDF', 'description': 'Remove margins from PDF pages', 'accept': '.pdf', 'multiple': False, 'icon': 'crop', 'color': '#f39c12'},
+    'remove-pages': {'title': 'Remove Pages', 'description': 'Delete specific pages from your PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'remove', 'color': '#e67e22'},
+    'organize': {'title': 'Organize PDF', 'description': 'Reorder pages in your PDF document', 'accept': '.pdf', 'multiple': False, 'icon': 'organize', 'color': '#1abc9c'},
+    'pdf-to-jpg': {'title': 'PDF to JPG', 'description': 'Convert PDF pages to JPG images', 'accept': '.pdf', 'multiple': False, 'icon': 'image', 'color': '#e91e63'},
+    'jpg-to-pdf': {'title': 'JPG to PDF', 'description': 'Convert JPG images to a PDF document', 'accept': '.jpg,.jpeg,.png', 'multiple': True, 'icon': 'pdf', 'color': '#673ab7'},
+    'pdf-to-word': {'title': 'PDF to Word', 'description': 'Extract text from PDF into an editable Word document. Best for text-heavy PDFs.', 'accept': '.pdf', 'multiple': False, 'icon': 'word', 'color': '#2196f3'},
+    'word-to-pdf': {'title': 'Word to PDF', 'description': 'Convert Word document text content to PDF format.', 'accept': '.docx', 'multiple': False, 'icon': 'word-pdf', 'color': '#00bcd4'},
+    'excel-to-pdf': {'title': 'Excel to PDF', 'description': 'Convert Excel spreadsheet data to PDF table format.', 'accept': '.xlsx', 'multiple': False, 'icon': 'excel', 'color': '#4caf50'},
+    'pptx-to-pdf': {'title': 'PowerPoint to PDF', 'description': 'Convert PowerPoint slide text content to PDF format.', 'accept': '.pptx', 'multiple': False, 'icon': 'pptx', 'color': '#ff5722'},
+    'extract': {'title': 'Extract Content', 'description': 'Extract text and images from PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'extract', 'color': '#795548'},
+    'ocr': {'title': 'OCR PDF', 'description': 'Extract text from scanned PDF using OCR', 'accept': '.pdf', 'multiple': False, 'icon': 'ocr', 'color': '#607d8b'},
+    'unlock': {'title': 'Unlock PDF', 'description': 'Remove password protection from PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'unlock', 'color': '#ff9800'},
+    'protect': {'title': 'Protect PDF', 'description': 'Add password protection to PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'lock', 'color': '#f44336'},
+    'sign': {'title': 'Sign PDF', 'description': 'Add your signature to PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'sign', 'color': '#3f51b5'},
+    'watermark': {'title': 'Watermark PDF', 'description': 'Add text or image watermark to PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'watermark', 'color': '#009688'},
+    'edit': {'title': 'Edit PDF', 'description': 'Add text and images to your PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'edit', 'color': '#8bc34a'},
+    'pdf-to-excel': {'title': 'PDF to Excel', 'description': 'Convert PDF tables and text to Excel spreadsheet.', 'accept': '.pdf', 'multiple': False, 'icon': 'excel', 'color': '#2e7d32'},
+    'pdf-to-powerpoint': {'title': 'PDF to PowerPoint', 'description': 'Convert PDF pages to PowerPoint slides.', 'accept': '.pdf', 'multiple': False, 'icon': 'pptx', 'color': '#d84315'},
+}
+
+# Tools with their own interactive page; the rest share tool.html
+TOOL_TEMPLATES = {
+    'split': 'tool_split.html',
+    'sign': 'tool_sign.html',
+    'edit': 'tool_edit.html',
+    'organize': 'tool_organize.html',
+    'merge': 'tool_merge.html',
+    'crop': 'tool_crop.html',
+    'rotate': 'tool_rotate.html',
+}
 
 @app.route('/all-tools')
 def all_tools_page():
-    return render_template('all_tools.html')
+    return cached_page('all-tools', lambda: render_template('all_tools.html'))
 
 @app.route('/about')
 def about_page():
-    return render_template('about.html')
+    return cached_page('about', lambda: render_template('about.html'))
 
 @app.route('/contact')
 def contact_page():
-    return render_template('contact.html')
+    return cached_page('contact', lambda: render_template('contact.html'))
 
 @app.route('/privacy')
 def privacy_page():
-    return render_template('privacy.html')
+    return cached_page('privacy', lambda: render_template('privacy.html'))
 
 @app.route('/')
 def index():
-    all_tools = [
-        {'name': 'Merge PDF', 'icon': 'merge', 'description': 'Combine multiple PDFs into one', 'url': '/tool/merge', 'color': '#e74c3c'},
-        {'name': 'Split PDF', 'icon': 'split', 'description': 'Separate PDF pages', 'url': '/tool/split', 'color': '#3498db'},
-        {'name': 'Compress PDF', 'icon': 'compress', 'description': 'Reduce PDF file size', 'url': '/tool/compress', 'color': '#2ecc71'},
-        {'name': 'Rotate PDF', 'icon': 'rotate', 'description': 'Rotate PDF pages', 'url': '/tool/rotate', 'color': '#9b59b6'},
-        {'name': 'Crop PDF', 'icon': 'crop', 'description': 'Crop PDF page margins', 'url': '/tool/crop', 'color': '#f39c12'},
-        {'name': 'Remove Pages', 'icon': 'remove', 'description': 'Delete pages from PDF', 'url': '/tool/remove-pages', 'color': '#e67e22'},
-        {'name': 'Organize PDF', 'icon': 'organize', 'description': 'Reorder PDF pages', 'url': '/tool/organize', 'color': '#1abc9c'},
-        {'name': 'PDF to JPG', 'icon': 'image', 'description': 'Convert PDF to images', 'url': '/tool/pdf-to-jpg', 'color': '#e91e63'},
-        {'name': 'JPG to PDF', 'icon': 'pdf', 'description': 'Convert images to PDF', 'url': '/tool/jpg-to-pdf', 'color': '#673ab7'},
-        {'name': 'PDF to Word', 'icon': 'word', 'description': 'Extract PDF text to DOCX', 'url': '/tool/pdf-to-word', 'color': '#2196f3'},
-        {'name': 'Word to PDF', 'icon': 'word-pdf', 'description': 'Convert Word text to PDF', 'url': '/tool/word-to-pdf', 'color': '#00bcd4'},
-        {'name': 'Excel to PDF', 'icon': 'excel', 'description': 'Convert Excel data to PDF', 'url': '/tool/excel-to-pdf', 'color': '#4caf50'},
-        {'name': 'PowerPoint to PDF', 'icon': 'pptx', 'description': 'Convert slides text to PDF', 'url': '/tool/pptx-to-pdf', 'color': '#ff5722'},
-        {'name': 'Extract Content', 'icon': 'extract', 'description': 'Extract text & images', 'url': '/tool/extract', 'color': '#795548'},
-        {'name': 'OCR PDF', 'icon': 'ocr', 'description': 'Extract text from scans', 'url': '/tool/ocr', 'color': '#607d8b'},
-        {'name': 'Unlock PDF', 'icon': 'unlock', 'description': 'Remove PDF password', 'url': '/tool/unlock', 'color': '#ff9800'},
-        {'name': 'Protect PDF', 'icon': 'lock', 'description': 'Add password to PDF', 'url': '/tool/protect', 'color': '#f44336'},
-        {'name': 'Sign PDF', 'icon': 'sign', 'description': 'Add signature to PDF', 'url': '/tool/sign', 'color': '#3f51b5'},
-        {'name': 'Watermark PDF', 'icon': 'watermark', 'description': 'Add watermark to PDF', 'url': '/tool/watermark', 'color': '#009688'},
-        {'name': 'Edit PDF', 'icon': 'edit', 'description': 'Add text & images', 'url': '/tool/edit', 'color': '#8bc34a'},
-        {'name': 'PDF to Excel', 'icon': 'excel', 'description': 'Convert PDF to Excel', 'url': '/tool/pdf-to-excel', 'color': '#2e7d32'},
-        {'name': 'PDF to PowerPoint', 'icon': 'pptx', 'description': 'Convert PDF to PPTX', 'url': '/tool/pdf-to-powerpoint', 'color': '#d84315'},
-    ]
-    popular_names = ['Merge PDF', 'Compress PDF', 'Split PDF', 'Edit PDF', 'PDF to JPG', 'JPG to PDF']
-    popular_tools = [t for t in all_tools if t['name'] in popular_names]
-    popular_tools.sort(key=lambda x: popular_names.index(x['name']))
-    return render_template('index.html', popular_tools=popular_tools, all_tools=all_tools)
+    return cached_page('index', lambda: render_template('index.html', popular_tools=POPULAR_TOOLS, all_tools=ALL_TOOLS))
 
 @app.route('/tool/<tool_name>')
 def tool_page(tool_name):
-    tool_info = {
-        'merge': {'title': 'Merge PDF', 'description': 'Combine multiple PDF files into a single document', 'accept': '.pdf', 'multiple': True, 'icon': 'merge', 'color': '#e74c3c'},
-        'split': {'title': 'Split PDF', 'description': 'Separate a PDF into individual pages or custom ranges', 'accept': '.pdf', 'multiple': False, 'icon': 'split', 'color': '#3498db'},
-        'compress': {'title': 'Compress PDF', 'description': 'Reduce the file size of your PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'compress', 'color': '#2ecc71'},
-        'rotate': {'title': 'Rotate PDF', 'description': 'Rotate PDF pages to any angle', 'accept': '.pdf', 'multiple': False, 'icon': 'rotate', 'color': '#9b59b6'},
-        'crop': {'title': 'Crop PDF', 'description': 'Remove margins from PDF pages', 'accept': '.pdf', 'multiple': False, 'icon': 'crop', 'color': '#f39c12'},
-        'remove-pages': {'title': 'Remove Pages', 'description': 'Delete specific pages from your PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'remove', 'color': '#e67e22'},
-        'organize': {'title': 'Organize PDF', 'description': 'Reorder pages in your PDF document', 'accept': '.pdf', 'multiple': False, 'icon': 'organize', 'color': '#1abc9c'},
-        'pdf-to-jpg': {'title': 'PDF to JPG', 'description': 'Convert PDF pages to JPG images', 'accept': '.pdf', 'multiple': False, 'icon': 'image', 'color': '#e91e63'},
-        'jpg-to-pdf': {'title': 'JPG to PDF', 'description': 'Convert JPG images to a PDF document', 'accept': '.jpg,.jpeg,.png', 'multiple': True, 'icon': 'pdf', 'color': '#673ab7'},
-        'pdf-to-word': {'title': 'PDF to Word', 'description': 'Extract text from PDF into an editable Word document. Best for text-heavy PDFs.', 'accept': '.pdf', 'multiple': False, 'icon': 'word', 'color': '#2196f3'},
-        'word-to-pdf': {'title': 'Word to PDF', 'description': 'Convert Word document text content to PDF format.', 'accept': '.docx', 'multiple': False, 'icon': 'word-pdf', 'color': '#00bcd4'},
-        'excel-to-pdf': {'title': 'Excel to PDF', 'description': 'Convert Excel spreadsheet data to PDF table format.', 'accept': '.xlsx', 'multiple': False, 'icon': 'excel', 'color': '#4caf50'},
-        'pptx-to-pdf': {'title': 'PowerPoint to PDF', 'description': 'Convert PowerPoint slide text content to PDF format.', 'accept': '.pptx', 'multiple': False, 'icon': 'pptx', 'color': '#ff5722'},
-        'extract': {'title': 'Extract Content', 'description': 'Extract text and images from PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'extract', 'color': '#795548'},
-        'ocr': {'title': 'OCR PDF', 'description': 'Extract text from scanned PDF using OCR', 'accept': '.pdf', 'multiple': False, 'icon': 'ocr', 'color': '#607d8b'},
-        'unlock': {'title': 'Unlock PDF', 'description': 'Remove password protection from PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'unlock', 'color': '#ff9800'},
-        'protect': {'title': 'Protect PDF', 'description': 'Add password protection to PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'lock', 'color': '#f44336'},
-        'sign': {'title': 'Sign PDF', 'description': 'Add your signature to PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'sign', 'color': '#3f51b5'},
-        'watermark': {'title': 'Watermark PDF', 'description': 'Add text or image watermark to PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'watermark', 'color': '#009688'},
-        'edit': {'title': 'Edit PDF', 'description': 'Add text and images to your PDF', 'accept': '.pdf', 'multiple': False, 'icon': 'edit', 'color': '#8bc34a'},
-        'pdf-to-excel': {'title': 'PDF to Excel', 'description': 'Convert PDF tables and text to Excel spreadsheet.', 'accept': '.pdf', 'multiple': False, 'icon': 'excel', 'color': '#2e7d32'},
-        'pdf-to-powerpoint': {'title': 'PDF to PowerPoint', 'description': 'Convert PDF pages to PowerPoint slides.', 'accept': '.pdf', 'multiple': False, 'icon': 'pptx', 'color': '#d84315'},
-    }
-    
-    if tool_name not in tool_info:
+    if tool_name not in TOOL_INFO:
         return redirect(url_for('index'))
-    
-    info = tool_info[tool_name]
-    article = get_article(tool_name)
-    
-    if tool_name == 'split':
-        return render_template('tool_split.html', tool_name=tool_name, article=article, **info)
-    elif tool_name == 'sign':
-        return render_template('tool_sign.html', tool_name=tool_name, article=article, **info)
-    elif tool_name == 'edit':
-        return render_template('tool_edit.html', tool_name=tool_name, article=article, **info)
-    elif tool_name == 'organize':
-        return render_template('tool_organize.html', tool_name=tool_name, article=article, **info)
-    elif tool_name == 'merge':
-        return render_template('tool_merge.html', tool_name=tool_name, article=article, **info)
-    elif tool_name == 'crop':
-        return render_template('tool_crop.html', tool_name=tool_name, article=article, **info)
-    elif tool_name == 'rotate':
-        return render_template('tool_rotate.html', tool_name=tool_name, article=article, **info)
-    
-    return render_template('tool.html', tool_name=tool_name, article=article, **info)
+
+    def render():
+        template = TOOL_TEMPLATES.get(tool_name, 'tool.html')
+        return render_template(template, tool_name=tool_name, article=get_article(tool_name), **TOOL_INFO[tool_name])
+
+    return cached_page(('tool', tool_name), render)
+
+def cleanup_result(result):
+    if result.get('output_path'):
+        cleanup_file(result['output_path'])
+    if result.get('output_folder'):
+        cleanup_folder(os.path.join(PROCESSED_FOLDER, result['output_folder']))
 
 @app.route('/process/<tool_name>', methods=['POST'])
 def process_tool(tool_name):
     try:
+        if tool_name not in SUPPORTED_TOOLS:
+            return jsonify({'error': 'Unknown tool'}), 400
+
+        # Turn the request away before its upload is read if the tool's class is backed up
+        retry_after = jobs.check_admission(tool_name)
+        if retry_after is not None:
+            response = jsonify({'error': 'Server is busy, please retry shortly', 'retry_after': retry_after})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+
         saved_files = []
+        uploaded_files = []
+        input_hashes = []
         if 'server_filename' in request.form:
             server_filename = request.form['server_filename']
             file_path = os.path.join(UPLOAD_FOLDER, secure_filename(server_filename))
             if os.path.exists(file_path):
                 saved_files.append(file_path)
+                input_hashes.append(result_cache.input_hash(file_path))
+                # An earlier upload only has the default TTL left, which a job
+                # waiting in a busy queue can outlast: hold it for as long as a
+                # job can be around, and let on_done expire it like any input
+                cleanup_file(file_path, delay=jobs.JOB_MAX_AGE_SECONDS)
+                uploaded_files.append(file_path)
             else:
                  return jsonify({'error': 'File not found or expired'}), 404
         elif 'file' in request.files or 'files' in request.files:
@@ -254,219 +195,109 @@ def process_tool(tool_name):
                 if f and f.filename:
                     filename = generate_unique_filename(f.filename)
                     filepath = os.path.join(UPLOAD_FOLDER, filename)
-                    f.save(filepath)
+                    input_hashes.append(save_stream(f.stream, filepath))
                     saved_files.append(filepath)
-                    cleanup_file(filepath)
+                    uploaded_files.append(filepath)
         else:
              return jsonify({'error': 'No file uploaded'}), 400
 
         if not saved_files:
             return jsonify({'error': 'No valid files uploaded'}), 400
-        
-        result = None
-        output_filename = None
-        
-        if tool_name == 'merge':
-            output_filename = 'merged.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = merge_pdfs(saved_files, output_path)
-        
-        elif tool_name == 'split':
-            split_type = request.form.get('split_type', 'all')
-            pages = request.form.get('pages', '')
-            output_folder = os.path.join(PROCESSED_FOLDER, str(uuid.uuid4())[:8])
-            os.makedirs(output_folder, exist_ok=True)
-            result = split_pdf(saved_files[0], output_folder, split_type, pages)
-            cleanup_folder(output_folder)
-        
-        elif tool_name == 'compress':
-            quality = request.form.get('quality', 'medium')
-            output_filename = 'compressed.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = compress_pdf(saved_files[0], output_path, quality)
-        
-        elif tool_name == 'rotate':
-            import json
-            rotations_json = request.form.get('rotations', '')
-            angle = int(request.form.get('angle', 90))
-            pages = request.form.get('pages', 'all')
-            output_filename = 'rotated.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            rotations = None
-            if rotations_json:
-                try:
-                    rotations = json.loads(rotations_json)
-                except:
-                    rotations = None
-            result = rotate_pdf(saved_files[0], output_path, angle, pages, rotations)
-        
-        elif tool_name == 'crop':
-            margins = {
-                'top': float(request.form.get('top', 0)),
-                'bottom': float(request.form.get('bottom', 0)),
-                'left': float(request.form.get('left', 0)),
-                'right': float(request.form.get('right', 0))
-            }
-            pages = request.form.get('pages', 'all')
-            current_page = int(request.form.get('current_page', 1))
-            output_filename = 'cropped.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = crop_pdf(saved_files[0], output_path, margins, pages, current_page)
-        
-        elif tool_name == 'remove-pages':
-            pages = request.form.get('pages', '')
-            output_filename = 'pages_removed.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = remove_pages(saved_files[0], output_path, pages)
-        
-        elif tool_name == 'organize':
-            order = request.form.get('order', '')
-            output_filename = 'organized.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = organize_pdf(saved_files[0], output_path, order)
-        
-        elif tool_name == 'pdf-to-jpg':
-            dpi = int(request.form.get('dpi', 150))
-            output_folder = os.path.join(PROCESSED_FOLDER, str(uuid.uuid4())[:8])
-            os.makedirs(output_folder, exist_ok=True)
-            result = pdf_to_jpg(saved_files[0], output_folder, dpi)
-            if result.get('success') and not result.get('is_folder'):
-                unique_jpg_name = generate_unique_filename('converted.jpg')
-                new_path = os.path.join(PROCESSED_FOLDER, unique_jpg_name)
-                shutil.move(result['output_path'], new_path)
-                shutil.rmtree(output_folder, ignore_errors=True)
-                result['filename'] = unique_jpg_name
-                result['output_path'] = new_path
-                cleanup_file(new_path)
-            else:
-                cleanup_folder(output_folder)
-        
-        elif tool_name == 'jpg-to-pdf':
-            output_filename = 'images.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = jpg_to_pdf(saved_files, output_path)
-        
-        elif tool_name == 'pdf-to-word':
-            output_filename = 'document.docx'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = pdf_to_word(saved_files[0], output_path)
-        
-        elif tool_name == 'word-to-pdf':
-            output_filename = 'document.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = word_to_pdf(saved_files[0], output_path)
-        
-        elif tool_name == 'excel-to-pdf':
-            output_filename = 'spreadsheet.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = excel_to_pdf(saved_files[0], output_path)
-        
-        elif tool_name == 'pptx-to-pdf':
-            output_filename = 'presentation.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = pptx_to_pdf(saved_files[0], output_path)
-        
-        elif tool_name == 'extract':
-            extract_type = request.form.get('extract_type', 'text')
-            output_folder = os.path.join(PROCESSED_FOLDER, str(uuid.uuid4())[:8])
-            os.makedirs(output_folder, exist_ok=True)
-            if extract_type == 'text':
-                result = extract_text(saved_files[0], output_folder)
-            else:
-                result = extract_images(saved_files[0], output_folder)
-            cleanup_folder(output_folder)
-        
-        elif tool_name == 'ocr':
-            language = request.form.get('language', 'eng')
-            output_filename = 'ocr_result.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = ocr_pdf(saved_files[0], output_path, language)
-        
-        elif tool_name == 'unlock':
-            password = request.form.get('password', '')
-            output_filename = 'unlocked.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = unlock_pdf(saved_files[0], output_path, password)
-        
-        elif tool_name == 'protect':
-            password = request.form.get('password', '')
-            output_filename = 'protected.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = protect_pdf(saved_files[0], output_path, password)
-        
-        elif tool_name == 'sign':
-            signature_data = request.form.get('signature', '')
-            position = {
-                'x': float(request.form.get('x', 100)),
-                'y': float(request.form.get('y', 100)),
-                'width': float(request.form.get('width', 200)),
-                'height': float(request.form.get('height', 80)),
-                'page': int(request.form.get('page', 1))
-            }
-            output_filename = 'signed.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = sign_pdf(saved_files[0], output_path, signature_data, position)
-        
-        elif tool_name == 'watermark':
-            watermark_text = request.form.get('text', 'WATERMARK')
-            opacity = float(request.form.get('opacity', 0.3))
-            output_filename = 'watermarked.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = watermark_pdf(saved_files[0], output_path, watermark_text, opacity)
-        
-        elif tool_name == 'edit':
-            import json
-            edits_json = request.form.get('edits', '[]')
-            try:
-                edits = json.loads(edits_json)
-            except:
-                edits = []
-            output_filename = 'edited.pdf'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = edit_pdf(saved_files[0], output_path, edits)
-        
-        elif tool_name == 'pdf-to-excel':
-            output_filename = 'converted.xlsx'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = pdf_to_excel(saved_files[0], output_path)
-
-        elif tool_name == 'pdf-to-powerpoint':
-            output_filename = 'converted.pptx'
-            output_path = os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
-            result = pdf_to_powerpoint(saved_files[0], output_path)
-        
-        else:
-            return jsonify({'error': 'Unknown tool'}), 400
-        
-        if result and result.get('success'):
-            if 'output_path' in result:
-                # Ensure the filename sent to frontend is just the basename
-                filename = os.path.basename(result['output_path'])
-                result['filename'] = filename
-                cleanup_file(result['output_path'])
-            
-            if 'files' in result and isinstance(result['files'], list):
-                # Ensure all files in the list are just basenames or relative to their specific structures
-                # For split PDF, they are in a subfolder, so we need the relative path from PROCESSED_FOLDER
-                normalized_files = []
-                for f in result['files']:
-                    # Extract the part of the path relative to PROCESSED_FOLDER
-                    # If f is /tmp/pdf-forge/processed/xyz/page_1.pdf and PROCESSED_FOLDER is /tmp/pdf-forge/processed
-                    # we want xyz/page_1.pdf
-                    try:
-                        rel_path = os.path.relpath(f, PROCESSED_FOLDER)
-                        normalized_files.append(rel_path)
-                    except ValueError:
-                        normalized_files.append(os.path.basename(f))
-                result['files'] = normalized_files
-                
-            return jsonify(result)
-        else:
-            return jsonify({'error': result.get('error', 'Processing failed')}), 500
+
+        params = request.form.to_dict()
+        profile = profiling.should_profile(request.headers)
+        cache_key = result_cache.make_key(tool_name, input_hashes, params)
+        # A profiled request has to actually run the tool
+        cached = None if profile else result_cache.lookup(cache_key)
+        if cached:
+            metrics.inc('pdf_forge_cache_hits_total', tool=tool_name)
+            for filepath in uploaded_files:
+                cleanup_file(filepath)
+            cleanup_result(cached)
+            job_id = jobs.record_finished_job(tool_name, cached)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'state': jobs.DONE,
+                'status_url': url_for('job_status', job_id=job_id),
+                'result': cached
+            })
+
+        submitted_at = time.monotonic()
+
+        def on_done(result):
+            metrics.observe('pdf_forge_job_latency_seconds', time.monotonic() - submitted_at, tool=tool_name)
+            # Inputs are kept until the job has finished, however long it queued
+            for filepath in uploaded_files:
+                cleanup_file(filepath)
+            if result.get('success'):
+                result_cache.store(cache_key, tool_name, result)
+                cleanup_result(result)
+
+        job_id = jobs.submit_job(tool_name, saved_files, params, on_done=on_done, profile=profile)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'state': jobs.QUEUED,
+            'status_url': url_for('job_status', job_id=job_id)
+        }), 202
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/pipeline', methods=['POST'])
+def process_pipeline():
+    """Run several page tools on one document; `steps` is a JSON list (see tools/pipeline.py)."""
+    return process_tool('pipeline')
+
+@app.after_request
+def record_tool_request(response):
+    if request.endpoint in ('process_tool', 'process_pipeline'):
+        tool_name = request.view_args.get('tool_name', 'pipeline')
+        metrics.record_request(tool_name if tool_name in SUPPORTED_TOOLS else 'unknown', response.status_code)
+    return response
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    """
+    The job's output as a ZIP, started while the job is still running for
+    tools that report which files they write (see tools/progress.py).
+    """
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    result = job['result'] or {}
+    if job['state'] == jobs.DONE and result.get('is_folder'):
+        return redirect(url_for('download_folder', folder_id=result['output_folder']))
+    if job['state'] == jobs.DONE and result.get('filename'):
+        return redirect(url_for('download_file', filename=result['filename']))
+    if job['state'] == jobs.FAILED:
+        return jsonify({'error': job['error'] or 'Processing failed'}), 404
+    job_progress = job['progress'] or {}
+    if not job_progress.get('output_folder') or not job_progress.get('filename'):
+        return jsonify({'error': 'Job output is not available yet'}), 409
+
+    folder_id = secure_filename(job_progress['output_folder'])
+    names = [job_progress['filename'].format(n) for n in range(1, job_progress['total'] + 1)]
+
+    def is_finished():
+        job = jobs.get_job(job_id)
+        return job is None or job['state'] in (jobs.DONE, jobs.FAILED)
+
+    response = Response(
+        zipstream.stream_zip(zipstream.follow_members(os.path.join(PROCESSED_FOLDER, folder_id), names, is_finished)),
+        mimetype='application/zip'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{folder_id}.zip"'
+    return response
+
 @app.route('/download/<path:filename>')
 def download_file(filename):
     filepath = os.path.join(PROCESSED_FOLDER, filename)
@@ -476,14 +307,31 @@ def download_file(filename):
 
 @app.route('/download-folder/<folder_id>')
 def download_folder(folder_id):
+    folder_id = secure_filename(folder_id)
     folder_path = os.path.join(PROCESSED_FOLDER, folder_id)
-    if os.path.exists(folder_path):
-        zip_path = os.path.join(PROCESSED_FOLDER, f"{folder_id}.zip")
-        shutil.make_archive(zip_path.replace('.zip', ''), 'zip', folder_path)
-        cleanup_file(zip_path)
+    zip_path = os.path.join(PROCESSED_FOLDER, f"{folder_id}.zip")
+    if os.path.exists(zip_path):
         return send_file(zip_path, as_attachment=True)
+    if os.path.isdir(folder_path):
+        # Stream members as they are read; the finished archive is kept for repeat downloads
+        response = Response(
+            zipstream.stream_zip(zipstream.folder_members(folder_path), zip_path, on_complete=cleanup_file),
+            mimetype='application/zip'
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename="{folder_id}.zip"'
+        return response
     return jsonify({'error': 'Folder not found'}), 404
 
+@app.route('/diagnostics/<filename>')
+def download_diagnostics(filename):
+    # Without a configured admin token (sampling only) nobody may read them
+    if not profiling.is_admin(request.headers.get(profiling.PROFILE_HEADER) or request.args.get('token')):
+        return jsonify({'error': 'File not found'}), 404
+    filepath = os.path.join(DIAGNOSTICS_FOLDER, secure_filename(filename))
+    if os.path.exists(filepath):
+        return send_file(filepath, as_attachment=filename.endswith('.prof'))
+    return jsonify({'error': 'File not found'}), 404
+
 @app.route('/api/extract-text-blocks', methods=['POST'])
 def api_extract_text_blocks():
     try:
@@ -499,11 +347,119 @@ def api_extract_text_blocks():
         file.save(filepath)
         cleanup_file(filepath)
         
+        # Imported here so the web worker only loads PyMuPDF when the editor needs it
+        from tools.edit_pdf import extract_text_blocks
         result = extract_text_blocks(filepath)
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/compress-estimate', methods=['POST'])
+def api_compress_estimate():
+    try:
+        uploaded_name = None
+        if 'server_filename' in request.form:
+            filepath = os.path.join(UPLOAD_FOLDER, secure_filename(request.form['server_filename']))
+            if not os.path.exists(filepath):
+                return jsonify({'error': 'File not found or expired'}), 404
+        elif 'file' in request.files and request.files['file'].filename:
+            file = request.files['file']
+            uploaded_name = generate_unique_filename(file.filename)
+            filepath = os.path.join(UPLOAD_FOLDER, uploaded_name)
+            result_cache.remember_hash(filepath, save_stream(file.stream, filepath))
+            cleanup_file(filepath)
+        else:
+            return jsonify({'error': 'No file uploaded'}), 400
+
+        # Imported here so the web worker only loads PyMuPDF when asked for an estimate
+        from tools.compress_pdf import estimate_compression
+        result = estimate_compression(filepath)
+        if not result.get('success'):
+            return jsonify(result), 400
+        if uploaded_name:
+            # Lets the compress job reuse this upload as its server_filename
+            result['server_filename'] = uploaded_name
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def thumbnail_source(server_filename):
+    filepath = os.path.join(UPLOAD_FOLDER, secure_filename(server_filename))
+    if not os.path.exists(filepath):
+        return None
+    # Keep the upload while its pages are being looked through
+    cleanup_file(filepath)
+    return filepath
+
+def thumbnails_busy():
+    retry_after = thumbnails.RENDER_RETRY_AFTER_SECONDS
+    response = jsonify({'error': 'Server is busy, please retry shortly', 'retry_after': retry_after})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+@app.route('/api/thumbnails/<server_filename>')
+def api_thumbnail_info(server_filename):
+    try:
+        filepath = thumbnail_source(server_filename)
+        if filepath is None:
+            return jsonify({'error': 'File not found or expired'}), 404
+        result = thumbnails.document_info(filepath)
+        if not result.get('success'):
+            return jsonify(result), 400
+        result['widths'] = thumbnails.THUMBNAIL_WIDTHS
+        result['sprite_max_pages'] = thumbnails.SPRITE_MAX_PAGES
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/thumbnails/<server_filename>/<int:page>')
+def api_page_thumbnail(server_filename, page):
+    try:
+        filepath = thumbnail_source(server_filename)
+        if filepath is None:
+            return jsonify({'error': 'File not found or expired'}), 404
+        width = request.args.get('width', 150, type=int)
+        path = thumbnails.page_thumbnail(filepath, result_cache.input_hash(filepath), page, width)
+        return send_file(path, mimetype='image/jpeg', max_age=expiry.DEFAULT_TTL_SECONDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except thumbnails.Busy:
+        return thumbnails_busy()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/thumbnails/<server_filename>/sprite')
+def api_thumbnail_sprite(server_filename):
+    """Pages `first` to `last` on one image; X-Sprite-Frames has each page's [x, y, width, height]."""
+    try:
+        filepath = thumbnail_source(server_filename)
+        if filepath is None:
+            return jsonify({'error': 'File not found or expired'}), 404
+        first = request.args.get('first', 1, type=int)
+        last = request.args.get('last', first + thumbnails.SPRITE_MAX_PAGES - 1, type=int)
+        width = request.args.get('width', 150, type=int)
+        path, frames = thumbnails.sprite_sheet(filepath, result_cache.input_hash(filepath), first, last, width)
+        response = send_file(path, mimetype='image/jpeg', max_age=expiry.DEFAULT_TTL_SECONDS)
+        response.headers['X-Sprite-Frames'] = json.dumps(frames)
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except thumbnails.Busy:
+        return thumbnails_busy()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/storage-stats')
+def api_storage_stats():
+    stats = expiry.stats()
+    stats['result_cache'] = result_cache.stats()
+    stats['thumbnails'] = thumbnails.stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(jobs.count_by_state(), jobs.class_usage(), expiry.stats()), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/upload', methods=['POST'])
 def api_upload():
     try:
@@ -515,7 +471,7 @@ def api_upload():
         
         filename = generate_unique_filename(file.filename)
         filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        result_cache.remember_hash(filepath, save_stream(file.stream, filepath))
         cleanup_file(filepath)
         
         return jsonify({
@@ -526,5 +482,58 @@ def api_upload():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def upload_response(result):
+    status = result.pop('status', 200 if result.get('success') else 400)
+    return jsonify(result), status
+
+@app.route('/api/upload/init', methods=['POST'])
+def api_upload_init():
+    try:
+        data = request.get_json(silent=True) or request.form
+        original_name = data.get('filename', '')
+        if not original_name:
+            return jsonify({'error': 'No filename given'}), 400
+        if not allowed_file(original_name):
+            return jsonify({'error': 'File type not allowed'}), 400
+        try:
+            size = int(data.get('size', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid upload size'}), 400
+        if size > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': 'File too large'}), 413
+        return upload_response(uploads.init_upload(original_name, size))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/upload/<upload_id>', methods=['GET'])
+def api_upload_status(upload_id):
+    upload = uploads.get_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found or expired'}), 404
+    return jsonify({'success': True, 'upload_id': upload_id, 'offset': upload['offset'], 'size': upload['size']})
+
+@app.route('/api/upload/<upload_id>', methods=['PUT'])
+def api_upload_chunk(upload_id):
+    try:
+        offset = int(request.args.get('offset', -1))
+        length = request.content_length
+        if offset < 0 or length is None:
+            return jsonify({'error': 'Offset and Content-Length are required'}), 400
+        return upload_response(uploads.write_chunk(upload_id, offset, request.stream, length))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/upload/<upload_id>/finalize', methods=['POST'])
+def api_upload_finalize(upload_id):
+    try:
+        result = uploads.finalize_upload(upload_id)
+        if result.get('success'):
+            filepath = result.pop('path')
+            result_cache.remember_hash(filepath, result['sha256'])
+            cleanup_file(filepath)
+        return upload_response(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=False)
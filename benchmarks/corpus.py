@@ -0,0 +1,314 @@
+"""
+Generate the synthetic documents the tool benchmarks run against.
+
+    python -m benchmarks.corpus [--scale small|full] [--out DIR] [--force]
+
+Every document is derived from a fixed seed, so two machines generating
+the same scale get the same content and their numbers can be compared.
+Existing files are kept unless --force is given or the spec changed.
+"""
+import io
+import os
+import json
+import random
+import argparse
+import tempfile
+
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), 'pdf-forge-bench', 'corpus')
+SEED = 20240601
+PASSWORD = 'benchmark'
+
+# Page counts of the plain text documents at each scale
+SCALES = {
+    'small': [1, 50, 500],
+    'full': [1, 50, 500, 5000],
+}
+
+IMAGE_PAGES = 20
+# Full-resolution phone/camera photos, one per page
+CAMERA_PAGES = 6
+CAMERA_PHOTO_SIZE = (6000, 4000)
+# Pages written one at a time and joined, each with its own copy of the logo
+REPORT_PAGES = 30
+SCANNED_PAGES = 10
+ENCRYPTED_PAGES = 50
+# Two A0 sheets side by side, the size of a large engineering drawing
+HUGE_PAGE_SIZE = (4768, 6741)
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud '
+    'exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure '
+    'in reprehenderit voluptate velit esse cillum eu fugiat nulla pariatur excepteur '
+    'sint occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim '
+    'id est laborum invoice total quarterly revenue shipment contract signature'
+).split()
+
+def _sentence(rng, words=12):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + '.'
+
+def _paragraph(rng, sentences=5):
+    return ' '.join(_sentence(rng, rng.randint(8, 16)) for _ in range(sentences))
+
+def _photo(rng, width, height):
+    """Noise blurred into soft blobs plus a gradient: compresses like a photograph."""
+    from PIL import Image, ImageFilter
+
+    small = (max(1, width // 16), max(1, height // 16))
+    noise = Image.frombytes('RGB', small, rng.randbytes(small[0] * small[1] * 3))
+    image = noise.resize((width, height), Image.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+    grain = Image.frombytes('L', (width, height), rng.randbytes(width * height)).convert('RGB')
+    return Image.blend(image, grain, 0.08)
+
+def _diagram(rng, width, height):
+    """Flat colours, lines and text: the kind of image PNG is meant for."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(20, width // 3), y0 + rng.randrange(20, height // 3)
+        colour = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle([x0, y0, x1, y1], fill=colour, outline='black')
+        else:
+            draw.line([x0, y0, x1, y1], fill=colour, width=rng.randint(1, 6))
+    for i in range(10):
+        draw.text((20, 20 + i * 16), _sentence(rng, 6), fill='black')
+    return image
+
+def _image_bytes(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+def _write_text_pdf(path, pages, rng):
+    import fitz
+
+    doc = fitz.open()
+    for number in range(1, pages + 1):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 80), f'Section {number}', fontsize=18, fontname='hebo')
+        body = '\n\n'.join(_paragraph(rng) for _ in range(4))
+        page.insert_textbox(fitz.Rect(72, 100, 523, 770), body, fontsize=10.5, fontname='helv')
+        page.insert_text((290, 810), str(number), fontsize=9)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+def _write_image_pdf(path, rng):
+    import fitz
+
+    doc = fitz.open()
+    for number in range(1, IMAGE_PAGES + 1):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 60), f'Figure set {number}', fontsize=14)
+        photo = _image_bytes(_photo(rng, 2400, 1600), 'JPEG', quality=92)
+        page.insert_image(fitz.Rect(72, 80, 523, 380), stream=photo)
+        chart = _image_bytes(_diagram(rng, 1200, 900), 'PNG')
+        page.insert_image(fitz.Rect(72, 400, 523, 740), stream=chart)
+        # Same logo on every page, as real reports have
+        page.insert_image(fitz.Rect(480, 780, 560, 820), stream=_image_bytes(_diagram(random.Random(SEED), 200, 100), 'PNG'))
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+def _write_camera_pdf(path, rng):
+    import fitz
+
+    doc = fitz.open()
+    for number in range(1, CAMERA_PAGES + 1):
+        page = doc.new_page(width=842, height=595)
+        photo = _image_bytes(_photo(rng, *CAMERA_PHOTO_SIZE), 'JPEG', quality=90)
+        page.insert_image(page.rect, stream=photo)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+def _write_report_pdf(path, rng):
+    import fitz
+
+    logo = _diagram(random.Random(SEED), 400, 200)
+    doc = fitz.open()
+    for number in range(1, REPORT_PAGES + 1):
+        part = fitz.open()
+        page = part.new_page(width=595, height=842)
+        # Every other copy went through JPEG on the way, as pasted logos do
+        logo_bytes = _image_bytes(logo, 'PNG') if number % 2 else _image_bytes(logo, 'JPEG', quality=85)
+        page.insert_image(fitz.Rect(415, 30, 555, 100), stream=logo_bytes)
+        page.insert_textbox(fitz.Rect(72, 120, 523, 770), _paragraph(rng), fontsize=10.5, fontname='helv')
+        doc.insert_pdf(part)
+        part.close()
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+def _write_scanned_pdf(path, rng):
+    """Text pages rasterised to slightly skewed greyscale JPEGs, like a scanner produces."""
+    import fitz
+    from PIL import Image
+
+    plain = path + '.plain'
+    _write_text_pdf(plain, SCANNED_PAGES, rng)
+    source = fitz.open(plain)
+    doc = fitz.open()
+    for page in source:
+        pix = page.get_pixmap(dpi=200, colorspace=fitz.csGRAY)
+        image = Image.frombytes('L', (pix.width, pix.height), pix.samples)
+        image = image.rotate(rng.uniform(-0.8, 0.8), fillcolor=255, resample=Image.BILINEAR)
+        scan = doc.new_page(width=page.rect.width, height=page.rect.height)
+        scan.insert_image(scan.rect, stream=_image_bytes(image, 'JPEG', quality=75))
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    source.close()
+    os.remove(plain)
+
+def _write_encrypted_pdf(path, rng):
+    import fitz
+
+    plain = path + '.plain'
+    _write_text_pdf(plain, ENCRYPTED_PAGES, rng)
+    doc = fitz.open(plain)
+    doc.save(path, encryption=fitz.PDF_ENCRYPT_AES_256, user_pw=PASSWORD, owner_pw=PASSWORD)
+    doc.close()
+    os.remove(plain)
+
+def _write_huge_page_pdf(path, rng):
+    import fitz
+
+    width, height = HUGE_PAGE_SIZE
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    shape = page.new_shape()
+    for x in range(0, width, 50):
+        shape.draw_line((x, 0), (x, height))
+    for y in range(0, height, 50):
+        shape.draw_line((0, y), (width, y))
+    shape.finish(color=(0.7, 0.7, 0.9), width=0.5)
+    shape.commit()
+    for _ in range(200):
+        x, y = rng.randrange(50, width - 400), rng.randrange(50, height - 50)
+        page.insert_text((x, y), _sentence(rng, 5), fontsize=rng.choice([8, 12, 24]))
+    page.insert_image(fitz.Rect(200, 200, 2200, 1533), stream=_image_bytes(_photo(rng, 3000, 2000), 'JPEG', quality=90))
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+def _write_docx(path, rng):
+    from docx import Document
+
+    document = Document()
+    document.add_heading('Quarterly report', 0)
+    for section in range(1, 11):
+        document.add_heading(f'Section {section}', level=1)
+        for _ in range(4):
+            document.add_paragraph(_paragraph(rng))
+    table = document.add_table(rows=1, cols=4)
+    for cell, title in zip(table.rows[0].cells, ['Item', 'Qty', 'Price', 'Total']):
+        cell.text = title
+    for _ in range(60):
+        qty, price = rng.randint(1, 50), rng.randint(100, 10000) / 100
+        row = table.add_row().cells
+        row[0].text, row[1].text, row[2].text, row[3].text = rng.choice(WORDS), str(qty), f'{price:.2f}', f'{qty * price:.2f}'
+    document.save(path)
+
+def _write_xlsx(path, rng):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Orders'
+    sheet.append(['Order', 'Customer', 'Region', 'Product', 'Qty', 'Price', 'Total', 'Notes'])
+    for order in range(1, 5001):
+        qty, price = rng.randint(1, 50), rng.randint(100, 10000) / 100
+        sheet.append([order, rng.choice(WORDS).title(), rng.choice(['North', 'South', 'East', 'West']),
+                      rng.choice(WORDS), qty, price, round(qty * price, 2), _sentence(rng, 4)])
+    summary = workbook.create_sheet('Summary')
+    for row in range(1, 51):
+        summary.append([f'Line {row}'] + [rng.randint(0, 1000) for _ in range(6)])
+    workbook.save(path)
+
+def _write_pptx(path, rng):
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    presentation = Presentation()
+    for number in range(1, 21):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = f'Slide {number}: {_sentence(rng, 4)}'
+        body = slide.placeholders[1].text_frame
+        body.text = _sentence(rng, 8)
+        for _ in range(4):
+            body.add_paragraph().text = _sentence(rng, 10)
+        if number % 5 == 0:
+            picture = io.BytesIO(_image_bytes(_diagram(rng, 800, 600), 'PNG'))
+            slide.shapes.add_picture(picture, Inches(6), Inches(4), width=Inches(3))
+    presentation.save(path)
+
+def _write_jpg(path, rng):
+    _photo(rng, 3000, 2000).save(path, 'JPEG', quality=90)
+
+def _write_png(path, rng):
+    _diagram(rng, 1600, 1200).save(path, 'PNG')
+
+def documents(scale):
+    """name -> (writer, args) for every document in the corpus at this scale."""
+    docs = {f'text-{pages}.pdf': (_write_text_pdf, (pages,)) for pages in SCALES[scale]}
+    docs.update({
+        f'images-{IMAGE_PAGES}.pdf': (_write_image_pdf, ()),
+        f'camera-{CAMERA_PAGES}.pdf': (_write_camera_pdf, ()),
+        f'report-{REPORT_PAGES}.pdf': (_write_report_pdf, ()),
+        f'scanned-{SCANNED_PAGES}.pdf': (_write_scanned_pdf, ()),
+        'encrypted.pdf': (_write_encrypted_pdf, ()),
+        'huge-page.pdf': (_write_huge_page_pdf, ()),
+        'document.docx': (_write_docx, ()),
+        'spreadsheet.xlsx': (_write_xlsx, ()),
+        'slides.pptx': (_write_pptx, ()),
+        'photo.jpg': (_write_jpg, ()),
+        'diagram.png': (_write_png, ()),
+    })
+    return docs
+
+def generate(out_dir=DEFAULT_CORPUS_DIR, scale='small', force=False, log=print):
+    """Write the corpus to `out_dir` and return the manifest (name -> size in bytes)."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    if previous.get('seed') != SEED:
+        previous = {}
+
+    files = {}
+    for name, (writer, args) in documents(scale).items():
+        path = os.path.join(out_dir, name)
+        if name in previous.get('files', {}) and os.path.exists(path):
+            files[name] = previous['files'][name]
+            continue
+        log(f'generating {name}')
+        # One RNG per document, so adding a document never changes the others
+        writer(path, *args, random.Random(f'{SEED}:{name}'))
+        files[name] = os.path.getsize(path)
+
+    # Keep documents from a larger scale that are already on disk
+    for name, size in previous.get('files', {}).items():
+        if name not in files and os.path.exists(os.path.join(out_dir, name)):
+            files[name] = size
+
+    manifest = {'seed': SEED, 'password': PASSWORD, 'files': files}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--out', default=DEFAULT_CORPUS_DIR)
+    parser.add_argument('--force', action='store_true', help='regenerate files that already exist')
+    args = parser.parse_args()
+
+    manifest = generate(args.out, args.scale, args.force)
+    for name, size in sorted(manifest['files'].items()):
+        print(f'{name:<20} {size / 1024:>10.1f} KiB')
+    print(f'corpus: {args.out}')
+
+if __name__ == '__main__':
+    main()
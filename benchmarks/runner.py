@@ -0,0 +1,330 @@
+"""
+Time every tool against the synthetic corpus.
+
+    python -m benchmarks.runner [--tools compress,split] [--repeat 3]
+                                [--output results.json] [--baseline baseline.json]
+
+Each case calls the tool function from tools/ directly (no Flask, no job
+queue) in a fresh interpreter, so peak RSS belongs to that case alone.
+Reported per case: wall time, pages/s, peak RSS and output size, and for
+compression the bytes saved per image class (photo, flat, ...), the
+number of duplicate images merged and how many images got each JPEG
+quality; for page rendering, bytes and milliseconds per page, to compare
+image formats; for OCR, pages per minute at each of WORKER_COUNTS page
+workers. With --baseline the run is compared to a previous --output file
+and the exit status is 1 if any case got slower or bigger in memory than
+--threshold.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from benchmarks import corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tools whose output is one file per page, reported per page
+PER_PAGE_TOOLS = ('pdf-to-jpg',)
+# Tools whose cases run once per page worker count (PAGE_WORKERS), to show
+# how they scale with cores
+SCALED_TOOLS = ('ocr',)
+WORKER_COUNTS = (1, 2, 4, 8)
+
+# (tool, label, corpus inputs, form params). A param value '@name' is
+# replaced by a data: URL of that corpus file, as the sign tool expects.
+CASES = [
+    ('merge', 'text+images', ['text-50.pdf', 'images-20.pdf', 'text-500.pdf'], {}),
+    ('split', 'text-500', ['text-500.pdf'], {'split_type': 'all'}),
+    ('split', 'text-5000', ['text-5000.pdf'], {'split_type': 'all'}),
+    ('compress', 'images-extreme', ['images-20.pdf'], {'quality': 'extreme'}),
+    ('compress', 'images-medium', ['images-20.pdf'], {'quality': 'medium'}),
+    ('compress', 'images-ssim-0.995', ['images-20.pdf'], {'quality': 'medium', 'min_ssim': '0.995'}),
+    ('compress', 'images-target-2mb', ['images-20.pdf'], {'target_bytes': 2 * 1024 * 1024}),
+    ('compress', 'camera-medium', ['camera-6.pdf'], {'quality': 'medium'}),
+    ('compress', 'camera-target-2mb', ['camera-6.pdf'], {'target_bytes': 2 * 1024 * 1024}),
+    ('compress', 'report-medium', ['report-30.pdf'], {'quality': 'medium'}),
+    ('compress', 'report-merge-similar', ['report-30.pdf'], {'quality': 'medium', 'merge_similar': '1'}),
+    ('compress', 'scanned-medium', ['scanned-10.pdf'], {'quality': 'medium'}),
+    ('compress', 'text-5000', ['text-5000.pdf'], {'quality': 'medium'}),
+    ('rotate', 'text-500', ['text-500.pdf'], {'angle': '90', 'pages': 'all'}),
+    ('crop', 'text-500', ['text-500.pdf'], {'top': '36', 'bottom': '36', 'left': '36', 'right': '36', 'pages': 'all'}),
+    ('remove-pages', 'text-500', ['text-500.pdf'], {'pages': '1-100,250,400-450'}),
+    ('organize', 'text-50', ['text-50.pdf'], {'order': ','.join(str(p) for p in range(50, 0, -1))}),
+    ('pdf-to-jpg', 'text-50', ['text-50.pdf'], {'dpi': '150'}),
+    ('pdf-to-jpg', 'text-50-progressive', ['text-50.pdf'], {'dpi': '150', 'progressive': '1'}),
+    ('pdf-to-jpg', 'text-50-gray', ['text-50.pdf'], {'dpi': '150', 'grayscale': '1'}),
+    ('pdf-to-jpg', 'text-50-webp', ['text-50.pdf'], {'dpi': '150', 'format': 'webp'}),
+    ('pdf-to-jpg', 'text-50-png', ['text-50.pdf'], {'dpi': '150', 'format': 'png'}),
+    ('pdf-to-jpg', 'images-20', ['images-20.pdf'], {'dpi': '150'}),
+    ('pdf-to-jpg', 'images-20-progressive', ['images-20.pdf'], {'dpi': '150', 'progressive': '1'}),
+    ('pdf-to-jpg', 'images-20-webp', ['images-20.pdf'], {'dpi': '150', 'format': 'webp'}),
+    ('pdf-to-jpg', 'images-20-png', ['images-20.pdf'], {'dpi': '150', 'format': 'png'}),
+    ('pdf-to-jpg', 'huge-page', ['huge-page.pdf'], {'dpi': '100'}),
+    ('pdf-to-jpg', 'huge-page-4mp', ['huge-page.pdf'], {'dpi': '100', 'max_pixels': '4000000'}),
+    ('pdf-to-jpg', 'huge-page-300dpi', ['huge-page.pdf'], {'dpi': '300'}),
+    ('pdf-to-jpg', 'huge-page-300dpi-png', ['huge-page.pdf'], {'dpi': '300', 'format': 'png'}),
+    ('jpg-to-pdf', 'photo+diagram', ['photo.jpg', 'diagram.png'], {}),
+    ('pdf-to-word', 'text-50', ['text-50.pdf'], {}),
+    ('word-to-pdf', 'document', ['document.docx'], {}),
+    ('excel-to-pdf', 'spreadsheet', ['spreadsheet.xlsx'], {}),
+    ('pptx-to-pdf', 'slides', ['slides.pptx'], {}),
+    ('extract', 'text-500', ['text-500.pdf'], {'extract_type': 'text'}),
+    ('extract', 'images-20', ['images-20.pdf'], {'extract_type': 'images'}),
+    ('ocr', 'scanned-10', ['scanned-10.pdf'], {'language': 'eng'}),
+    ('unlock', 'encrypted', ['encrypted.pdf'], {'password': corpus.PASSWORD}),
+    ('protect', 'text-500', ['text-500.pdf'], {'password': 'secret'}),
+    ('sign', 'text-50', ['text-50.pdf'], {'signature': '@diagram.png', 'page': '1'}),
+    ('watermark', 'text-500', ['text-500.pdf'], {'text': 'CONFIDENTIAL', 'opacity': '0.3'}),
+    ('edit', 'text-50', ['text-50.pdf'], {'edits': json.dumps([
+        {'type': 'text', 'page': page, 'x': 72, 'y': 40, 'content': 'Reviewed', 'fontSize': 12}
+        for page in range(1, 51)
+    ])}),
+    ('pdf-to-excel', 'text-50', ['text-50.pdf'], {}),
+    ('pdf-to-powerpoint', 'text-50', ['text-50.pdf'], {}),
+]
+
+def case_key(tool, label):
+    return f'{tool}:{label}'
+
+def _peak_rss_mb():
+    import resource
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _tree_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(path) for name in files)
+
+def _page_count(path):
+    import fitz
+    try:
+        with fitz.open(path) as doc:
+            if doc.needs_pass:
+                doc.authenticate(corpus.PASSWORD)
+            return doc.page_count
+    except Exception:
+        return 0
+
+def _resolve_params(params, corpus_dir):
+    resolved = {}
+    for name, value in params.items():
+        if isinstance(value, str) and value.startswith('@'):
+            path = os.path.join(corpus_dir, value[1:])
+            mime = 'image/png' if path.endswith('.png') else 'image/jpeg'
+            with open(path, 'rb') as f:
+                value = f'data:{mime};base64,' + base64.b64encode(f.read()).decode('ascii')
+        resolved[name] = value
+    return resolved
+
+def run_case(case, corpus_dir):
+    """Run one case in this process and return its measurements."""
+    from tools import registry
+
+    tool = case['tool']
+    spec = registry.get_tool(tool)
+    func = registry.load_function(tool)
+    args = registry.parse_params(tool, _resolve_params(case['params'], corpus_dir))
+    inputs = [os.path.join(corpus_dir, name) for name in case['inputs']]
+
+    work_dir = tempfile.mkdtemp(prefix='pdf-forge-bench-')
+    try:
+        output = work_dir if spec['output'] == 'folder' else os.path.join(work_dir, spec['output_name'])
+        rss_before = _peak_rss_mb()
+        start = time.perf_counter()
+        result = func(inputs if spec['multiple'] else inputs[0], output, *args)
+        wall = time.perf_counter() - start
+
+        pages = sum(_page_count(path) for path in inputs if path.endswith('.pdf'))
+        if not pages and os.path.isfile(output) and output.endswith('.pdf'):
+            # Conversions to PDF: count what was produced
+            pages = _page_count(output)
+        return {
+            'success': bool(result and result.get('success')),
+            'error': (result or {}).get('error'),
+            'wall_seconds': wall,
+            'pages': pages,
+            'input_bytes': sum(os.path.getsize(path) for path in inputs),
+            'output_bytes': _tree_size(work_dir),
+            'peak_rss_mb': _peak_rss_mb(),
+            'rss_before_mb': rss_before,
+            'image_classes': (result or {}).get('image_classes'),
+            'images_merged': (result or {}).get('images_merged'),
+            'quality_distribution': (result or {}).get('quality_distribution'),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _run_in_child(case, corpus_dir, timeout):
+    payload = json.dumps({'case': case, 'corpus': corpus_dir})
+    # Tools run with the environment of a job process (see services/jobs.py)
+    env = dict(os.environ)
+    env.setdefault('OMP_THREAD_LIMIT', '1')
+    if case.get('workers'):
+        env['PAGE_WORKERS'] = str(case['workers'])
+    try:
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.runner', '--child', payload],
+            cwd=ROOT, capture_output=True, text=True, timeout=timeout, env=env
+        )
+    except subprocess.TimeoutExpired:
+        return {'success': False, 'error': f'timed out after {timeout}s'}
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        # Crashed hard (e.g. killed for memory); keep the last line of stderr
+        tail = completed.stderr.strip().splitlines()[-1:] or [f'exit status {completed.returncode}']
+        return {'success': False, 'error': tail[0]}
+    return json.loads(lines[-1])
+
+def measure(case, corpus_dir, repeat, timeout):
+    samples = [_run_in_child(case, corpus_dir, timeout) for _ in range(repeat)]
+    good = [s for s in samples if s.get('success')]
+    if not good:
+        return {'success': False, 'error': samples[-1].get('error')}
+    wall = statistics.median(s['wall_seconds'] for s in good)
+    pages = good[-1]['pages']
+    measured = {
+        'success': True,
+        'runs': len(good),
+        'wall_seconds': wall,
+        'pages': pages,
+        'pages_per_second': pages / wall if wall > 0 else None,
+        'peak_rss_mb': max(s['peak_rss_mb'] for s in good),
+        'input_bytes': good[-1]['input_bytes'],
+        'output_bytes': good[-1]['output_bytes'],
+    }
+    if good[-1].get('image_classes'):
+        measured['image_classes'] = good[-1]['image_classes']
+    if good[-1].get('images_merged'):
+        measured['images_merged'] = good[-1]['images_merged']
+    if good[-1].get('quality_distribution'):
+        measured['quality_distribution'] = good[-1]['quality_distribution']
+    if case['tool'] in PER_PAGE_TOOLS and pages:
+        measured['per_page'] = {'bytes': measured['output_bytes'] / pages, 'ms': wall * 1000 / pages}
+    if case.get('workers'):
+        measured['workers'] = case['workers']
+        measured['pages_per_minute'] = pages * 60 / wall if wall > 0 else None
+    return measured
+
+def compare(results, baseline, threshold):
+    """Per-case ratios against the baseline and the keys that regressed."""
+    comparison, regressions = {}, []
+    for key, current in results.items():
+        before = baseline.get(key)
+        if not before or not before.get('success') or not current.get('success'):
+            continue
+        ratios = {
+            'wall': current['wall_seconds'] / before['wall_seconds'] if before['wall_seconds'] else None,
+            'rss': current['peak_rss_mb'] / before['peak_rss_mb'] if before['peak_rss_mb'] else None,
+            'output': current['output_bytes'] / before['output_bytes'] if before['output_bytes'] else None,
+        }
+        comparison[key] = ratios
+        if any(ratios[name] and ratios[name] > 1 + threshold for name in ('wall', 'rss')):
+            regressions.append(key)
+    return comparison, regressions
+
+def _ratio(value):
+    return f'{(value - 1) * 100:+.0f}%' if value else '-'
+
+def print_table(results, comparison):
+    header = f"{'case':<30} {'wall s':>8} {'pages/s':>9} {'RSS MB':>8} {'output KiB':>11}"
+    if comparison:
+        header += f" {'wall':>6} {'RSS':>6} {'size':>6}"
+    print(header)
+    for key, row in results.items():
+        if not row.get('success'):
+            print(f"{key:<30} failed: {row.get('error')}")
+            continue
+        pps = f"{row['pages_per_second']:.1f}" if row['pages_per_second'] else '-'
+        line = (f"{key:<30} {row['wall_seconds']:>8.3f} {pps:>9} {row['peak_rss_mb']:>8.1f} "
+                f"{row['output_bytes'] / 1024:>11.1f}")
+        if comparison:
+            ratios = comparison.get(key, {})
+            line += f" {_ratio(ratios.get('wall')):>6} {_ratio(ratios.get('rss')):>6} {_ratio(ratios.get('output')):>6}"
+        print(line)
+        for image_class, counts in sorted((row.get('image_classes') or {}).items()):
+            saved = counts['original_bytes'] - counts['new_bytes']
+            share = saved / counts['original_bytes'] if counts['original_bytes'] else 0
+            print(f"  {image_class:<12} {counts['images']:>5} images  {saved / 1024:>11.1f} KiB saved ({share:.0%})")
+        if row.get('images_merged'):
+            print(f"  {'merged':<12} {row['images_merged']:>5} images")
+        if row.get('quality_distribution'):
+            qualities = ', '.join(f"q{quality}: {count}" for quality, count in row['quality_distribution'].items())
+            print(f"  {'JPEG':<12} {qualities}")
+        if row.get('per_page'):
+            print(f"  {'per page':<12} {row['per_page']['bytes'] / 1024:>11.1f} KiB {row['per_page']['ms']:>9.1f} ms")
+        if row.get('workers') and row.get('pages_per_minute'):
+            print(f"  {'workers':<12} {row['workers']:>5}  {row['pages_per_minute']:>11.1f} pages/min")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=corpus.DEFAULT_CORPUS_DIR)
+    parser.add_argument('--scale', choices=sorted(corpus.SCALES), default='small',
+                        help='corpus to generate if it is missing')
+    parser.add_argument('--tools', help='comma-separated tool names (default: all)')
+    parser.add_argument('--cases', help='only cases whose tool:label contains this text')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case; the median wall time is kept')
+    parser.add_argument('--timeout', type=int, default=900, help='seconds before a case is abandoned')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON from an earlier --output run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown or RSS growth that counts as a regression')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        payload = json.loads(args.child)
+        print(json.dumps(run_case(payload['case'], payload['corpus'])))
+        return
+
+    manifest = corpus.generate(args.corpus, args.scale, log=lambda msg: print(msg, file=sys.stderr))
+    tools = set(args.tools.split(',')) if args.tools else None
+
+    results = {}
+    for tool, label, inputs, params in CASES:
+        if any(name not in manifest['files'] for name in inputs):
+            continue
+        for workers in WORKER_COUNTS if tool in SCALED_TOOLS else (None,):
+            key = case_key(tool, f'{label}-{workers}w' if workers else label)
+            if tools and tool not in tools or args.cases and args.cases not in key:
+                continue
+            case = {'tool': tool, 'inputs': inputs, 'params': params, 'workers': workers}
+            results[key] = measure(case, args.corpus, args.repeat, args.timeout)
+            print(f'{key}: done', file=sys.stderr)
+
+    comparison, regressions = {}, []
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison, regressions = compare(results, json.load(f)['cases'], args.threshold)
+
+    print_table(results, comparison)
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'cpus': os.cpu_count(),
+            'corpus_seed': manifest['seed'],
+            'cases': results,
+        }
+        if args.baseline:
+            report['comparison'] = comparison
+            report['regressions'] = regressions
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
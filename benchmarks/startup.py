@@ -0,0 +1,79 @@
+"""
+Measure what a gunicorn worker pays to import the app.
+
+    python -m benchmarks.startup [--runs 5]
+
+Each run imports `app` in a fresh interpreter and reports import time and
+resident memory. The "eager" row also imports every tool module up front,
+which is what every worker did before the registry loaded them lazily.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['fitz', 'PIL', 'reportlab', 'openpyxl', 'docx', 'pptx', 'pytesseract']
+
+PROBE = r'''
+import sys, time, json
+start = time.perf_counter()
+import app
+if {eager}:
+    from tools import registry
+    registry.load_all()
+elapsed = time.perf_counter() - start
+rss_kb = 0
+try:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    'import_seconds': elapsed,
+    'rss_mb': rss_kb / 1024,
+    'modules': len(sys.modules),
+    'heavy_loaded': [m for m in {heavy!r} if m in sys.modules],
+}}))
+'''
+
+def probe(eager):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(eager=eager, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure(eager, runs):
+    samples = [probe(eager) for _ in range(runs)]
+    return {
+        'import_seconds': statistics.median(s['import_seconds'] for s in samples),
+        'rss_mb': statistics.median(s['rss_mb'] for s in samples),
+        'modules': samples[-1]['modules'],
+        'heavy_loaded': samples[-1]['heavy_loaded'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print raw JSON instead of a table')
+    args = parser.parse_args()
+
+    report = {'lazy': measure(False, args.runs), 'eager': measure(True, args.runs)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'mode':<6} {'import s':>9} {'RSS MB':>8} {'modules':>8}  heavy libraries loaded")
+    for mode, row in report.items():
+        print(f"{mode:<6} {row['import_seconds']:>9.3f} {row['rss_mb']:>8.1f} {row['modules']:>8}  "
+              f"{', '.join(row['heavy_loaded']) or '-'}")
+
+if __name__ == '__main__':
+    main()
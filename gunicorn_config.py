@@ -1,6 +1,7 @@
 import multiprocessing
 
 bind = "0.0.0.0:8000"
+# Each worker also runs JOB_WORKERS job processes (see services/jobs.py)
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "sync"  # 'gevent' is optional if you need async
 timeout = 120
@@ -11,4 +12,4 @@ errorlog = "-"
 loglevel = "info"
 
 # Ensure temp files are cleaned up on worker exit if needed
-# (handled by app.py background thread, but good to know)
+# (handled by the expiry reaper in services/expiry.py)
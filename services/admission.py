@@ -0,0 +1,159 @@
+import os
+import math
+import time
+import logging
+
+from services.storage import connect_db
+
+logger = logging.getLogger(__name__)
+
+# Tools declare a cost class in the registry. Each class has a limit on how
+# many of its jobs may run at once across every gunicorn worker, and a bound
+# on how many may wait; past that, requests are turned away with a 429.
+# Slots are rows in the jobs database, so all workers see the same counts.
+#
+#   TOOL_CLASS_LIMITS="light=16,medium=4,heavy=2"
+#   TOOL_QUEUE_LIMITS="light=200,medium=50,heavy=20"
+COST_CLASSES = ('light', 'medium', 'heavy')
+DEFAULT_COST_CLASS = 'light'
+
+_cpus = os.cpu_count() or 1
+DEFAULT_CLASS_LIMITS = {'light': _cpus * 2, 'medium': max(2, _cpus), 'heavy': max(1, _cpus // 2)}
+DEFAULT_QUEUE_LIMITS = {'light': 200, 'medium': 50, 'heavy': 20}
+# Used for Retry-After until a class has finished jobs to average over
+DEFAULT_JOB_SECONDS = {'light': 1, 'medium': 5, 'heavy': 30}
+MAX_RETRY_AFTER_SECONDS = 300
+
+def _parse_limits(value, defaults):
+    limits = dict(defaults)
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        name, number = item.split('=', 1)
+        if name.strip() in limits:
+            try:
+                limits[name.strip()] = max(1, int(number))
+            except ValueError:
+                logger.warning(f"Ignoring invalid limit {item!r}")
+    return limits
+
+CLASS_LIMITS = _parse_limits(os.environ.get('TOOL_CLASS_LIMITS'), DEFAULT_CLASS_LIMITS)
+QUEUE_LIMITS = _parse_limits(os.environ.get('TOOL_QUEUE_LIMITS'), DEFAULT_QUEUE_LIMITS)
+
+def cost_class(spec):
+    return spec.get('cost', DEFAULT_COST_CLASS) if spec else DEFAULT_COST_CLASS
+
+def init_db(conn):
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS slots ('
+        ' job_id TEXT PRIMARY KEY,'
+        ' cost_class TEXT NOT NULL,'
+        ' pid INTEGER NOT NULL,'
+        ' acquired_at REAL NOT NULL)'
+    )
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _release_dead(conn, cost):
+    """Free slots held by workers that exited without releasing them."""
+    for job_id, pid in conn.execute('SELECT job_id, pid FROM slots WHERE cost_class = ?', (cost,)).fetchall():
+        if not _pid_alive(pid):
+            conn.execute('DELETE FROM slots WHERE job_id = ?', (job_id,))
+
+def try_acquire(db_path, job_id, cost):
+    """Take a run slot for the job if its class is under its limit. Returns True on success."""
+    conn = connect_db(db_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        held = conn.execute('SELECT COUNT(*) FROM slots WHERE cost_class = ?', (cost,)).fetchone()[0]
+        if held >= CLASS_LIMITS.get(cost, 1):
+            _release_dead(conn, cost)
+            held = conn.execute('SELECT COUNT(*) FROM slots WHERE cost_class = ?', (cost,)).fetchone()[0]
+        acquired = held < CLASS_LIMITS.get(cost, 1)
+        if acquired:
+            conn.execute(
+                'INSERT OR REPLACE INTO slots (job_id, cost_class, pid, acquired_at) VALUES (?, ?, ?, ?)',
+                (job_id, cost, os.getpid(), time.time())
+            )
+        conn.execute('COMMIT')
+        return acquired
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def release(db_path, job_id):
+    conn = connect_db(db_path)
+    try:
+        conn.execute('DELETE FROM slots WHERE job_id = ?', (job_id,))
+    finally:
+        conn.close()
+
+def _average_job_seconds(conn, cost):
+    row = conn.execute(
+        'SELECT AVG(updated_at - started_at) FROM ('
+        ' SELECT updated_at, started_at FROM jobs'
+        " WHERE cost_class = ? AND state = 'done' AND started_at IS NOT NULL"
+        ' ORDER BY updated_at DESC LIMIT 50)',
+        (cost,)
+    ).fetchone()
+    return row[0] if row and row[0] else DEFAULT_JOB_SECONDS.get(cost, 5)
+
+def check(db_path, cost):
+    """
+    None if a new job of this class may be queued, otherwise the number of
+    seconds the client should wait before retrying.
+    """
+    conn = connect_db(db_path)
+    try:
+        queued = 0
+        for pid, count in conn.execute(
+            "SELECT worker_pid, COUNT(*) FROM jobs"
+            " WHERE cost_class = ? AND state = 'queued' AND started_at IS NULL GROUP BY worker_pid",
+            (cost,)
+        ).fetchall():
+            if pid is None or _pid_alive(pid):
+                queued += count
+            else:
+                # Jobs only ever wait in the memory of the worker that accepted them
+                conn.execute(
+                    "UPDATE jobs SET state = 'failed', error = 'Server restarted before the job started' "
+                    "WHERE worker_pid = ? AND state = 'queued' AND started_at IS NULL", (pid,)
+                )
+        if queued < QUEUE_LIMITS.get(cost, 1):
+            return None
+        # Time for the jobs ahead to drain through the class's slots
+        waves = (queued + 1) / CLASS_LIMITS.get(cost, 1)
+        retry_after = math.ceil(waves * _average_job_seconds(conn, cost))
+    finally:
+        conn.close()
+    return max(1, min(retry_after, MAX_RETRY_AFTER_SECONDS))
+
+def usage(db_path):
+    """Per-class running and queued counts with their limits."""
+    conn = connect_db(db_path)
+    try:
+        running = dict(conn.execute('SELECT cost_class, COUNT(*) FROM slots GROUP BY cost_class').fetchall())
+        queued = dict(conn.execute(
+            "SELECT cost_class, COUNT(*) FROM jobs WHERE state = 'queued' AND started_at IS NULL GROUP BY cost_class"
+        ).fetchall())
+    finally:
+        conn.close()
+    return {
+        cost: {
+            'running': running.get(cost, 0),
+            'limit': CLASS_LIMITS[cost],
+            'queued': queued.get(cost, 0),
+            'queue_limit': QUEUE_LIMITS[cost],
+        }
+        for cost in COST_CLASSES
+    }
@@ -0,0 +1,181 @@
+import os
+import time
+import shutil
+import logging
+import threading
+import multiprocessing
+
+from services.storage import BASE_TEMP_DIR, UPLOAD_FOLDER, PROCESSED_FOLDER, CACHE_FOLDER, DIAGNOSTICS_FOLDER, connect_db, path_size
+
+logger = logging.getLogger(__name__)
+
+# Every temp file/folder is registered here with its expiry time. One reaper
+# thread per process deletes exactly the rows that are due; because the index
+# is on disk, entries registered before a worker restart are still honoured.
+EXPIRY_DB_PATH = os.path.join(BASE_TEMP_DIR, 'expiry.sqlite3')
+DEFAULT_TTL_SECONDS = 300
+ORPHAN_MAX_AGE_SECONDS = 1800
+# Other workers can register earlier deadlines without waking this process,
+# so never sleep longer than this between checks.
+REAPER_MAX_SLEEP_SECONDS = 30
+HOUSEKEEPING_INTERVAL_SECONDS = 300
+
+_wakeup = threading.Event()
+_running = False
+
+def _connect():
+    return connect_db(EXPIRY_DB_PATH)
+
+def init_db():
+    conn = _connect()
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS expiry ('
+            ' path TEXT PRIMARY KEY,'
+            ' is_dir INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS expiry_expires_at ON expiry (expires_at)')
+    finally:
+        conn.close()
+
+def register(path, ttl=DEFAULT_TTL_SECONDS):
+    """Schedule `path` (file or folder) for deletion `ttl` seconds from now."""
+    path = os.path.abspath(path)
+    try:
+        size = path_size(path)
+    except OSError:
+        size = 0
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT OR REPLACE INTO expiry (path, is_dir, size, expires_at) VALUES (?, ?, ?, ?)',
+            (path, 1 if os.path.isdir(path) else 0, size, time.time() + ttl)
+        )
+    finally:
+        conn.close()
+    _wakeup.set()
+
+def _delete(path, is_dir):
+    try:
+        if is_dir:
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    except Exception as e:
+        logger.error(f"Error cleaning up {path}: {e}")
+
+def reap_due(now=None):
+    """Delete every entry whose expiry has passed. Returns the number deleted."""
+    now = now or time.time()
+    conn = _connect()
+    try:
+        due = conn.execute(
+            'SELECT path, is_dir FROM expiry WHERE expires_at <= ? ORDER BY expires_at',
+            (now,)
+        ).fetchall()
+        deleted = 0
+        for path, is_dir in due:
+            # Claim the row first so two workers never delete the same entry
+            if conn.execute('DELETE FROM expiry WHERE path = ?', (path,)).rowcount:
+                _delete(path, is_dir)
+                deleted += 1
+    finally:
+        conn.close()
+    return deleted
+
+def next_due():
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT MIN(expires_at) FROM expiry').fetchone()
+    finally:
+        conn.close()
+    return row[0]
+
+def adopt_orphans():
+    """
+    Register anything in the temp folders that is not tracked yet (e.g. left
+    behind by a worker that died mid-job), expiring it by its mtime.
+    """
+    conn = _connect()
+    try:
+        tracked = set(row[0] for row in conn.execute('SELECT path FROM expiry'))
+        for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, CACHE_FOLDER, DIAGNOSTICS_FOLDER]:
+            if not os.path.exists(folder):
+                continue
+            for entry in os.scandir(folder):
+                path = os.path.abspath(entry.path)
+                if path in tracked:
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                    conn.execute(
+                        'INSERT OR IGNORE INTO expiry (path, is_dir, size, expires_at) VALUES (?, ?, ?, ?)',
+                        (path, 1 if is_dir else 0, path_size(path),
+                         entry.stat().st_mtime + ORPHAN_MAX_AGE_SECONDS)
+                    )
+                except OSError:
+                    continue
+    finally:
+        conn.close()
+
+def stats():
+    now = time.time()
+    conn = _connect()
+    try:
+        tracked_items, tracked_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM expiry'
+        ).fetchone()
+        pending_items, pending_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM expiry WHERE expires_at <= ?', (now,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return {
+        'tracked_items': tracked_items,
+        'tracked_bytes': tracked_bytes,
+        'pending_items': pending_items,
+        'pending_bytes': pending_bytes,
+    }
+
+def _reaper_loop(housekeeping):
+    last_housekeeping = 0
+    while _running:
+        try:
+            reap_due()
+            if housekeeping and time.time() - last_housekeeping >= HOUSEKEEPING_INTERVAL_SECONDS:
+                housekeeping()
+                last_housekeeping = time.time()
+            due = next_due()
+            sleep_for = REAPER_MAX_SLEEP_SECONDS
+            if due is not None:
+                sleep_for = max(0, min(sleep_for, due - time.time()))
+        except Exception as e:
+            logger.error(f"Error in expiry reaper: {e}")
+            sleep_for = REAPER_MAX_SLEEP_SECONDS
+        _wakeup.wait(sleep_for)
+        _wakeup.clear()
+
+def start_reaper(housekeeping=None):
+    """Start the single reaper thread for this process. `housekeeping` runs every few minutes."""
+    global _running
+    # Job pool processes re-import the web app when spawned; only the web
+    # worker itself should reap.
+    if _running or multiprocessing.current_process().name != 'MainProcess':
+        return
+    _running = True
+    try:
+        adopt_orphans()
+    except Exception as e:
+        logger.error(f"Error adopting orphaned temp files: {e}")
+    thread = threading.Thread(target=_reaper_loop, args=(housekeeping,), daemon=True)
+    thread.start()
+    logger.info("Expiry reaper started")
+
+def stop_reaper():
+    global _running
+    _running = False
+    _wakeup.set()
+
+init_db()
@@ -0,0 +1,400 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from services.storage import BASE_TEMP_DIR, connect_db
+from services import metrics, admission
+from tools import registry, progress
+
+logger = logging.getLogger(__name__)
+
+# Job state lives in SQLite so every gunicorn worker can answer /jobs/<id>,
+# whichever worker accepted the upload.
+JOBS_DB_PATH = os.path.join(BASE_TEMP_DIR, 'jobs.sqlite3')
+# Each gunicorn worker runs its own pool of JOB_WORKERS job processes, so a
+# host has up to (gunicorn workers) x JOB_WORKERS of them, e.g. 17 x 2 = 34
+# on 8 cores. A job process starts up to PAGE_WORKERS page workers
+# (tools/sharding.py) while it runs a job and stops them when it finishes.
+# Job processes are replaced after JOB_TASKS_PER_PROCESS jobs, which returns
+# the memory PyMuPDF and Pillow hold on to after large documents.
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_TASKS_PER_PROCESS = int(os.environ.get('JOB_TASKS_PER_PROCESS', 20))
+JOB_MAX_AGE_SECONDS = 1800
+# Progress reports from a running tool are written at most this often
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Jobs accepted by this worker wait here until their cost class has a free
+# slot (shared by all workers) and the local pool has a free process. At most
+# JOB_WORKERS - 1 processes run non-light jobs, so cheap tools always have one.
+DISPATCH_POLL_SECONDS = 0.5
+# A costly job that has waited this long stops newer light jobs from taking
+# the processes it needs
+COSTLY_JOB_AGING_SECONDS = 5
+# Tools run in the job processes and in the page workers those start, each
+# meant to keep one core busy, so libraries that would start an OpenMP thread
+# per core (Tesseract) get one. Values already in the environment win.
+TOOL_PROCESS_ENVIRONMENT = {'OMP_THREAD_LIMIT': '1'}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = []
+_pending_lock = threading.Lock()
+_dispatch_wakeup = threading.Event()
+_dispatcher = None
+_in_flight = {'total': 0, 'costly': 0}  # guarded by _pending_lock
+
+def _connect():
+    return connect_db(JOBS_DB_PATH)
+
+def init_db():
+    conn = _connect()
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' tool TEXT NOT NULL,'
+            ' state TEXT NOT NULL,'
+            ' result TEXT,'
+            ' error TEXT,'
+            ' created_at REAL NOT NULL,'
+            ' updated_at REAL NOT NULL,'
+            ' cost_class TEXT,'
+            ' started_at REAL,'
+            ' worker_pid INTEGER,'
+            ' progress TEXT)'
+        )
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+        for column, kind in (('cost_class', 'TEXT'), ('started_at', 'REAL'), ('worker_pid', 'INTEGER'),
+                             ('progress', 'TEXT')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_class_state ON jobs (cost_class, state)')
+        admission.init_db(conn)
+    finally:
+        conn.close()
+
+def _set_state(job_id, state, result=None, error=None):
+    conn = _connect()
+    try:
+        conn.execute(
+            'UPDATE jobs SET state = ?, result = ?, error = ?, updated_at = ? WHERE id = ?',
+            (state, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+    finally:
+        conn.close()
+
+def _set_progress(job_id, done, total, details):
+    conn = _connect()
+    try:
+        conn.execute(
+            'UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?',
+            (json.dumps(dict(details, done=done, total=total)), time.time(), job_id)
+        )
+    finally:
+        conn.close()
+
+def _progress_reporter(job_id):
+    last = {'written': 0}
+
+    def reporter(done, total, details):
+        now = time.monotonic()
+        if done < total and now - last['written'] < PROGRESS_INTERVAL_SECONDS:
+            return
+        last['written'] = now
+        try:
+            _set_progress(job_id, done, total, details)
+        except Exception as e:
+            logger.warning(f"Could not record progress of job {job_id}: {e}")
+    return reporter
+
+def create_job(tool_name, cost=admission.DEFAULT_COST_CLASS):
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO jobs (id, tool, state, created_at, updated_at, cost_class, worker_pid) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, tool_name, QUEUED, now, now, cost, os.getpid())
+        )
+    finally:
+        conn.close()
+    return job_id
+
+def record_finished_job(tool_name, result):
+    """Record a job that needed no work (e.g. served from the result cache)."""
+    job_id = create_job(tool_name, admission.cost_class(registry.get_tool(tool_name)))
+    _set_state(job_id, DONE, result=result)
+    return job_id
+
+def get_job(job_id):
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT id, tool, state, result, error, created_at, updated_at, started_at, progress FROM jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {
+        'job_id': row[0],
+        'tool': row[1],
+        'state': row[2],
+        'result': json.loads(row[3]) if row[3] else None,
+        'error': row[4],
+        'created_at': row[5],
+        'updated_at': row[6],
+        # Time spent waiting for a slot; still growing while queued
+        'queue_wait_seconds': round((row[7] if row[7] is not None else
+                                     row[6] if row[2] in (DONE, FAILED) else time.time()) - row[5], 3),
+        # {'done': n, 'total': m, ...} from tools that report it
+        'progress': json.loads(row[8]) if row[8] else None,
+    }
+
+def _mark_started(job_id):
+    conn = _connect()
+    try:
+        conn.execute('UPDATE jobs SET started_at = ? WHERE id = ?', (time.time(), job_id))
+    finally:
+        conn.close()
+
+def check_admission(tool_name):
+    """None if the tool's class can take another job, else seconds to wait before retrying."""
+    return admission.check(JOBS_DB_PATH, admission.cost_class(registry.get_tool(tool_name)))
+
+def class_usage():
+    return admission.usage(JOBS_DB_PATH)
+
+def count_by_state():
+    conn = _connect()
+    try:
+        counts = dict(conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+    finally:
+        conn.close()
+    return {state: counts.get(state, 0) for state in (QUEUED, RUNNING, DONE, FAILED)}
+
+def purge_old_jobs(max_age=JOB_MAX_AGE_SECONDS):
+    conn = _connect()
+    try:
+        conn.execute('DELETE FROM jobs WHERE updated_at < ?', (time.time() - max_age,))
+    finally:
+        conn.close()
+
+def _init_job_process():
+    for name, value in TOOL_PROCESS_ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+
+def _core_share():
+    """This job's share of the cores: the machine's divided among the jobs running now, this one included."""
+    from tools import sharding
+    running = sum(usage['running'] for usage in admission.usage(JOBS_DB_PATH).values())
+    return max(1, sharding.available_cpus() // max(1, running))
+
+def execute_job(job_id, tool_name, saved_files, params, profile=False):
+    """Entry point inside the pool process: run the tool and record the outcome."""
+    from services.processing import run_tool
+    from tools import sharding
+
+    _set_state(job_id, RUNNING)
+    progress.set_reporter(_progress_reporter(job_id))
+    started = time.monotonic()
+    try:
+        # Page workers of jobs running side by side (in every web worker) would
+        # otherwise each want all the cores
+        sharding.set_job_cores(_core_share())
+        if profile:
+            from services.profiling import run_profiled
+            from tools.registry import load_function
+            # Import the tool first so a cold process doesn't profile its imports
+            load_function(tool_name)
+            result, diagnostics = run_profiled(job_id, tool_name, run_tool, tool_name, saved_files, params)
+            result['diagnostics'] = diagnostics
+        else:
+            try:
+                result = run_tool(tool_name, saved_files, params)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+    finally:
+        progress.set_reporter(None)
+        sharding.set_job_cores(None)
+        # Page workers would otherwise sit idle in every job process between jobs
+        sharding.shutdown_pool()
+    metrics.record_job(tool_name, saved_files, result, time.monotonic() - started)
+
+    if result.get('success'):
+        _set_state(job_id, DONE, result=result)
+    else:
+        # Keep the diagnostics links of a failed run
+        _set_state(job_id, FAILED, result=result if profile else None, error=result.get('error', 'Processing failed'))
+    return result
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn keeps the pool independent of the threads already running
+            # in the web worker (cleanup scheduler, request threads)
+            _executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_job_process,
+                max_tasks_per_child=JOB_TASKS_PER_PROCESS
+            )
+        return _executor
+
+def _discard_executor(executor):
+    """Drop a broken pool so the next job starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def _requeue(job):
+    with _pending_lock:
+        _pending.insert(0, job)
+    _dispatch_wakeup.set()
+
+def _local_capacity(cost):
+    if _in_flight['total'] >= JOB_WORKERS:
+        return False
+    if cost != admission.DEFAULT_COST_CLASS and _in_flight['costly'] >= max(1, JOB_WORKERS - 1):
+        return False
+    return True
+
+def _dispatch_ready():
+    with _pending_lock:
+        pending = list(_pending)
+    for job in pending:
+        costly = job['cost'] != admission.DEFAULT_COST_CLASS
+        with _pending_lock:
+            has_capacity = _local_capacity(job['cost'])
+            costly_room = _in_flight['costly'] < max(1, JOB_WORKERS - 1)
+        if not has_capacity:
+            if costly and costly_room and time.monotonic() - job['queued_at'] > COSTLY_JOB_AGING_SECONDS:
+                break
+            continue
+        try:
+            if not admission.try_acquire(JOBS_DB_PATH, job['job_id'], job['cost']):
+                continue
+        except Exception as e:
+            logger.error(f"Error acquiring a slot for job {job['job_id']}: {e}")
+            continue
+        with _pending_lock:
+            _pending.remove(job)
+            _in_flight['total'] += 1
+            if costly:
+                _in_flight['costly'] += 1
+        _start(job, costly)
+
+def _start(job, costly):
+    _mark_started(job['job_id'])
+    metrics.observe('pdf_forge_queue_wait_seconds', time.monotonic() - job['queued_at'], tool=job['tool'])
+
+    def _release():
+        admission.release(JOBS_DB_PATH, job['job_id'])
+        with _pending_lock:
+            _in_flight['total'] -= 1
+            if costly:
+                _in_flight['costly'] -= 1
+        _dispatch_wakeup.set()
+
+    def _finished(future):
+        _release()
+        try:
+            result = future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A process in the pool died (e.g. killed for memory). Only the
+                # jobs that were running fail; any the pool hadn't started yet
+                # go back in the queue for a fresh one.
+                _discard_executor(executor)
+                current = get_job(job['job_id'])
+                if current and current['state'] == QUEUED:
+                    _requeue(job)
+                    return
+            logger.error(f"Job {job['job_id']} ({job['tool']}) crashed: {e}")
+            _set_state(job['job_id'], FAILED, error=str(e))
+            result = {'success': False, 'error': str(e)}
+        if job['on_done']:
+            try:
+                job['on_done'](result)
+            except Exception as e:
+                logger.error(f"Error in completion handler for job {job['job_id']}: {e}")
+
+    executor = _get_executor()
+    try:
+        future = executor.submit(execute_job, job['job_id'], job['tool'], *job['args'])
+    except BrokenProcessPool:
+        _release()
+        _discard_executor(executor)
+        _requeue(job)
+        return
+    except RuntimeError as e:
+        # The pool is shutting down with the worker
+        _release()
+        _set_state(job['job_id'], FAILED, error=str(e))
+        return
+    future.add_done_callback(_finished)
+
+def _dispatch_loop():
+    while True:
+        with _pending_lock:
+            waiting = bool(_pending)
+        # Slots freed by other workers don't wake us, so poll while jobs wait
+        _dispatch_wakeup.wait(DISPATCH_POLL_SECONDS if waiting else None)
+        _dispatch_wakeup.clear()
+        try:
+            _dispatch_ready()
+        except Exception as e:
+            logger.error(f"Job dispatcher error: {e}")
+
+def _ensure_dispatcher():
+    global _dispatcher
+    with _executor_lock:
+        if _dispatcher is None:
+            _dispatcher = threading.Thread(target=_dispatch_loop, name='job-dispatcher', daemon=True)
+            _dispatcher.start()
+
+def submit_job(tool_name, saved_files, params, on_done=None, profile=False):
+    """
+    Queue a tool run and return its job id immediately.
+    `on_done(result)` is called in this process once the job finishes;
+    `profile` runs it under the profiler (see services.profiling).
+    """
+    cost = admission.cost_class(registry.get_tool(tool_name))
+    job_id = create_job(tool_name, cost)
+    with _pending_lock:
+        _pending.append({
+            'job_id': job_id,
+            'tool': tool_name,
+            'cost': cost,
+            'args': (saved_files, params, profile),
+            'on_done': on_done,
+            'queued_at': time.monotonic(),
+        })
+    _ensure_dispatcher()
+    _dispatch_wakeup.set()
+    return job_id
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+init_db()
@@ -0,0 +1,190 @@
+import os
+import re
+import shutil
+import logging
+
+from services.storage import BASE_TEMP_DIR, PROCESSED_FOLDER, connect_db, path_size
+
+logger = logging.getLogger(__name__)
+
+# Counters and histograms live in one SQLite file, so every gunicorn worker
+# and every job process adds to the same totals and any worker can answer
+# /metrics. Gauges (queue depth, disk usage) are read at scrape time, from
+# the job and expiry indexes rather than by walking the temp folders.
+METRICS_DB_PATH = os.path.join(BASE_TEMP_DIR, 'metrics.sqlite3')
+
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+HELP = {
+    'pdf_forge_requests_total': ('counter', 'Tool requests by HTTP status.'),
+    'pdf_forge_errors_total': ('counter', 'Rejected requests and failed jobs.'),
+    'pdf_forge_cache_hits_total': ('counter', 'Requests answered from the result cache.'),
+    'pdf_forge_tool_duration_seconds': ('histogram', 'Time spent running the tool in a job process.'),
+    'pdf_forge_job_latency_seconds': ('histogram', 'Time from submission to result, including queue wait.'),
+    'pdf_forge_pages_processed_total': ('counter', 'PDF pages in the inputs of successful jobs.'),
+    'pdf_forge_input_bytes_total': ('counter', 'Bytes of input processed by successful jobs.'),
+    'pdf_forge_output_bytes_total': ('counter', 'Bytes of output written by successful jobs.'),
+    'pdf_forge_compression_ratio': ('histogram', 'Output size over input size reported by compress.'),
+    'pdf_forge_queue_wait_seconds': ('histogram', 'Time a job waited for a slot in its cost class.'),
+    'pdf_forge_jobs': ('gauge', 'Jobs currently known, by state.'),
+    'pdf_forge_class_running': ('gauge', 'Jobs holding a run slot, by cost class.'),
+    'pdf_forge_class_queued': ('gauge', 'Jobs waiting for a run slot, by cost class.'),
+    'pdf_forge_class_limit': ('gauge', 'Concurrent jobs allowed, by cost class.'),
+    'pdf_forge_temp_items': ('gauge', 'Temp files and folders tracked for expiry.'),
+    'pdf_forge_temp_bytes': ('gauge', 'Bytes in temp files and folders tracked for expiry.'),
+    'pdf_forge_temp_due_bytes': ('gauge', 'Bytes past their expiry and not yet deleted.'),
+    'pdf_forge_temp_free_bytes': ('gauge', 'Free space on the temp filesystem.'),
+}
+
+def _connect():
+    return connect_db(METRICS_DB_PATH)
+
+def init_db():
+    conn = _connect()
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS samples ('
+            ' name TEXT NOT NULL,'
+            ' labels TEXT NOT NULL,'
+            ' value REAL NOT NULL,'
+            ' PRIMARY KEY (name, labels))'
+        )
+    finally:
+        conn.close()
+
+def _labels(labels):
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+def _add_all(samples):
+    """Add (name, labels dict, amount) samples in one transaction."""
+    try:
+        conn = _connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value',
+                [(name, _labels(labels), amount) for name, labels, amount in samples]
+            )
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+    except Exception as e:
+        # Metrics must never break a request or a job
+        logger.error(f"Error recording metrics: {e}")
+
+def _histogram(name, labels, value, buckets):
+    samples = [(name + '_count', labels, 1), (name + '_sum', labels, value)]
+    for bound in buckets + (float('inf'),):
+        if value <= bound:
+            samples.append((name + '_bucket', dict(labels, le=_format_bound(bound)), 1))
+    return samples
+
+def inc(name, amount=1, **labels):
+    _add_all([(name, labels, amount)])
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    _add_all(_histogram(name, labels, value, buckets))
+
+def record_request(tool_name, status):
+    samples = [('pdf_forge_requests_total', {'tool': tool_name, 'status': str(status)}, 1)]
+    if status >= 400:
+        samples.append(('pdf_forge_errors_total', {'tool': tool_name, 'stage': 'request'}, 1))
+    _add_all(samples)
+
+def _page_count(path):
+    if not path.lower().endswith('.pdf'):
+        return 0
+    try:
+        import fitz
+        with fitz.open(path) as doc:
+            return doc.page_count
+    except Exception:
+        return 0
+
+def _output_size(result):
+    if result.get('output_folder'):
+        return path_size(os.path.join(PROCESSED_FOLDER, result['output_folder']))
+    if result.get('output_path') and os.path.exists(result['output_path']):
+        return os.path.getsize(result['output_path'])
+    return 0
+
+def record_job(tool_name, input_paths, result, duration):
+    """Called in the job process once the tool has returned."""
+    labels = {'tool': tool_name}
+    samples = _histogram('pdf_forge_tool_duration_seconds', labels, duration, DURATION_BUCKETS)
+    if not result.get('success'):
+        samples.append(('pdf_forge_errors_total', {'tool': tool_name, 'stage': 'job'}, 1))
+        _add_all(samples)
+        return
+
+    input_bytes = sum(os.path.getsize(p) for p in input_paths if os.path.exists(p))
+    samples.append(('pdf_forge_input_bytes_total', labels, input_bytes))
+    samples.append(('pdf_forge_output_bytes_total', labels, _output_size(result)))
+    samples.append(('pdf_forge_pages_processed_total', labels, sum(_page_count(p) for p in input_paths)))
+    if result.get('original_size'):
+        ratio = result.get('new_size', 0) / result['original_size']
+        samples.extend(_histogram('pdf_forge_compression_ratio', labels, ratio, RATIO_BUCKETS))
+    _add_all(samples)
+
+def _gauges(job_counts, class_usage, storage):
+    lines = []
+    for state, count in sorted(job_counts.items()):
+        lines.append(('pdf_forge_jobs', {'state': state}, count))
+    for cost, usage in sorted(class_usage.items()):
+        lines.append(('pdf_forge_class_running', {'class': cost}, usage['running']))
+        lines.append(('pdf_forge_class_queued', {'class': cost}, usage['queued']))
+        lines.append(('pdf_forge_class_limit', {'class': cost}, usage['limit']))
+    if storage:
+        lines.append(('pdf_forge_temp_items', {}, storage['tracked_items']))
+        lines.append(('pdf_forge_temp_bytes', {}, storage['tracked_bytes']))
+        lines.append(('pdf_forge_temp_due_bytes', {}, storage['pending_bytes']))
+    lines.append(('pdf_forge_temp_free_bytes', {}, shutil.disk_usage(BASE_TEMP_DIR).free))
+    return lines
+
+def _family(sample_name):
+    for suffix in ('_bucket', '_count', '_sum'):
+        if sample_name.endswith(suffix) and sample_name[:-len(suffix)] in HELP:
+            return sample_name[:-len(suffix)]
+    return sample_name
+
+def _sort_key(row):
+    # Buckets in numeric order of their bound, not string order
+    name, labels, value = row
+    bound = re.search(r'le="([^"]+)"', labels)
+    return (name, re.sub(r'le="[^"]+",?', '', labels), float(bound.group(1)) if bound else 0)
+
+def render(job_counts, class_usage=None, storage=None):
+    """
+    Prometheus text exposition of everything recorded so far plus the current
+    gauges. `storage` is expiry.stats().
+    """
+    conn = _connect()
+    try:
+        rows = conn.execute('SELECT name, labels, value FROM samples').fetchall()
+    finally:
+        conn.close()
+    rows += [(name, _labels(labels), value) for name, labels, value in _gauges(job_counts, class_usage or {}, storage)]
+
+    families = {}
+    for name, labels, value in rows:
+        families.setdefault(_family(name), []).append((name, labels, value))
+
+    lines = []
+    for family in sorted(families):
+        kind, text = HELP.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for name, labels, value in sorted(families[family], key=_sort_key):
+            value = int(value) if float(value).is_integer() else value
+            lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+init_db()
@@ -0,0 +1,58 @@
+import os
+import hashlib
+import threading
+from email.utils import formatdate
+from flask import Response, current_app, request
+
+# Rendered HTML of the content pages, which only change between deploys.
+# Keyed by host and route so og:url stays correct behind several domains;
+# the cap keeps arbitrary Host headers from growing it without bound.
+PAGE_CACHE_MAX_ENTRIES = 256
+
+_pages = {}
+_lock = threading.Lock()
+_last_modified = None
+
+def _templates_mtime():
+    """Newest mtime of anything that feeds the pages, identical in every worker."""
+    app = current_app
+    paths = [os.path.join(app.root_path, app.template_folder),
+             os.path.join(app.root_path, 'content')]
+    newest = 0
+    for path in paths:
+        for root, dirs, files in os.walk(path):
+            for name in files:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+    return newest
+
+def cached_page(key, render):
+    """
+    Serve the page built by `render()` from memory, with a strong ETag and
+    Last-Modified so browsers revalidate with a 304 instead of a re-download.
+    """
+    global _last_modified
+    if current_app.debug:
+        # Templates auto-reload in debug mode; don't pin stale output
+        return render()
+
+    cache_key = (request.host, key)
+    entry = _pages.get(cache_key)
+    if entry is None:
+        body = render().encode('utf-8')
+        entry = (body, hashlib.sha256(body).hexdigest())
+        with _lock:
+            if _last_modified is None:
+                _last_modified = formatdate(_templates_mtime(), usegmt=True)
+            if len(_pages) < PAGE_CACHE_MAX_ENTRIES:
+                _pages[cache_key] = entry
+
+    body, etag = entry
+    response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Last-Modified'] = _last_modified
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
+
+def clear():
+    with _lock:
+        _pages.clear()
@@ -0,0 +1,67 @@
+import os
+import shutil
+
+from tools import registry
+from services.storage import PROCESSED_FOLDER, generate_unique_filename, new_output_folder
+
+SUPPORTED_TOOLS = tuple(registry.TOOLS)
+
+def output_file(output_filename):
+    return os.path.join(PROCESSED_FOLDER, generate_unique_filename(output_filename))
+
+def run_tool(tool_name, saved_files, params):
+    """
+    Run a single tool on already-saved input files.
+    `params` is a plain dict of the submitted form fields, so this can run
+    outside of a request context (e.g. in a job worker process).
+    """
+    spec = registry.get_tool(tool_name)
+    if spec is None:
+        return {'success': False, 'error': 'Unknown tool'}
+
+    func = registry.load_function(tool_name)
+    args = registry.parse_params(tool_name, params)
+    inputs = saved_files if spec['multiple'] else saved_files[0]
+
+    output_folder = None
+    if spec['output'] == 'folder':
+        output_folder = new_output_folder()
+        result = func(inputs, output_folder, *args)
+    else:
+        result = func(inputs, output_file(spec['output_name']), *args)
+
+    if not result or not result.get('success'):
+        if output_folder:
+            shutil.rmtree(output_folder, ignore_errors=True)
+        return result or {'success': False, 'error': 'Processing failed'}
+
+    if spec.get('single_output_name') and not result.get('is_folder'):
+        # Move the lone output next to the other processed files and drop the folder
+        stem = os.path.splitext(spec['single_output_name'])[0]
+        unique_name = generate_unique_filename(stem + os.path.splitext(result['output_path'])[1])
+        new_path = os.path.join(PROCESSED_FOLDER, unique_name)
+        shutil.move(result['output_path'], new_path)
+        shutil.rmtree(output_folder, ignore_errors=True)
+        result['filename'] = unique_name
+        result['output_path'] = new_path
+        result['files'] = [new_path]
+
+    return normalize_result(result)
+
+def normalize_result(result):
+    if 'output_path' in result:
+        # Ensure the filename sent to frontend is just the basename
+        result['filename'] = os.path.basename(result['output_path'])
+
+    if 'files' in result and isinstance(result['files'], list):
+        # For split PDF, files are in a subfolder, so we need the relative path from PROCESSED_FOLDER
+        # e.g. /tmp/pdf-forge/processed/xyz/page_1.pdf -> xyz/page_1.pdf
+        normalized_files = []
+        for f in result['files']:
+            try:
+                normalized_files.append(os.path.relpath(f, PROCESSED_FOLDER))
+            except ValueError:
+                normalized_files.append(os.path.basename(f))
+        result['files'] = normalized_files
+
+    return result
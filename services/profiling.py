@@ -0,0 +1,87 @@
+import io
+import os
+import hmac
+import time
+import random
+import pstats
+import cProfile
+import tracemalloc
+
+from services.storage import DIAGNOSTICS_FOLDER
+from services import expiry
+
+# Opt-in profiling of tool runs. A request is profiled when it carries
+# X-Profile-Token matching PROFILE_ADMIN_TOKEN, or when it is picked by
+# PROFILE_SAMPLE_RATE (0.0 - 1.0). The job process then writes
+# <job_id>.prof (load with pstats/snakeviz) and <job_id>.txt (hot functions
+# and top allocation sites) to DIAGNOSTICS_FOLDER, served at /diagnostics/
+# only to requests carrying the admin token.
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+DIAGNOSTICS_TTL_SECONDS = 24 * 3600
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 5
+
+def is_admin(token):
+    return bool(PROFILE_ADMIN_TOKEN and token and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN))
+
+def should_profile(headers):
+    if is_admin(headers.get(PROFILE_HEADER)):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def _report(tool_name, duration, profiler, snapshot, peak):
+    out = io.StringIO()
+    out.write(f"tool: {tool_name}\n")
+    out.write(f"wall time: {duration:.3f}s\n")
+    out.write(f"peak traced memory: {peak / (1024 * 1024):.1f} MB\n\n")
+
+    out.write(f"== Top {TOP_FUNCTIONS} functions by cumulative time ==\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+    out.write(f"\n== Top {TOP_ALLOCATIONS} allocation sites still held at the end of the run ==\n")
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ])
+    for stat in snapshot.statistics('traceback')[:TOP_ALLOCATIONS]:
+        out.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+        for line in stat.traceback.format():
+            out.write(f"    {line}\n")
+    return out.getvalue()
+
+def run_profiled(job_id, tool_name, func, *args):
+    """
+    Call func(*args) under cProfile and tracemalloc. Returns the function's
+    result (or an error result if it raised) and the diagnostics file names.
+    """
+    profiler = cProfile.Profile()
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    started = time.monotonic()
+    profiler.enable()
+    try:
+        result = func(*args)
+    except Exception as e:
+        # A crash is exactly the run worth looking at, so still write the files
+        result = {'success': False, 'error': str(e)}
+    profiler.disable()
+    duration = time.monotonic() - started
+    snapshot = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    prof_name = f"{job_id}.prof"
+    report_name = f"{job_id}.txt"
+    prof_path = os.path.join(DIAGNOSTICS_FOLDER, prof_name)
+    report_path = os.path.join(DIAGNOSTICS_FOLDER, report_name)
+    profiler.dump_stats(prof_path)
+    with open(report_path, 'w') as f:
+        f.write(_report(tool_name, duration, profiler, snapshot, peak))
+    expiry.register(prof_path, DIAGNOSTICS_TTL_SECONDS)
+    expiry.register(report_path, DIAGNOSTICS_TTL_SECONDS)
+
+    return result, {'profile': prof_name, 'report': report_name}
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+
+from services.storage import (
+    BASE_TEMP_DIR, PROCESSED_FOLDER, CACHE_FOLDER, connect_db, hash_file, link_or_copy, path_size,
+    generate_unique_filename, new_output_folder,
+)
+from services import expiry
+
+logger = logging.getLogger(__name__)
+
+# Tool results keyed by (input sha256s, tool, normalized params). Outputs are
+# hardlinked into CACHE_FOLDER and tracked by the expiry index like any other
+# temp file; a hit links them back into PROCESSED_FOLDER under fresh names.
+CACHE_DB_PATH = os.path.join(BASE_TEMP_DIR, 'result_cache.sqlite3')
+CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+CACHE_TTL_SECONDS = 1800
+
+# Form fields that identify the input rather than change the output
+IGNORED_PARAMS = {'server_filename'}
+
+_UNIQUE_SUFFIX = re.compile(r'_[0-9a-f]{8}(\.[^.]+)?$')
+
+def _connect():
+    return connect_db(CACHE_DB_PATH)
+
+def init_db():
+    conn = _connect()
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' key TEXT PRIMARY KEY,'
+            ' tool TEXT NOT NULL,'
+            ' result TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        conn.execute('CREATE TABLE IF NOT EXISTS input_hashes (path TEXT PRIMARY KEY, sha256 TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    finally:
+        conn.close()
+
+def _bump(conn, name, amount=1):
+    conn.execute(
+        'INSERT INTO counters (name, value) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+        (name, amount)
+    )
+
+def remember_hash(filepath, sha256):
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT OR REPLACE INTO input_hashes (path, sha256) VALUES (?, ?)',
+            (os.path.abspath(filepath), sha256)
+        )
+    finally:
+        conn.close()
+
+def input_hash(filepath):
+    """Hash recorded when the file was uploaded, or computed now if it is unknown."""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT sha256 FROM input_hashes WHERE path = ?', (os.path.abspath(filepath),)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row:
+        return row[0]
+    sha256 = hash_file(filepath)
+    remember_hash(filepath, sha256)
+    return sha256
+
+def purge_input_hashes():
+    conn = _connect()
+    try:
+        paths = [row[0] for row in conn.execute('SELECT path FROM input_hashes')]
+        for path in paths:
+            if not os.path.exists(path):
+                conn.execute('DELETE FROM input_hashes WHERE path = ?', (path,))
+    finally:
+        conn.close()
+
+def make_key(tool_name, input_hashes, params):
+    normalized = {
+        k: str(v).strip() for k, v in params.items() if k not in IGNORED_PARAMS
+    }
+    payload = json.dumps(
+        {'tool': tool_name, 'inputs': list(input_hashes), 'params': normalized},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _entry_dir(key):
+    return os.path.join(CACHE_FOLDER, key)
+
+def _fresh_name(cached_name):
+    # compressed_1a2b3c4d.pdf -> compressed_<new id>.pdf
+    return generate_unique_filename(_UNIQUE_SUFFIX.sub(r'\1', cached_name))
+
+def lookup(key):
+    """Return a result dict with fresh copies of the cached outputs, or None on a miss."""
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        entry_dir = _entry_dir(key)
+        if row is None or not os.path.isdir(entry_dir):
+            if row is not None:
+                # The expiry reaper already removed the outputs
+                conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            _bump(conn, 'misses')
+            return None
+
+        result = json.loads(row[0])
+        try:
+            result = _materialize(entry_dir, result)
+        except OSError as e:
+            logger.error(f"Error restoring cached result {key}: {e}")
+            conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            _bump(conn, 'misses')
+            return None
+
+        conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        _bump(conn, 'hits')
+    finally:
+        conn.close()
+    expiry.register(entry_dir, CACHE_TTL_SECONDS)
+    return result
+
+def _materialize(entry_dir, result):
+    result = dict(result)
+    if result.get('output_folder'):
+        output_folder = new_output_folder()
+        folder_id = os.path.basename(output_folder)
+        cached_folder = os.path.join(entry_dir, 'folder')
+        files = []
+        for rel in result.get('files', []):
+            name = os.path.basename(rel)
+            link_or_copy(os.path.join(cached_folder, name), os.path.join(output_folder, name))
+            files.append(f"{folder_id}/{name}")
+        result['output_folder'] = folder_id
+        result['files'] = files
+    elif result.get('filename'):
+        new_name = _fresh_name(result['filename'])
+        new_path = os.path.join(PROCESSED_FOLDER, new_name)
+        link_or_copy(os.path.join(entry_dir, result['filename']), new_path)
+        result['output_path'] = new_path
+        result['filename'] = new_name
+        if 'files' in result:
+            result['files'] = [new_name]
+    result['cached'] = True
+    return result
+
+def store(key, tool_name, result):
+    """Keep the outputs of a successful run so identical requests can reuse them."""
+    entry_dir = _entry_dir(key)
+    if os.path.isdir(entry_dir):
+        return
+    staging = entry_dir + '.tmp-' + os.urandom(4).hex()
+    try:
+        os.makedirs(staging)
+        if result.get('output_folder'):
+            src_folder = os.path.join(PROCESSED_FOLDER, result['output_folder'])
+            dst_folder = os.path.join(staging, 'folder')
+            os.makedirs(dst_folder)
+            for rel in result.get('files', []):
+                name = os.path.basename(rel)
+                link_or_copy(os.path.join(src_folder, name), os.path.join(dst_folder, name))
+        elif result.get('output_path'):
+            link_or_copy(result['output_path'], os.path.join(staging, result['filename']))
+        else:
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        os.rename(staging, entry_dir)
+    except OSError as e:
+        # Another worker stored the same key first, or the outputs are gone
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.isdir(entry_dir):
+            logger.error(f"Error caching result for {tool_name}: {e}")
+        return
+
+    cached = {k: v for k, v in result.items() if k not in ('output_path', 'diagnostics')}
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT OR REPLACE INTO results (key, tool, result, size, last_used) VALUES (?, ?, ?, ?, ?)',
+            (key, tool_name, json.dumps(cached), path_size(entry_dir), time.time())
+        )
+        _bump(conn, 'stores')
+    finally:
+        conn.close()
+    expiry.register(entry_dir, CACHE_TTL_SECONDS)
+    evict()
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """Drop least recently used entries until the cache fits in `max_bytes`."""
+    conn = _connect()
+    try:
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= max_bytes:
+            return
+        rows = conn.execute('SELECT key, size FROM results ORDER BY last_used').fetchall()
+        for key, size in rows:
+            if total <= max_bytes:
+                break
+            if conn.execute('DELETE FROM results WHERE key = ?', (key,)).rowcount:
+                shutil.rmtree(_entry_dir(key), ignore_errors=True)
+                _bump(conn, 'evictions')
+            total -= size
+    finally:
+        conn.close()
+
+def stats():
+    conn = _connect()
+    try:
+        entries, size = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results'
+        ).fetchone()
+        counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+    finally:
+        conn.close()
+    return {
+        'entries': entries,
+        'bytes': size,
+        'max_bytes': CACHE_MAX_BYTES,
+        'hits': counters.get('hits', 0),
+        'misses': counters.get('misses', 0),
+        'stores': counters.get('stores', 0),
+        'evictions': counters.get('evictions', 0),
+    }
+
+init_db()
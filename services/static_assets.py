@@ -0,0 +1,54 @@
+import os
+import re
+import hashlib
+
+# url_for('static', filename='js/main.js') becomes /static/js/main.<hash>.js.
+# A fingerprinted URL never changes content, so it can be cached for a year;
+# a new deploy changes the hash and therefore the URL.
+FINGERPRINT_LENGTH = 10
+FAR_FUTURE_SECONDS = 365 * 24 * 3600
+
+_FINGERPRINTED = re.compile(r'^(?P<base>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % FINGERPRINT_LENGTH)
+
+def _scan(static_folder):
+    fingerprints = {}
+    for root, dirs, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                digest = hashlib.md5(f.read()).hexdigest()[:FINGERPRINT_LENGTH]
+            rel = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            fingerprints[rel] = digest
+    return fingerprints
+
+def fingerprinted_name(fingerprints, filename):
+    digest = fingerprints.get(filename)
+    if not digest:
+        return filename
+    base, ext = os.path.splitext(filename)
+    return f"{base}.{digest}{ext}"
+
+def init_app(app):
+    fingerprints = _scan(app.static_folder)
+    static_view = app.view_functions['static']
+
+    @app.url_defaults
+    def add_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and not app.debug:
+            values['filename'] = fingerprinted_name(fingerprints, values['filename'])
+
+    def serve_static(filename):
+        match = _FINGERPRINTED.match(filename)
+        if match:
+            original = match.group('base') + match.group('ext')
+            if original in fingerprints:
+                response = static_view(filename=original)
+                if fingerprints[original] == match.group('hash'):
+                    response.cache_control.no_cache = None
+                    response.cache_control.public = True
+                    response.cache_control.max_age = FAR_FUTURE_SECONDS
+                    response.cache_control.immutable = True
+                return response
+        return static_view(filename=filename)
+
+    app.view_functions['static'] = serve_static
@@ -0,0 +1,80 @@
+import os
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+import uuid
+from werkzeug.utils import secure_filename
+
+# Use system temp directory
+BASE_TEMP_DIR = os.path.join(tempfile.gettempdir(), 'pdf-forge')
+UPLOAD_FOLDER = os.path.join(BASE_TEMP_DIR, 'uploads')
+PROCESSED_FOLDER = os.path.join(BASE_TEMP_DIR, 'processed')
+CACHE_FOLDER = os.path.join(BASE_TEMP_DIR, 'cache')
+DIAGNOSTICS_FOLDER = os.path.join(BASE_TEMP_DIR, 'diagnostics')
+# Bounded by its own LRU (services/thumbnails.py), not by the expiry reaper
+THUMBNAIL_FOLDER = os.path.join(BASE_TEMP_DIR, 'thumbnails')
+
+# Ensure directories exist
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(PROCESSED_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
+os.makedirs(DIAGNOSTICS_FOLDER, exist_ok=True)
+os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+
+def generate_unique_filename(original_filename):
+    ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
+    unique_id = str(uuid.uuid4())[:8]
+    base_name = secure_filename(original_filename.rsplit('.', 1)[0] if '.' in original_filename else original_filename)
+    return f"{base_name}_{unique_id}.{ext}" if ext else f"{base_name}_{unique_id}"
+
+def new_output_folder():
+    output_folder = os.path.join(PROCESSED_FOLDER, str(uuid.uuid4())[:8])
+    os.makedirs(output_folder, exist_ok=True)
+    return output_folder
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def save_stream(stream, filepath, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Write an upload stream to disk, hashing it on the way. Returns the sha256 hex digest."""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as out:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+def hash_file(filepath, chunk_size=UPLOAD_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def link_or_copy(src, dst):
+    """Hardlink when possible so cached results cost no extra disk space."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def connect_db(path):
+    """Open one of the small SQLite state files shared by all workers."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
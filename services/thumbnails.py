@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import uuid
+import logging
+
+from services.storage import BASE_TEMP_DIR, THUMBNAIL_FOLDER, connect_db
+from services import admission
+from services.jobs import JOBS_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Page thumbnails for the page pickers, rendered here so a 1,000-page
+# document needn't be loaded into pdf.js in the browser. Renders are JPEGs in
+# THUMBNAIL_FOLDER named by (input sha256, pages, width), so the same
+# document uploaded again finds them; an index of when each was last used
+# evicts the oldest once they add up to more than THUMBNAIL_CACHE_MAX_BYTES.
+THUMBNAIL_DB_PATH = os.path.join(BASE_TEMP_DIR, 'thumbnails.sqlite3')
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get('THUMBNAIL_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Requested widths are rounded up to one of these, so clients share renders
+THUMBNAIL_WIDTHS = (100, 150, 200, 300, 600)
+THUMBNAIL_QUALITY = 75
+# A sprite sheet holds up to SPRITE_MAX_PAGES pages, SPRITE_COLUMNS to a row
+SPRITE_MAX_PAGES = 50
+SPRITE_COLUMNS = 10
+# Uses of a render closer together than this don't update its last use
+TOUCH_INTERVAL_SECONDS = 60
+# Renders run in the web worker rather than a job process, but hold a slot of
+# this cost class while they do, so thumbnails and the tools' jobs share the
+# class limits. With none free the request is turned away (Busy).
+RENDER_COST_CLASS = admission.DEFAULT_COST_CLASS
+RENDER_RETRY_AFTER_SECONDS = 1
+
+class Busy(Exception):
+    """No slot of RENDER_COST_CLASS was free for a render."""
+
+def _connect():
+    return connect_db(THUMBNAIL_DB_PATH)
+
+def init_db():
+    conn = _connect()
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS thumbnails ('
+            ' name TEXT PRIMARY KEY,'
+            ' size INTEGER NOT NULL,'
+            ' meta TEXT,'
+            ' last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS thumbnails_last_used ON thumbnails (last_used)')
+        conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    finally:
+        conn.close()
+
+def _bump(conn, name, amount=1):
+    conn.execute(
+        'INSERT INTO counters (name, value) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+        (name, amount)
+    )
+
+def thumbnail_width(width):
+    """The smallest of THUMBNAIL_WIDTHS at least `width` wide, or the largest."""
+    for allowed in THUMBNAIL_WIDTHS:
+        if allowed >= width:
+            return allowed
+    return THUMBNAIL_WIDTHS[-1]
+
+def document_info(path):
+    """Page count and the size in points of every page, for laying out a grid before any render."""
+    # Imported here so the web worker only loads PyMuPDF and Pillow when
+    # thumbnails are asked for
+    import fitz
+    with fitz.open(path) as pdf:
+        if pdf.needs_pass:
+            return {'success': False, 'error': 'PDF is password protected'}
+        return {
+            'success': True,
+            'page_count': len(pdf),
+            'pages': [[round(page.rect.width, 1), round(page.rect.height, 1)] for page in pdf],
+        }
+
+def _render(pdf, page_num, width):
+    import fitz
+    from PIL import Image
+    page = pdf[page_num]
+    zoom = width / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    return Image.frombytes('RGB', (pix.width, pix.height), pix.samples, 'raw', 'RGB', pix.stride)
+
+def _page_count(path):
+    import fitz
+    with fitz.open(path) as pdf:
+        return len(pdf)
+
+def _open_pages(path, first, last):
+    import fitz
+    pdf = fitz.open(path)
+    if pdf.needs_pass:
+        pdf.close()
+        raise ValueError('PDF is password protected')
+    if not 1 <= first <= last <= len(pdf):
+        pdf.close()
+        raise ValueError('Page out of range')
+    return pdf
+
+def _cached(name, render):
+    """
+    (path, meta) of the render called `name`, making it on a miss with
+    render(), which returns (image, meta); meta is anything JSON.
+    """
+    path = os.path.join(THUMBNAIL_FOLDER, name)
+    now = time.time()
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT meta FROM thumbnails WHERE name = ?', (name,)).fetchone()
+        if row is not None and os.path.exists(path):
+            conn.execute(
+                'UPDATE thumbnails SET last_used = ? WHERE name = ? AND last_used < ?',
+                (now, name, now - TOUCH_INTERVAL_SECONDS)
+            )
+            _bump(conn, 'hits')
+            return path, json.loads(row[0]) if row[0] else None
+        _bump(conn, 'misses')
+    finally:
+        conn.close()
+
+    slot_id = f'thumbnail-{uuid.uuid4().hex}'
+    if not admission.try_acquire(JOBS_DB_PATH, slot_id, RENDER_COST_CLASS):
+        raise Busy()
+    try:
+        image, meta = render()
+    finally:
+        admission.release(JOBS_DB_PATH, slot_id)
+    # Written aside and renamed, so a concurrent request never reads half a file
+    partial_path = f"{path}.{os.getpid()}.{os.urandom(4).hex()}.part"
+    image.save(partial_path, 'JPEG', quality=THUMBNAIL_QUALITY)
+    os.replace(partial_path, path)
+
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT OR REPLACE INTO thumbnails (name, size, meta, last_used) VALUES (?, ?, ?, ?)',
+            (name, os.path.getsize(path), json.dumps(meta) if meta is not None else None, now)
+        )
+    finally:
+        conn.close()
+    evict()
+    return path, meta
+
+def page_thumbnail(path, sha256, page_number, width):
+    """Path of a JPEG of 1-based `page_number`, `width` (see thumbnail_width) pixels wide."""
+    width = thumbnail_width(width)
+
+    def render():
+        pdf = _open_pages(path, page_number, page_number)
+        try:
+            return _render(pdf, page_number - 1, width), None
+        finally:
+            pdf.close()
+
+    return _cached(f'{sha256}-{page_number}-{width}.jpg', render)[0]
+
+def sprite_sheet(path, sha256, first, last, width):
+    """
+    Path of one JPEG of pages `first` to `last` (1-based, at most
+    SPRITE_MAX_PAGES and no further than the last page) and where each page
+    is on it, as [x, y, width, height].
+    """
+    width = thumbnail_width(width)
+    last = min(last, first + SPRITE_MAX_PAGES - 1, max(first, _page_count(path)))
+
+    def render():
+        from PIL import Image
+        pdf = _open_pages(path, first, last)
+        try:
+            images = [_render(pdf, page_num, width) for page_num in range(first - 1, last)]
+        finally:
+            pdf.close()
+        cell_height = max(image.height for image in images)
+        columns = min(SPRITE_COLUMNS, len(images))
+        rows = -(-len(images) // columns)
+        sheet = Image.new('RGB', (columns * width, rows * cell_height), 'white')
+        frames = []
+        for i, image in enumerate(images):
+            x, y = i % columns * width, i // columns * cell_height
+            sheet.paste(image, (x, y))
+            frames.append([x, y, image.width, image.height])
+        return sheet, frames
+
+    return _cached(f'{sha256}-{first}-{last}-{width}-sprite.jpg', render)
+
+def evict(max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+    """Drop least recently used renders until they fit in `max_bytes`."""
+    conn = _connect()
+    try:
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM thumbnails').fetchone()[0]
+        if total <= max_bytes:
+            return
+        rows = conn.execute('SELECT name, size FROM thumbnails ORDER BY last_used').fetchall()
+        for name, size in rows:
+            if total <= max_bytes:
+                break
+            if conn.execute('DELETE FROM thumbnails WHERE name = ?', (name,)).rowcount:
+                try:
+                    os.remove(os.path.join(THUMBNAIL_FOLDER, name))
+                except OSError:
+                    pass
+                _bump(conn, 'evictions')
+            total -= size
+    finally:
+        conn.close()
+
+def stats():
+    conn = _connect()
+    try:
+        entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM thumbnails').fetchone()
+        counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+    finally:
+        conn.close()
+    return {
+        'entries': entries,
+        'bytes': size,
+        'max_bytes': THUMBNAIL_CACHE_MAX_BYTES,
+        'hits': counters.get('hits', 0),
+        'misses': counters.get('misses', 0),
+        'evictions': counters.get('evictions', 0),
+    }
+
+init_db()
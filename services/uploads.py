@@ -0,0 +1,206 @@
+import os
+import time
+import uuid
+import hashlib
+import threading
+
+from services.storage import BASE_TEMP_DIR, UPLOAD_FOLDER, connect_db, generate_unique_filename
+from services import expiry
+
+# Resumable uploads: init reserves a file in UPLOAD_FOLDER, each chunk is
+# written straight into it at its offset, finalize checks and hashes it.
+# Progress lives in SQLite so chunks can land on any gunicorn worker.
+UPLOADS_DB_PATH = os.path.join(BASE_TEMP_DIR, 'uploads.sqlite3')
+CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+# Partial uploads stay around while the client keeps sending chunks
+PARTIAL_TTL_SECONDS = 1800
+
+MAGIC_BYTES = {
+    'pdf': [b'%PDF-'],
+    'jpg': [b'\xff\xd8\xff'],
+    'jpeg': [b'\xff\xd8\xff'],
+    'png': [b'\x89PNG\r\n\x1a\n'],
+    'docx': [b'PK\x03\x04'],
+    'xlsx': [b'PK\x03\x04'],
+    'pptx': [b'PK\x03\x04'],
+}
+
+# Running sha256 per upload, valid up to `hashed` bytes. Another worker may
+# have received some of the chunks; the gap is then read back from disk.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+def _connect():
+    return connect_db(UPLOADS_DB_PATH)
+
+def init_db():
+    conn = _connect()
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS uploads ('
+            ' id TEXT PRIMARY KEY,'
+            ' filename TEXT NOT NULL,'
+            ' original_name TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' received INTEGER NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+    finally:
+        conn.close()
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+def get_upload(upload_id):
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT id, filename, original_name, size, received FROM uploads WHERE id = ?',
+            (upload_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {
+        'upload_id': row[0],
+        'filename': row[1],
+        'original_name': row[2],
+        'size': row[3],
+        'offset': row[4],
+        'path': os.path.join(UPLOAD_FOLDER, row[1]),
+    }
+
+def init_upload(original_name, size):
+    if size <= 0:
+        return {'success': False, 'error': 'Upload size must be positive'}
+    filename = generate_unique_filename(original_name)
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    open(filepath, 'wb').close()
+    expiry.register(filepath, PARTIAL_TTL_SECONDS)
+
+    upload_id = uuid.uuid4().hex
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO uploads (id, filename, original_name, size, received, updated_at) VALUES (?, ?, ?, ?, 0, ?)',
+            (upload_id, filename, original_name, size, time.time())
+        )
+    finally:
+        conn.close()
+    return {'success': True, 'upload_id': upload_id, 'offset': 0, 'size': size, 'chunk_size': CHUNK_SIZE}
+
+def _hasher_at(upload_id, filepath, offset):
+    """Return a sha256 object that has consumed exactly the first `offset` bytes."""
+    with _hashers_lock:
+        hasher, hashed = _hashers.pop(upload_id, (None, 0))
+    if hasher is None or hashed > offset:
+        hasher, hashed = hashlib.sha256(), 0
+    if hashed < offset:
+        with open(filepath, 'rb') as f:
+            f.seek(hashed)
+            remaining = offset - hashed
+            while remaining > 0:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+    return hasher
+
+def _valid_header(filename, head):
+    signatures = MAGIC_BYTES.get(_extension(filename))
+    if not signatures:
+        return True
+    if _extension(filename) == 'pdf':
+        # Some generators put junk before the header; readers accept it in the first 1 KB
+        return b'%PDF-' in head[:1024]
+    return any(head.startswith(sig) for sig in signatures)
+
+def write_chunk(upload_id, offset, stream, length):
+    """Write `length` bytes from `stream` at `offset`. A short read still advances the offset."""
+    upload = get_upload(upload_id)
+    if upload is None:
+        return {'success': False, 'error': 'Upload not found or expired', 'status': 404}
+    if length > MAX_CHUNK_SIZE:
+        return {'success': False, 'error': 'Chunk too large', 'status': 413}
+    if offset + length <= upload['offset'] and length > 0:
+        # Retry of a chunk we already have
+        return {'success': True, 'offset': upload['offset'], 'size': upload['size']}
+    if offset != upload['offset']:
+        return {'success': False, 'error': 'Unexpected offset', 'offset': upload['offset'], 'status': 409}
+    if offset + length > upload['size']:
+        return {'success': False, 'error': 'Chunk exceeds declared upload size', 'status': 400}
+
+    hasher = _hasher_at(upload_id, upload['path'], offset)
+    received = 0
+    with open(upload['path'], 'r+b') as out:
+        out.seek(offset)
+        while received < length:
+            data = stream.read(min(READ_SIZE, length - received))
+            if not data:
+                break
+            if offset == 0 and received == 0 and not _valid_header(upload['filename'], data):
+                return {'success': False, 'error': 'File content does not match its type', 'status': 415}
+            hasher.update(data)
+            out.write(data)
+            received += len(data)
+
+    new_offset = offset + received
+    conn = _connect()
+    try:
+        advanced = conn.execute(
+            'UPDATE uploads SET received = ?, updated_at = ? WHERE id = ? AND received = ?',
+            (new_offset, time.time(), upload_id, offset)
+        ).rowcount
+    finally:
+        conn.close()
+    if not advanced:
+        # A concurrent retry of the same chunk won the race
+        current = get_upload(upload_id)
+        return {'success': True, 'offset': current['offset'] if current else new_offset, 'size': upload['size']}
+
+    with _hashers_lock:
+        _hashers[upload_id] = (hasher, new_offset)
+    expiry.register(upload['path'], PARTIAL_TTL_SECONDS)
+    return {'success': True, 'offset': new_offset, 'size': upload['size']}
+
+def finalize_upload(upload_id):
+    upload = get_upload(upload_id)
+    if upload is None:
+        return {'success': False, 'error': 'Upload not found or expired', 'status': 404}
+    if upload['offset'] != upload['size']:
+        return {'success': False, 'error': 'Upload incomplete', 'offset': upload['offset'], 'status': 409}
+    if os.path.getsize(upload['path']) != upload['size']:
+        return {'success': False, 'error': 'Upload size mismatch', 'status': 400}
+
+    sha256 = _hasher_at(upload_id, upload['path'], upload['size']).hexdigest()
+    conn = _connect()
+    try:
+        conn.execute('DELETE FROM uploads WHERE id = ?', (upload_id,))
+    finally:
+        conn.close()
+    return {
+        'success': True,
+        'filename': upload['filename'],
+        'original_name': upload['original_name'],
+        'path': upload['path'],
+        'sha256': sha256,
+    }
+
+def purge_stale_uploads(max_age=PARTIAL_TTL_SECONDS):
+    conn = _connect()
+    try:
+        stale = [row[0] for row in conn.execute(
+            'SELECT id FROM uploads WHERE updated_at < ?', (time.time() - max_age,)
+        )]
+        conn.execute('DELETE FROM uploads WHERE updated_at < ?', (time.time() - max_age,))
+    finally:
+        conn.close()
+    with _hashers_lock:
+        for upload_id in stale:
+            _hashers.pop(upload_id, None)
+
+init_db()
@@ -0,0 +1,121 @@
+import io
+import os
+import re
+import time
+import zipfile
+
+# Formats whose data is already compressed; deflating them again costs CPU
+# for next to no size gain.
+STORED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp', 'pdf', 'docx', 'xlsx', 'pptx', 'zip'}
+READ_SIZE = 256 * 1024
+# How often follow_members looks for files that haven't been written yet
+FOLLOW_POLL_SECONDS = 0.25
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only sink for ZipFile; whatever was written is drained and yielded."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def folder_members(folder_path):
+    """(path, arcname) pairs for every file in the folder, page_2 before page_10."""
+    members = []
+    for root, dirs, files in os.walk(folder_path):
+        dirs.sort(key=_natural_key)
+        for name in sorted(files, key=_natural_key):
+            path = os.path.join(root, name)
+            members.append((path, os.path.relpath(path, folder_path)))
+    return members
+
+def follow_members(folder_path, names, is_finished):
+    """
+    (path, arcname) pairs for `names` in the folder, in order, waiting for
+    each file that hasn't been written yet; for zipping a tool's output while
+    it is still running. Files must appear whole (written elsewhere and
+    renamed). Once `is_finished()` is true a missing file never will appear,
+    and the stream ends with an error rather than a short archive.
+    """
+    for name in names:
+        path = os.path.join(folder_path, name)
+        while not os.path.exists(path):
+            if is_finished():
+                # It may have been written just before the tool finished
+                if os.path.exists(path):
+                    break
+                raise FileNotFoundError(f"{name} was not written")
+            time.sleep(FOLLOW_POLL_SECONDS)
+        yield path, name
+
+def _compress_type(arcname):
+    ext = arcname.rsplit('.', 1)[1].lower() if '.' in arcname else ''
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+def stream_zip(members, cache_path=None, on_complete=None):
+    """
+    Yield a ZIP archive of `members` piece by piece, so the first bytes go out
+    before the last file is read. If `cache_path` is given the archive is also
+    written there and kept only once it is complete; `on_complete(cache_path)`
+    is called at that point.
+    """
+    buffer = _StreamBuffer()
+    partial_path = f"{cache_path}.{os.getpid()}.part" if cache_path else None
+    cache_file = open(partial_path, 'wb') if partial_path else None
+    completed = False
+
+    def emit():
+        data = buffer.drain()
+        if data and cache_file:
+            cache_file.write(data)
+        return data
+
+    try:
+        with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+            for path, arcname in members:
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                info.compress_type = _compress_type(arcname)
+                with open(path, 'rb') as src, archive.open(info, 'w') as dest:
+                    for chunk in iter(lambda: src.read(READ_SIZE), b''):
+                        dest.write(chunk)
+                        data = emit()
+                        if data:
+                            yield data
+                data = emit()
+                if data:
+                    yield data
+        data = emit()
+        if data:
+            yield data
+        completed = True
+    finally:
+        if cache_file:
+            cache_file.close()
+            if completed:
+                os.replace(partial_path, cache_path)
+                if on_complete:
+                    on_complete(cache_path)
+            else:
+                # Client went away mid-download; don't keep a truncated archive
+                try:
+                    os.remove(partial_path)
+                except OSError:
+                    pass
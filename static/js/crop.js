@@ -398,12 +398,7 @@ document.addEventListener('DOMContentLoaded', function() {
         submitBtn.disabled = true;
 
         try {
-            const response = await fetch('/process/crop', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJob('/process/crop', formData);
 
             if (result.success) {
                 cropToolLayout.style.display = 'none';
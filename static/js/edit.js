@@ -465,12 +465,7 @@ document.addEventListener('DOMContentLoaded', function() {
         submitBtn.disabled = true;
 
         try {
-            const response = await fetch('/process/edit', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJob('/process/edit', formData);
 
             if (result.success) {
                 editToolLayout.style.display = 'none';
@@ -112,11 +112,8 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     async function uploadFileToServer(file) {
-        const formData = new FormData();
-        formData.append('file', file);
         try {
-            const res = await fetch('/api/upload', { method: 'POST', body: formData });
-            const data = await res.json();
+            const data = await uploadFileChunked(file);
             if (data.success) {
                 serverFilename = data.filename;
             } else {
@@ -1195,12 +1192,7 @@ document.addEventListener('DOMContentLoaded', function () {
         applyChangesBtn.innerHTML = 'Processing...';
 
         try {
-            const response = await fetch('/process/edit', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJob('/process/edit', formData);
 
             if (result.success) {
                 editorWorkspace.style.display = 'none';
@@ -59,3 +59,211 @@ function hideLoading() {
         overlay.remove();
     }
 }
+
+// Tools run as background jobs: POST /process/<tool> answers with a job id
+// and the final result is fetched by polling /jobs/<id>. `onProgress(job)`
+// is called on each poll of a job whose tool reports its progress.
+async function submitToolJob(url, formData, onProgress) {
+    let response;
+    for (let attempt = 0; ; attempt++) {
+        response = await fetch(url, {
+            method: 'POST',
+            body: formData
+        });
+        // The server is at capacity for this kind of tool; wait as long as it asks
+        if (response.status !== 429 || attempt >= 3) {
+            break;
+        }
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 5;
+        await new Promise(resolve => setTimeout(resolve, Math.min(retryAfter, 30) * 1000));
+    }
+    const submitted = await response.json();
+    if (!submitted.job_id) {
+        return submitted;
+    }
+    if (submitted.state === 'done') {
+        return submitted.result;
+    }
+
+    let delay = 500;
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, delay));
+        delay = Math.min(delay * 1.5, onProgress ? 1000 : 3000);
+
+        const statusResponse = await fetch(submitted.status_url);
+        const job = await statusResponse.json();
+
+        if (onProgress && job.progress && job.state === 'running') {
+            onProgress(job);
+        }
+        if (job.state === 'done') {
+            return job.result;
+        }
+        if (job.state === 'failed' || !statusResponse.ok) {
+            return { success: false, error: job.error || 'Processing failed' };
+        }
+    }
+}
+
+// Resumable upload: the file is sent in chunks to /api/upload/<id>; after a
+// dropped connection the client asks the server for its offset and carries
+// on from there. Resolves to the same payload as /api/upload.
+async function uploadFileChunked(file, onProgress) {
+    const initResponse = await fetch('/api/upload/init', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    const upload = await initResponse.json();
+    if (!upload.success) {
+        return upload;
+    }
+
+    const uploadUrl = `/api/upload/${upload.upload_id}`;
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + upload.chunk_size);
+        try {
+            const response = await fetch(`${uploadUrl}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: chunk
+            });
+            const result = await response.json();
+            if (result.offset === undefined) {
+                return { success: false, error: result.error || 'Upload failed' };
+            }
+            offset = result.offset;
+            retries = 0;
+        } catch (error) {
+            if (++retries > 5) {
+                return { success: false, error: 'Upload interrupted' };
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            const status = await fetch(uploadUrl).then(r => r.json()).catch(() => ({}));
+            if (status.offset !== undefined) {
+                offset = status.offset;
+            }
+        }
+        if (onProgress) onProgress(offset, file.size);
+    }
+
+    const finalizeResponse = await fetch(`${uploadUrl}/finalize`, { method: 'POST' });
+    return await finalizeResponse.json();
+}
+
+// Sends a tool job for a file that may already be on the server: the
+// uploaded copy is used if there is one, and the file itself if that copy
+// has expired. `appendFields(formData)` adds the tool's own fields.
+async function submitToolJobWithFile(url, file, serverFilename, appendFields) {
+    function buildFormData(useServerCopy) {
+        const formData = new FormData();
+        if (useServerCopy) {
+            formData.append('server_filename', serverFilename);
+        } else {
+            formData.append('files', file);
+        }
+        appendFields(formData);
+        return formData;
+    }
+    if (serverFilename) {
+        const result = await submitToolJob(url, buildFormData(true));
+        if (result.error !== 'File not found or expired') {
+            return result;
+        }
+    }
+    return submitToolJob(url, buildFormData(false));
+}
+
+// Page thumbnails rendered and cached by the server (/api/thumbnails), for
+// page grids that would otherwise render every page with pdf.js. The file is
+// uploaded once; canvases given to observe() are sized from the page sizes
+// at once and drawn when they come near the viewport, from sprite sheets of
+// several pages fetched together. Resolves to null if the server can't
+// render the file, so the caller can fall back to pdf.js.
+const THUMBNAIL_SHEET_PAGES = 20;
+const THUMBNAIL_RETRIES = 3;
+
+async function loadServerThumbnails(file, width = 150) {
+    let upload, info;
+    try {
+        upload = await uploadFileChunked(file);
+        if (!upload.success) {
+            return null;
+        }
+        info = await fetch(`/api/thumbnails/${encodeURIComponent(upload.filename)}`).then(r => r.json());
+        if (!info.success) {
+            return null;
+        }
+    } catch (error) {
+        return null;
+    }
+
+    const baseUrl = `/api/thumbnails/${encodeURIComponent(upload.filename)}`;
+    const sheetPages = Math.min(THUMBNAIL_SHEET_PAGES, info.sprite_max_pages);
+    const sheets = new Map();
+
+    function sheetFor(pageNum) {
+        const first = Math.floor((pageNum - 1) / sheetPages) * sheetPages + 1;
+        if (!sheets.has(first)) {
+            const last = Math.min(first + sheetPages - 1, info.page_count);
+            sheets.set(first, fetch(`${baseUrl}/sprite?first=${first}&last=${last}&width=${width}`).then(async response => {
+                if (!response.ok) {
+                    sheets.delete(first);
+                    const error = new Error('Thumbnail failed');
+                    // Busy rendering other thumbnails or jobs (429): worth asking again
+                    error.retryAfter = response.status === 429 ? Number(response.headers.get('Retry-After')) || 1 : 0;
+                    throw error;
+                }
+                const frames = JSON.parse(response.headers.get('X-Sprite-Frames'));
+                return { first, frames, image: await createImageBitmap(await response.blob()) };
+            }));
+        }
+        return sheets.get(first);
+    }
+
+    async function draw(canvas, retries = THUMBNAIL_RETRIES) {
+        const pageNum = Number(canvas.dataset.thumbnailPage);
+        try {
+            const sheet = await sheetFor(pageNum);
+            const [x, y, w, h] = sheet.frames[pageNum - sheet.first];
+            canvas.width = w;
+            canvas.height = h;
+            canvas.getContext('2d').drawImage(sheet.image, x, y, w, h, 0, 0, w, h);
+        } catch (error) {
+            if (error.retryAfter && retries > 0) {
+                setTimeout(() => draw(canvas, retries - 1), error.retryAfter * 1000);
+            }
+            // Otherwise left blank; the page is still usable without its picture
+        }
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                draw(entry.target);
+            }
+        });
+    }, { rootMargin: '600px 0px' });
+
+    return {
+        serverFilename: upload.filename,
+        pageCount: info.page_count,
+        observe(canvas, pageNum) {
+            const [pageWidth, pageHeight] = info.pages[pageNum - 1];
+            canvas.width = width;
+            canvas.height = Math.round(width * pageHeight / pageWidth);
+            canvas.dataset.thumbnailPage = pageNum;
+            observer.observe(canvas);
+        },
+        url(pageNum, pageWidth = width) {
+            return `${baseUrl}/${pageNum}?width=${pageWidth}`;
+        },
+        // Stop watching canvases that are about to be thrown away
+        disconnect() {
+            observer.disconnect();
+        }
+    };
+}
@@ -256,12 +256,7 @@ document.addEventListener('DOMContentLoaded', function() {
         mergeBtn.disabled = true;
 
         try {
-            const response = await fetch('/process/merge', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJob('/process/merge', formData);
 
             if (result.success) {
                 mergeToolLayout.style.display = 'none';
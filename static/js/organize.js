@@ -20,6 +20,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const sortDesc = document.getElementById('sortDesc');
 
     let pdfDoc = null;
+    let thumbnails = null;
+    let totalPages = 0;
     let uploadedFile = null;
     let pages = [];
     let originalOrder = [];
@@ -59,14 +61,24 @@ document.addEventListener('DOMContentLoaded', function() {
         uploadedFile = file;
         fileName.textContent = file.name;
         
-        const arrayBuffer = await file.arrayBuffer();
-        pdfDoc = await pdfjsLib.getDocument({ data: arrayBuffer }).promise;
+        // Long documents would take pdf.js ages to render in full; the server
+        // renders thumbnails as they are scrolled to
+        showLoading('Preparing pages...');
+        thumbnails = await loadServerThumbnails(file, 200);
+        hideLoading();
+        if (thumbnails) {
+            totalPages = thumbnails.pageCount;
+        } else {
+            const arrayBuffer = await file.arrayBuffer();
+            pdfDoc = await pdfjsLib.getDocument({ data: arrayBuffer }).promise;
+            totalPages = pdfDoc.numPages;
+        }
         
         pages = [];
         originalOrder = [];
         blankPageCount = 0;
         
-        for (let i = 1; i <= pdfDoc.numPages; i++) {
+        for (let i = 1; i <= totalPages; i++) {
             pages.push({ type: 'page', pageNum: i, id: `page-${i}` });
             originalOrder.push(i);
         }
@@ -81,6 +93,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     async function renderPages() {
+        if (thumbnails) thumbnails.disconnect();
         pagesGrid.innerHTML = '';
         
         for (let i = 0; i < pages.length; i++) {
@@ -94,7 +107,9 @@ document.addEventListener('DOMContentLoaded', function() {
             const canvas = document.createElement('canvas');
             canvas.className = 'page-thumbnail-canvas';
             
-            if (pageData.type === 'page') {
+            if (pageData.type === 'page' && thumbnails) {
+                thumbnails.observe(canvas, pageData.pageNum);
+            } else if (pageData.type === 'page') {
                 const page = await pdfDoc.getPage(pageData.pageNum);
                 const viewport = page.getViewport({ scale: 0.3 });
                 canvas.width = viewport.width;
@@ -244,7 +259,7 @@ document.addEventListener('DOMContentLoaded', function() {
     resetOrder.addEventListener('click', async () => {
         pages = [];
         blankPageCount = 0;
-        for (let i = 1; i <= pdfDoc.numPages; i++) {
+        for (let i = 1; i <= totalPages; i++) {
             pages.push({ type: 'page', pageNum: i, id: `page-${i}` });
         }
         pageCount.textContent = pages.length;
@@ -260,22 +275,16 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
-        const formData = new FormData();
-        formData.append('files', uploadedFile);
-        formData.append('order', pageOrder.value);
-
         const submitBtn = organizeForm.querySelector('button[type="submit"]');
         const originalText = submitBtn.innerHTML;
         submitBtn.innerHTML = '<svg class="spinner" viewBox="0 0 24 24"><circle cx="12" cy="12" r="10" stroke="currentColor" stroke-width="3" fill="none"/></svg> Processing...';
         submitBtn.disabled = true;
 
         try {
-            const response = await fetch('/process/organize', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJobWithFile(
+                '/process/organize', uploadedFile, thumbnails && thumbnails.serverFilename,
+                formData => formData.append('order', pageOrder.value)
+            );
 
             if (result.success) {
                 organizeLayout.style.display = 'none';
@@ -305,7 +314,10 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     function resetTool() {
+        if (thumbnails) thumbnails.disconnect();
         pdfDoc = null;
+        thumbnails = null;
+        totalPages = 0;
         uploadedFile = null;
         pages = [];
         originalOrder = [];
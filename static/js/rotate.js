@@ -19,6 +19,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const addMoreBtn = document.getElementById('addMoreBtn');
 
     let pdfDoc = null;
+    let thumbnails = null;
+    let totalPages = 0;
     let uploadedFile = null;
     let pageRotations = {};
     let selectedPages = new Set();
@@ -56,15 +58,25 @@ document.addEventListener('DOMContentLoaded', function() {
 
     async function handleFile(file) {
         uploadedFile = file;
-        const arrayBuffer = await file.arrayBuffer();
-        pdfDoc = await pdfjsLib.getDocument({ data: arrayBuffer }).promise;
+        // Long documents would take pdf.js ages to render in full; the server
+        // renders thumbnails as they are scrolled to
+        showLoading('Preparing pages...');
+        thumbnails = await loadServerThumbnails(file, 200);
+        hideLoading();
+        if (thumbnails) {
+            totalPages = thumbnails.pageCount;
+        } else {
+            const arrayBuffer = await file.arrayBuffer();
+            pdfDoc = await pdfjsLib.getDocument({ data: arrayBuffer }).promise;
+            totalPages = pdfDoc.numPages;
+        }
 
         initialUpload.style.display = 'none';
         rotateToolLayout.style.display = 'grid';
 
         pageRotations = {};
         selectedPages.clear();
-        for (let i = 1; i <= pdfDoc.numPages; i++) {
+        for (let i = 1; i <= totalPages; i++) {
             pageRotations[i] = 0;
         }
 
@@ -75,7 +87,7 @@ document.addEventListener('DOMContentLoaded', function() {
     async function renderAllPages() {
         rotatePagesGrid.innerHTML = '';
 
-        for (let i = 1; i <= pdfDoc.numPages; i++) {
+        for (let i = 1; i <= totalPages; i++) {
             const pageContainer = document.createElement('div');
             pageContainer.className = 'rotate-page-item';
             pageContainer.dataset.page = i;
@@ -138,6 +150,11 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     async function renderPageThumbnail(pageNum, canvas) {
+        if (thumbnails) {
+            thumbnails.observe(canvas, pageNum);
+            applyRotationToCanvas(pageNum, canvas);
+            return;
+        }
         const page = await pdfDoc.getPage(pageNum);
         const viewport = page.getViewport({ scale: 0.3 });
 
@@ -220,29 +237,22 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
-        const formData = new FormData();
-        formData.append('files', uploadedFile);
-        
         const nonZeroRotations = {};
         for (let page in pageRotations) {
             if (pageRotations[page] !== 0) {
                 nonZeroRotations[page] = pageRotations[page];
             }
         }
-        formData.append('rotations', JSON.stringify(nonZeroRotations));
-
         const submitBtn = rotateForm.querySelector('button[type="submit"]');
         const originalText = submitBtn.innerHTML;
         submitBtn.innerHTML = '<svg class="spinner" viewBox="0 0 24 24"><circle cx="12" cy="12" r="10" stroke="currentColor" stroke-width="3" fill="none"/></svg> Processing...';
         submitBtn.disabled = true;
 
         try {
-            const response = await fetch('/process/rotate', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJobWithFile(
+                '/process/rotate', uploadedFile, thumbnails && thumbnails.serverFilename,
+                formData => formData.append('rotations', JSON.stringify(nonZeroRotations))
+            );
 
             if (result.success) {
                 rotateToolLayout.style.display = 'none';
@@ -272,7 +282,10 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     function resetTool() {
+        if (thumbnails) thumbnails.disconnect();
         pdfDoc = null;
+        thumbnails = null;
+        totalPages = 0;
         uploadedFile = null;
         pageRotations = {};
         selectedPages.clear();
@@ -651,12 +651,7 @@ document.addEventListener('DOMContentLoaded', function () {
         submitBtn.disabled = true;
 
         try {
-            const response = await fetch('/process/sign', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJob('/process/sign', formData);
 
             if (result.success) {
                 signToolLayout.style.display = 'none';
@@ -21,6 +21,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const rangeTypeButtons = document.querySelectorAll('.range-type-btn');
 
     let pdfDoc = null;
+    let thumbnails = null;
     let totalPages = 0;
     let uploadedFile = null;
     let rangeCount = 1;
@@ -61,9 +62,18 @@ document.addEventListener('DOMContentLoaded', function() {
         uploadedFile = file;
         selectedPages.clear();
         thumbnailCache.clear();
-        const arrayBuffer = await file.arrayBuffer();
-        pdfDoc = await pdfjsLib.getDocument({ data: arrayBuffer }).promise;
-        totalPages = pdfDoc.numPages;
+        // Long documents would take pdf.js ages to render in full; the server
+        // renders thumbnails as they are scrolled to
+        showLoading('Preparing pages...');
+        thumbnails = await loadServerThumbnails(file, 200);
+        hideLoading();
+        if (thumbnails) {
+            totalPages = thumbnails.pageCount;
+        } else {
+            const arrayBuffer = await file.arrayBuffer();
+            pdfDoc = await pdfjsLib.getDocument({ data: arrayBuffer }).promise;
+            totalPages = pdfDoc.numPages;
+        }
 
         initialUpload.style.display = 'none';
         splitToolLayout.style.display = 'grid';
@@ -76,16 +86,20 @@ document.addEventListener('DOMContentLoaded', function() {
     async function renderThumbnails() {
         pageThumbnails.innerHTML = '';
         for (let i = 1; i <= totalPages; i++) {
-            const page = await pdfDoc.getPage(i);
-            const scale = 0.3;
-            const viewport = page.getViewport({ scale });
-
             const canvas = document.createElement('canvas');
-            canvas.width = viewport.width;
-            canvas.height = viewport.height;
+            if (thumbnails) {
+                thumbnails.observe(canvas, i);
+            } else {
+                const page = await pdfDoc.getPage(i);
+                const scale = 0.3;
+                const viewport = page.getViewport({ scale });
+
+                canvas.width = viewport.width;
+                canvas.height = viewport.height;
 
-            const ctx = canvas.getContext('2d');
-            await page.render({ canvasContext: ctx, viewport }).promise;
+                const ctx = canvas.getContext('2d');
+                await page.render({ canvasContext: ctx, viewport }).promise;
+            }
 
             const thumbWrapper = document.createElement('div');
             thumbWrapper.className = 'page-thumbnail';
@@ -256,7 +270,7 @@ document.addEventListener('DOMContentLoaded', function() {
             rangePagesContainer.innerHTML = '';
 
             for (let i = fromPage; i <= toPage && i <= totalPages; i++) {
-                let cachedThumb = thumbnailCache.get(i);
+                let cachedThumb = thumbnails ? thumbnails.url(i, 150) : thumbnailCache.get(i);
                 if (!cachedThumb) {
                     const page = await pdfDoc.getPage(i);
                     const scale = 0.2;
@@ -276,6 +290,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 pageWrapper.className = 'range-page-thumb';
                 
                 const img = document.createElement('img');
+                img.loading = 'lazy';
                 img.src = cachedThumb;
                 
                 const pageNum = document.createElement('span');
@@ -297,28 +312,28 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
-        const formData = new FormData();
-        formData.append('files', uploadedFile);
-        formData.append('split_type', currentMode);
-
-        if (currentMode === 'range') {
-            const ranges = [];
-            rangesList.querySelectorAll('.range-item').forEach(item => {
-                const from = item.querySelector('.range-from').value;
-                const to = item.querySelector('.range-to').value;
-                ranges.push(`${from}-${to}`);
-            });
-            const rangesStr = ranges.join(',');
-            formData.append('ranges', rangesStr);
-            formData.append('pages', rangesStr);
-            formData.append('merge', document.getElementById('mergeRanges').checked);
-            document.getElementById('rangesData').value = rangesStr;
-        } else {
-            const pagesStr = Array.from(selectedPages).sort((a, b) => a - b).join(',');
-            formData.append('pages', pagesStr);
-            document.getElementById('selectedPages').value = pagesStr;
+        function appendSplitFields(formData) {
+            formData.append('split_type', currentMode);
+
+            if (currentMode === 'range') {
+                const ranges = [];
+                rangesList.querySelectorAll('.range-item').forEach(item => {
+                    const from = item.querySelector('.range-from').value;
+                    const to = item.querySelector('.range-to').value;
+                    ranges.push(`${from}-${to}`);
+                });
+                const rangesStr = ranges.join(',');
+                formData.append('ranges', rangesStr);
+                formData.append('pages', rangesStr);
+                formData.append('merge', document.getElementById('mergeRanges').checked);
+                document.getElementById('rangesData').value = rangesStr;
+            } else {
+                const pagesStr = Array.from(selectedPages).sort((a, b) => a - b).join(',');
+                formData.append('pages', pagesStr);
+                document.getElementById('selectedPages').value = pagesStr;
+            }
+            document.getElementById('splitType').value = currentMode;
         }
-        document.getElementById('splitType').value = currentMode;
 
         const submitBtn = splitForm.querySelector('button[type="submit"]');
         const originalText = submitBtn.innerHTML;
@@ -326,12 +341,9 @@ document.addEventListener('DOMContentLoaded', function() {
         submitBtn.disabled = true;
 
         try {
-            const response = await fetch('/process/split', {
-                method: 'POST',
-                body: formData
-            });
-
-            const result = await response.json();
+            const result = await submitToolJobWithFile(
+                '/process/split', uploadedFile, thumbnails && thumbnails.serverFilename, appendSplitFields
+            );
 
             if (result.success) {
                 splitToolLayout.style.display = 'none';
@@ -371,7 +383,9 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     function resetTool() {
+        if (thumbnails) thumbnails.disconnect();
         pdfDoc = null;
+        thumbnails = null;
         totalPages = 0;
         uploadedFile = null;
         rangeCount = 1;
@@ -19,6 +19,8 @@ document.addEventListener('DOMContentLoaded', function() {
     
     let files = [];
     let draggedItem = null;
+    // Compress uploads the chosen PDF straight away to estimate each level; the job reuses the upload
+    let compressUpload = null;
 
     if (browseBtn) {
         browseBtn.addEventListener('click', function(e) {
@@ -76,6 +78,53 @@ document.addEventListener('DOMContentLoaded', function() {
     function handleFiles(newFiles) {
         files = Array.from(newFiles);
         updateThumbnailView();
+        if (toolName === 'compress' && files.length === 1) {
+            estimateCompression(files[0]);
+        }
+    }
+
+    function estimateCompression(file) {
+        const upload = { file: file, promise: uploadFileChunked(file).catch(() => ({ success: false })) };
+        compressUpload = upload;
+        showCompressionEstimates(null);
+        upload.promise.then(async uploaded => {
+            if (!uploaded.success || compressUpload !== upload) return;
+            const formData = new FormData();
+            formData.append('server_filename', uploaded.filename);
+            const response = await fetch('/api/compress-estimate', { method: 'POST', body: formData });
+            const estimate = await response.json();
+            if (estimate.success && compressUpload === upload) {
+                showCompressionEstimates(estimate);
+            }
+        }).catch(() => {});
+    }
+
+    function showCompressionEstimates(estimate) {
+        document.querySelectorAll('.compression-options input[name="quality"]').forEach(input => {
+            const option = input.closest('.radio-option');
+            let label = option.querySelector('.compression-estimate');
+            if (!estimate) {
+                if (label) label.remove();
+                return;
+            }
+            const level = estimate.estimates[input.value];
+            if (!level) return;
+            if (!label) {
+                label = document.createElement('span');
+                label.className = 'compression-estimate';
+                option.querySelector('.radio-text').appendChild(label);
+            }
+            label.textContent = level.reduction >= 1
+                ? `About ${formatFileSize(level.new_size)} (${Math.round(level.reduction)}% smaller)`
+                : 'Little to gain on this file';
+        });
+    }
+
+    // The compress upload's server filename if it belongs to the files being submitted
+    async function uploadedFilename() {
+        if (!compressUpload || files.length !== 1 || compressUpload.file !== files[0]) return null;
+        const uploaded = await compressUpload.promise;
+        return uploaded.success ? uploaded.filename : null;
     }
 
     function addMoreFiles(newFiles) {
@@ -264,23 +313,30 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
-            const formData = new FormData();
-            files.forEach(file => {
-                formData.append('files', file);
-            });
+            function buildFormData(serverFilename) {
+                const formData = new FormData();
+                if (serverFilename) {
+                    formData.append('server_filename', serverFilename);
+                } else {
+                    files.forEach(file => {
+                        formData.append('files', file);
+                    });
+                }
 
-            const inputs = uploadForm.querySelectorAll('input, select, textarea');
-            inputs.forEach(input => {
-                if (input.name && input.name !== 'files' && input.name !== 'addFiles' && input.type !== 'file') {
-                    if (input.type === 'radio') {
-                        if (input.checked) {
+                const inputs = uploadForm.querySelectorAll('input, select, textarea');
+                inputs.forEach(input => {
+                    if (input.name && input.name !== 'files' && input.name !== 'addFiles' && input.type !== 'file') {
+                        if (input.type === 'radio') {
+                            if (input.checked) {
+                                formData.append(input.name, input.value);
+                            }
+                        } else {
                             formData.append(input.name, input.value);
                         }
-                    } else {
-                        formData.append(input.name, input.value);
                     }
-                }
-            });
+                });
+                return formData;
+            }
 
             const btnText = processBtn ? processBtn.querySelector('.btn-text') : null;
             const btnLoading = processBtn ? processBtn.querySelector('.btn-loading') : null;
@@ -292,12 +348,13 @@ document.addEventListener('DOMContentLoaded', function() {
             showLoading('Processing your file...');
 
             try {
-                const response = await fetch(`/process/${toolName}`, {
-                    method: 'POST',
-                    body: formData
-                });
-
-                const result = await response.json();
+                const serverFilename = await uploadedFilename();
+                let result = await submitToolJob(`/process/${toolName}`, buildFormData(serverFilename), showProgress);
+                if (serverFilename && result.error === 'File not found or expired') {
+                    // The early upload was cleaned up while the page sat open; send the file itself
+                    compressUpload = null;
+                    result = await submitToolJob(`/process/${toolName}`, buildFormData(null), showProgress);
+                }
 
                 hideLoading();
 
@@ -317,6 +374,22 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Page counts while a tool runs; tools that name their output files can
+    // be downloaded right away, with later pages streamed as they finish
+    function showProgress(job) {
+        const overlay = document.getElementById('loadingOverlay');
+        if (!overlay) return;
+        const { done, total, output_folder: outputFolder, filename } = job.progress;
+        overlay.querySelector('p').textContent = `Processed ${done} of ${total} pages...`;
+        if (outputFolder && filename && total > 1 && !overlay.querySelector('.btn-download')) {
+            const downloadBtn = document.createElement('a');
+            downloadBtn.href = `/jobs/${job.job_id}/download`;
+            downloadBtn.className = 'btn btn-download';
+            downloadBtn.textContent = 'Download pages as they finish (ZIP)';
+            overlay.querySelector('.loading-content').appendChild(downloadBtn);
+        }
+    }
+
     function showResult(result) {
         if (toolColumns) toolColumns.style.display = 'none';
         if (errorArea) errorArea.style.display = 'none';
@@ -349,13 +422,16 @@ document.addEventListener('DOMContentLoaded', function() {
                     <polyline points="7 10 12 15 17 10"/>
                     <line x1="12" y1="15" x2="12" y2="3"/>
                 </svg>
-                Download JPG
+                Download Image
             `;
             if (downloadButtons) downloadButtons.appendChild(downloadBtn);
         } else {
             let msg = 'Your file has been processed successfully.';
             if (result.reduction !== undefined) {
                 msg = `File compressed by ${result.reduction}%! Original: ${formatFileSize(result.original_size)}, New: ${formatFileSize(result.new_size)}`;
+                if (result.target_met === false) {
+                    msg += ` (could not get under ${formatFileSize(result.target_bytes)})`;
+                }
             }
             if (resultMessage) resultMessage.textContent = msg;
 
@@ -372,6 +448,13 @@ document.addEventListener('DOMContentLoaded', function() {
             `;
             if (downloadButtons) downloadButtons.appendChild(downloadBtn);
         }
+
+        // Pages too large for the chosen image format come out smaller than the DPI asked for
+        if (result.downscaled && result.downscaled.length && resultMessage) {
+            const shown = result.downscaled.slice(0, 3).map(p => `page ${p.page} (${p.width} × ${p.height} px)`);
+            const more = result.downscaled.length - shown.length;
+            resultMessage.textContent += ` Scaled down to fit the image format: ${shown.join(', ')}${more > 0 ? ` and ${more} more` : ''}.`;
+        }
     }
 
     function showError(message) {
@@ -383,6 +466,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
     function resetForm() {
         files = [];
+        compressUpload = null;
+        showCompressionEstimates(null);
         if (fileInput) fileInput.value = '';
         if (addMoreInput) addMoreInput.value = '';
         if (thumbnailGrid) thumbnailGrid.style.display = 'none';
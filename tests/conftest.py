@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Every service keeps its state under BASE_TEMP_DIR, fixed when
+# services.storage is first imported. Point it (and, through TMPDIR, the
+# spawned job workers) at a fresh directory before any test imports it.
+TEST_TEMP_DIR = tempfile.mkdtemp(prefix='pdf-forge-tests-')
+os.environ['TMPDIR'] = TEST_TEMP_DIR
+tempfile.tempdir = None
+
+def pytest_sessionfinish(session, exitstatus):
+    from services import jobs
+    jobs.shutdown_executor()
+    shutil.rmtree(TEST_TEMP_DIR, ignore_errors=True)
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """make_pdf(pages) -> path of a PDF with that many pages of text."""
+    import fitz
+
+    def make(pages=3, name='sample.pdf'):
+        path = tmp_path / name
+        with fitz.open() as pdf:
+            for number in range(1, pages + 1):
+                page = pdf.new_page()
+                page.insert_text((72, 72), f'Page {number}', fontsize=24)
+            pdf.save(str(path))
+        return str(path)
+    return make
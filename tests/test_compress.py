@@ -0,0 +1,34 @@
+import os
+
+import fitz
+import numpy as np
+
+from tools import compress_pdf
+
+TARGET_BYTES = 200000
+
+def _uncompressed_images_pdf(path, count=6, side=800):
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:side, 0:side]
+    with fitz.open() as pdf:
+        for number in range(count):
+            photo = np.dstack([x * 255 // side, y * 255 // side, (x + y + number * 50) % 256])
+            photo = np.clip(photo + rng.integers(-8, 8, photo.shape), 0, 255).astype(np.uint8)
+            page = pdf.new_page(width=600, height=600)
+            page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, side, side, photo.tobytes(), False))
+        # Saved without deflate, so the image streams have no /Filter
+        pdf.save(path)
+    return path
+
+def test_target_size_counts_unfiltered_images_as_saved(tmp_path):
+    input_path = _uncompressed_images_pdf(str(tmp_path / 'in.pdf'))
+    with fitz.open(input_path) as pdf:
+        xref = pdf[0].get_images()[0][0]
+        assert pdf.xref_get_key(xref, 'Filter')[0] == 'null'
+
+    result = compress_pdf.compress_pdf(input_path, str(tmp_path / 'out.pdf'), target_bytes=TARGET_BYTES)
+    assert result['success'], result.get('error')
+    assert result['target_met']
+    assert 0 < result['estimated_size'] <= TARGET_BYTES
+    assert result['tries'] > 1
+    assert os.path.getsize(str(tmp_path / 'out.pdf')) <= TARGET_BYTES
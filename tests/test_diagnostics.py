@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from services import profiling
+from services.storage import DIAGNOSTICS_FOLDER
+
+@pytest.fixture
+def client():
+    from app import app
+    path = os.path.join(DIAGNOSTICS_FOLDER, 'job.txt')
+    with open(path, 'w') as f:
+        f.write('hot functions')
+    yield app.test_client()
+    os.remove(path)
+
+def test_diagnostics_are_hidden_without_an_admin_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_ADMIN_TOKEN', '')
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+    assert client.get('/diagnostics/job.txt').status_code == 404
+    assert client.get('/diagnostics/job.txt?token=').status_code == 404
+
+def test_diagnostics_need_the_matching_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_ADMIN_TOKEN', 'secret')
+    assert client.get('/diagnostics/job.txt').status_code == 404
+    assert client.get('/diagnostics/job.txt?token=wrong').status_code == 404
+    assert client.get('/diagnostics/job.txt?token=secret').get_data() == b'hot functions'
+    response = client.get('/diagnostics/job.txt', headers={profiling.PROFILE_HEADER: 'secret'})
+    assert response.status_code == 200
@@ -0,0 +1,69 @@
+import os
+import time
+
+from services import expiry
+from services.storage import UPLOAD_FOLDER
+
+# Entries are registered a few seconds ahead and reaped with a `now` past
+# that, so a reaper thread started by another test can't take them first
+TTL = 5
+
+def _make_file(name, data=b'x' * 100):
+    path = os.path.join(UPLOAD_FOLDER, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def _expires_at(path):
+    conn = expiry._connect()
+    try:
+        row = conn.execute('SELECT expires_at FROM expiry WHERE path = ?', (os.path.abspath(path),)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+def test_reap_due_deletes_only_expired_entries():
+    due = _make_file('due.bin')
+    folder = os.path.join(UPLOAD_FOLDER, 'due-folder')
+    os.makedirs(folder)
+    _make_file(os.path.join('due-folder', 'inner.bin'))
+    later = _make_file('later.bin')
+    expiry.register(due, TTL)
+    expiry.register(folder, TTL)
+    expiry.register(later, 3600)
+
+    assert expiry.reap_due(time.time() + TTL + 1) >= 2
+    assert not os.path.exists(due)
+    assert not os.path.exists(folder)
+    assert os.path.exists(later)
+    assert _expires_at(due) is None
+    assert _expires_at(later) is not None
+
+def test_register_again_moves_the_deadline():
+    path = _make_file('extended.bin')
+    expiry.register(path, TTL)
+    expiry.register(path, 3600)
+
+    expiry.reap_due(time.time() + TTL + 1)
+    assert os.path.exists(path)
+    assert _expires_at(path) > time.time() + 3000
+
+def test_stats_count_tracked_and_pending_bytes():
+    path = _make_file('counted.bin', b'x' * 1234)
+    before = expiry.stats()
+    expiry.register(path, 3600)
+    after = expiry.stats()
+
+    assert after['tracked_items'] == before['tracked_items'] + 1
+    assert after['tracked_bytes'] == before['tracked_bytes'] + 1234
+
+def test_adopt_orphans_expires_untracked_files_by_mtime():
+    orphan = _make_file('orphan.bin')
+    old = time.time() - expiry.ORPHAN_MAX_AGE_SECONDS - 60
+    os.utime(orphan, (old, old))
+    assert _expires_at(orphan) is None
+
+    expiry.adopt_orphans()
+    assert abs(_expires_at(orphan) - (old + expiry.ORPHAN_MAX_AGE_SECONDS)) < 1
+    expiry.reap_due()
+    assert not os.path.exists(orphan)
@@ -0,0 +1,74 @@
+import os
+import time
+import signal
+import threading
+
+import fitz
+
+from services import jobs
+
+JOB_TIMEOUT_SECONDS = 60
+
+def _wait(job_id, states=(jobs.DONE, jobs.FAILED)):
+    deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        job = jobs.get_job(job_id)
+        if job['state'] in states:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} still {job["state"]}')
+
+def test_job_runs_the_tool_and_calls_on_done(make_pdf):
+    finished = threading.Event()
+    results = []
+
+    def on_done(result):
+        results.append(result)
+        finished.set()
+
+    job_id = jobs.submit_job('rotate', [make_pdf(3)], {'angle': '90', 'pages': 'all'}, on_done=on_done)
+    assert jobs.get_job(job_id)['state'] in (jobs.QUEUED, jobs.RUNNING, jobs.DONE)
+
+    job = _wait(job_id)
+    assert job['state'] == jobs.DONE
+    assert job['queue_wait_seconds'] >= 0
+    with fitz.open(job['result']['output_path']) as pdf:
+        assert [page.rotation for page in pdf] == [90, 90, 90]
+    assert finished.wait(5)
+    assert results[0]['success']
+
+def test_failed_tool_marks_the_job_failed(make_pdf):
+    job = _wait(jobs.submit_job('rotate', [make_pdf(1)], {'angle': 'sideways', 'pages': 'all'}))
+    assert job['state'] == jobs.FAILED
+    assert 'sideways' in job['error']
+
+def test_finished_job_records_a_result():
+    job_id = jobs.record_finished_job('rotate', {'success': True, 'filename': 'cached.pdf'})
+    job = jobs.get_job(job_id)
+    assert job['state'] == jobs.DONE
+    assert job['result']['filename'] == 'cached.pdf'
+
+def test_unknown_job_is_none():
+    assert jobs.get_job('0' * 32) is None
+
+def test_pool_recovers_after_a_worker_dies(make_pdf):
+    # Long enough to still be running when its process is killed
+    busy = jobs.submit_job('pdf-to-jpg', [make_pdf(400, 'long.pdf')], {'dpi': '300', 'format': 'png'})
+    _wait(busy, states=(jobs.RUNNING, jobs.DONE, jobs.FAILED))
+    for pid in list(jobs._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+
+    assert _wait(busy)['state'] == jobs.FAILED
+    after = _wait(jobs.submit_job('rotate', [make_pdf(1, 'after.pdf')], {'angle': '90', 'pages': 'all'}))
+    assert after['state'] == jobs.DONE
+
+def test_job_processes_are_replaced_after_their_share_of_jobs(make_pdf, monkeypatch):
+    jobs.shutdown_executor()
+    monkeypatch.setattr(jobs, 'JOB_TASKS_PER_PROCESS', 1)
+    try:
+        first = jobs._get_executor().submit(os.getpid).result(JOB_TIMEOUT_SECONDS)
+        assert jobs._get_executor().submit(os.getpid).result(JOB_TIMEOUT_SECONDS) != first
+        job = _wait(jobs.submit_job('rotate', [make_pdf(1)], {'angle': '90', 'pages': 'all'}))
+        assert job['state'] == jobs.DONE
+    finally:
+        jobs.shutdown_executor()
@@ -0,0 +1,24 @@
+from services import expiry, metrics, storage
+
+def _value(text, name):
+    return next(float(line.split()[-1]) for line in text.splitlines() if line.startswith(name + ' '))
+
+def test_temp_gauges_come_from_the_expiry_index(monkeypatch):
+    def walk(path):
+        raise AssertionError(f'{path} walked at scrape time')
+    monkeypatch.setattr(metrics, 'path_size', walk)
+    monkeypatch.setattr(storage, 'path_size', walk)
+
+    stats = expiry.stats()
+    text = metrics.render({'done': 2}, storage=stats)
+    assert _value(text, 'pdf_forge_temp_items') == stats['tracked_items']
+    assert _value(text, 'pdf_forge_temp_bytes') == stats['tracked_bytes']
+    assert _value(text, 'pdf_forge_temp_due_bytes') == stats['pending_bytes']
+    assert 'pdf_forge_jobs{state="done"} 2' in text
+
+def test_metrics_route_reports_temp_bytes():
+    from app import app
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    # The reaper may delete entries meanwhile, so only check the gauge is there
+    assert _value(response.get_data(as_text=True), 'pdf_forge_temp_bytes') >= 0
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from services import result_cache
+from services.storage import PROCESSED_FOLDER, generate_unique_filename
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    conn = result_cache._connect()
+    try:
+        conn.execute('DELETE FROM results')
+    finally:
+        conn.close()
+
+def _output(data=b'%PDF-1.4 output', stem='compressed.pdf'):
+    name = generate_unique_filename(stem)
+    path = os.path.join(PROCESSED_FOLDER, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return {'success': True, 'output_path': path, 'filename': name}
+
+def test_key_ignores_whitespace_order_and_input_name():
+    key = result_cache.make_key('compress', ['abc'], {'quality': 'medium', 'target_bytes': '0'})
+    assert key == result_cache.make_key('compress', ['abc'], {'target_bytes': 0, 'quality': ' medium '})
+    assert key == result_cache.make_key('compress', ['abc'], {
+        'quality': 'medium', 'target_bytes': '0', 'server_filename': 'upload_1a2b3c4d.pdf'
+    })
+
+def test_key_changes_with_tool_inputs_and_params():
+    key = result_cache.make_key('compress', ['abc'], {'quality': 'medium'})
+    assert key != result_cache.make_key('compress', ['abc'], {'quality': 'less'})
+    assert key != result_cache.make_key('compress', ['abd'], {'quality': 'medium'})
+    assert key != result_cache.make_key('rotate', ['abc'], {'quality': 'medium'})
+    assert key != result_cache.make_key('merge', ['abc', 'def'], {})
+    assert result_cache.make_key('merge', ['abc', 'def'], {}) != result_cache.make_key('merge', ['def', 'abc'], {})
+
+def test_lookup_returns_a_fresh_copy_of_the_stored_output():
+    key = result_cache.make_key('compress', ['round-trip'], {})
+    assert result_cache.lookup(key) is None
+
+    result = _output(b'%PDF-1.4 cached bytes')
+    result_cache.store(key, 'compress', result)
+    hit = result_cache.lookup(key)
+
+    assert hit['cached'] is True
+    assert hit['filename'] != result['filename']
+    assert hit['filename'].startswith('compressed_')
+    with open(hit['output_path'], 'rb') as f:
+        assert f.read() == b'%PDF-1.4 cached bytes'
+
+def test_evict_drops_least_recently_used_first():
+    keys = [result_cache.make_key('compress', [name], {}) for name in ('a', 'b', 'c')]
+    for key in keys:
+        result_cache.store(key, 'compress', _output(b'x' * 1000))
+    # Using the oldest entry makes the second one least recently used
+    assert result_cache.lookup(keys[0])
+
+    result_cache.evict(max_bytes=2500)
+    assert result_cache.lookup(keys[1]) is None
+    assert result_cache.lookup(keys[0])
+    assert result_cache.lookup(keys[2])
+    assert result_cache.stats()['bytes'] <= 2500
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from tools import sharding
+
+@pytest.fixture
+def markers(tmp_path):
+    folder = tmp_path / 'running'
+    folder.mkdir()
+    return str(folder)
+
+@pytest.fixture
+def three_workers(monkeypatch):
+    monkeypatch.setattr(sharding, 'PAGE_WORKERS', 3)
+    monkeypatch.setattr(sharding, '_pool', None)
+    yield
+    sharding.shutdown_pool()
+    sharding.set_job_cores(None)
+
+def _busy_page(page, folder):
+    """Page function recording how many calls are running at once (files in `folder`)."""
+    marker = os.path.join(folder, f'{os.getpid()}-{page.number}')
+    open(marker, 'w').close()
+    running = len(os.listdir(folder))
+    time.sleep(0.05)
+    os.remove(marker)
+    return page.number, running
+
+def test_map_pages_returns_results_in_page_order(make_pdf, markers, three_workers):
+    finished = []
+    results = sharding.map_pages(
+        make_pdf(12), _busy_page, markers, min_pages=2,
+        on_result=lambda page_num, result: finished.append(page_num)
+    )
+    assert [number for number, running in results] == list(range(12))
+    assert sorted(finished) == list(range(12))
+
+def test_a_job_keeps_only_its_share_of_workers_busy(make_pdf, markers, three_workers):
+    sharding.set_job_cores(2)
+    assert sharding.workers() == 2
+    results = sharding.map_pages(make_pdf(12), _busy_page, markers, min_pages=2)
+    assert max(running for number, running in results) <= 2
+
+    sharding.set_job_cores(1)
+    assert not sharding._parallel(100, 2)
+
+def _square(item, offset):
+    return item * item + offset
+
+def test_map_items_keeps_item_order(three_workers):
+    assert sharding.map_items(_square, range(40), 1, min_items=2) == [i * i + 1 for i in range(40)]
+
+def _exit_in_worker(item):
+    os._exit(1)
+
+def test_shutdown_pool_stops_the_workers(three_workers):
+    sharding.map_items(_square, range(8), 0, min_items=2)
+    processes = list(sharding._pool._processes.values())
+    sharding.shutdown_pool()
+    assert sharding._pool is None
+    assert not any(process.is_alive() for process in processes)
+
+def test_broken_pool_is_shut_down_and_replaced(three_workers):
+    sharding.map_items(_square, range(8), 0, min_items=2)
+    processes = list(sharding._pool._processes.values())
+    with pytest.raises(sharding.BrokenProcessPool):
+        sharding.map_items(_exit_in_worker, range(8), min_items=2)
+    assert sharding._pool is None
+    for process in processes:
+        process.join(5)
+    assert not any(process.is_alive() for process in processes)
+    assert sharding.map_items(_square, range(8), 0, min_items=2) == [i * i for i in range(8)]
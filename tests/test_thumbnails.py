@@ -0,0 +1,43 @@
+import os
+import json
+import shutil
+
+import pytest
+
+from services import admission, jobs
+from services.storage import UPLOAD_FOLDER
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+@pytest.fixture
+def upload(make_pdf):
+    """upload(pages, name) -> server_filename of an uploaded PDF with that many pages."""
+    def make(pages, name):
+        shutil.copy(make_pdf(pages, name), os.path.join(UPLOAD_FOLDER, name))
+        return name
+    return make
+
+def test_sprite_stops_at_the_last_page(client, upload):
+    name = upload(30, 'thirty.pdf')
+    response = client.get(f'/api/thumbnails/{name}/sprite?width=100')
+    assert response.status_code == 200
+    assert len(json.loads(response.headers['X-Sprite-Frames'])) == 30
+
+    response = client.get(f'/api/thumbnails/{name}/sprite?first=31&width=100')
+    assert response.status_code == 400
+
+def test_renders_take_a_light_slot(client, upload, monkeypatch):
+    name = upload(2, 'busy.pdf')
+    monkeypatch.setitem(admission.CLASS_LIMITS, admission.DEFAULT_COST_CLASS, 0)
+    response = client.get(f'/api/thumbnails/{name}/1?width=100')
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+
+    monkeypatch.setitem(admission.CLASS_LIMITS, admission.DEFAULT_COST_CLASS, 1)
+    assert client.get(f'/api/thumbnails/{name}/1?width=100').status_code == 200
+    assert client.get(f'/api/thumbnails/{name}/sprite?width=100').status_code == 200
+    # The slots are given back once the render is done
+    assert jobs.class_usage()[admission.DEFAULT_COST_CLASS]['running'] == 0
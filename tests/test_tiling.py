@@ -0,0 +1,112 @@
+import io
+
+import fitz
+import numpy as np
+import pytest
+from PIL import Image
+
+from tools import tiling, pdf_to_jpg
+
+ZOOM = 1.5
+# About 40 rows of the test page a band, so every page is split many times
+BUDGET = 20000
+
+@pytest.fixture
+def page():
+    gradient = np.tile(np.linspace(0, 255, 120, dtype=np.uint8), (80, 1))
+    photo = io.BytesIO()
+    Image.fromarray(np.dstack([gradient, gradient[::-1], np.full_like(gradient, 90)])).save(photo, 'PNG')
+
+    pdf = fitz.open()
+    # 301 x 203 pt: neither side a whole number of JPEG blocks at ZOOM
+    page = pdf.new_page(width=301, height=203)
+    page.draw_rect(fitz.Rect(10, 10, 140, 90), color=(0, 0, 1), fill=(1, 0.8, 0.2))
+    page.insert_text((20, 130), 'Banded rendering', fontsize=22)
+    page.insert_image(fitz.Rect(160, 20, 290, 190), stream=photo.getvalue())
+    yield page
+    pdf.close()
+
+def _full(page, gray=False):
+    pix = page.get_pixmap(matrix=fitz.Matrix(ZOOM, ZOOM), colorspace=fitz.csGRAY if gray else fitz.csRGB)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+def _decode(data, gray):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    pixels = np.asarray(image)
+    return pixels[:, :, None] if gray else pixels
+
+def _mean_difference(a, b):
+    assert a.shape == b.shape
+    return np.abs(a.astype(int) - b.astype(int)).mean()
+
+def test_needs_tiling_follows_the_budget(page):
+    width, height = tiling.page_pixels(page, ZOOM)
+    assert tiling.needs_tiling(page, ZOOM, budget=width * height - 1)
+    assert not tiling.needs_tiling(page, ZOOM, budget=width * height)
+
+@pytest.mark.parametrize('gray', [False, True])
+def test_bands_cover_the_page_once(page, gray):
+    bands = list(tiling.bands(page, ZOOM, gray=gray, budget=BUDGET))
+    assert len(bands) > 5
+    assert all(band.size <= BUDGET * band.shape[2] for band in bands)
+    assert _mean_difference(np.concatenate(bands), _full(page, gray)) < 1
+
+@pytest.mark.parametrize('gray', [False, True])
+def test_png_written_in_bands_matches_a_full_render(page, gray):
+    width, height = tiling.page_pixels(page, ZOOM)
+    out = io.BytesIO()
+    tiling.write_png(out, width, height, gray, tiling.bands(page, ZOOM, gray=gray, budget=BUDGET))
+    assert _mean_difference(_decode(out.getvalue(), gray), _full(page, gray)) < 1
+
+@pytest.mark.parametrize('gray', [False, True])
+def test_jpeg_written_in_bands_matches_a_whole_image_encode(page, gray):
+    width, height = tiling.page_pixels(page, ZOOM)
+    out = io.BytesIO()
+    tiling.write_jpeg(out, width, height, gray, tiling.bands(page, ZOOM, gray=gray, budget=BUDGET), 85,
+                      budget=BUDGET)
+    banded = _decode(out.getvalue(), gray)
+    # Several restart intervals, so the bands really were joined
+    assert out.getvalue().count(b'\xff\xd0') >= 1
+
+    full = _full(page, gray)
+    whole = io.BytesIO()
+    if gray:
+        Image.fromarray(full[:, :, 0]).save(whole, 'JPEG', quality=85)
+    else:
+        Image.fromarray(full).save(whole, 'JPEG', quality=85, subsampling=2)
+    assert _mean_difference(banded, _decode(whole.getvalue(), gray)) < 1
+    assert _mean_difference(banded, full) < 3
+
+@pytest.mark.parametrize('image_format', ['jpeg', 'png'])
+def test_pdf_to_jpg_tiles_pages_over_the_budget(page, tmp_path, monkeypatch, image_format):
+    input_path = str(tmp_path / 'in.pdf')
+    page.parent.save(input_path)
+    monkeypatch.setattr(tiling, 'RENDER_PIXEL_BUDGET', BUDGET)
+
+    result = pdf_to_jpg.pdf_to_jpg(input_path, str(tmp_path), dpi=ZOOM * 72, image_format=image_format)
+    assert result['success'], result.get('error')
+    with open(result['output_path'], 'rb') as f:
+        rendered = _decode(f.read(), False)
+    assert _mean_difference(rendered, _full(page)) < 3
+
+def test_pdf_to_jpg_reports_webp_pages_scaled_to_the_budget(page, tmp_path, monkeypatch):
+    input_path = str(tmp_path / 'in.pdf')
+    page.parent.save(input_path)
+    monkeypatch.setattr(tiling, 'RENDER_PIXEL_BUDGET', BUDGET)
+
+    result = pdf_to_jpg.pdf_to_jpg(input_path, str(tmp_path), dpi=ZOOM * 72, image_format='webp')
+    assert result['success'], result.get('error')
+    reported = result['downscaled'][0]
+    assert reported['page'] == 1
+    assert [reported['width'], reported['height']] < list(tiling.page_pixels(page, ZOOM))
+    # Pixel edges are rounded outwards, so the area is only about the budget
+    assert reported['width'] * reported['height'] <= BUDGET * 1.05
+    with Image.open(result['output_path']) as image:
+        assert image.size == (reported['width'], reported['height'])
+
+def test_pdf_to_jpg_reports_nothing_for_pages_at_full_size(page, tmp_path):
+    input_path = str(tmp_path / 'in.pdf')
+    page.parent.save(input_path)
+    result = pdf_to_jpg.pdf_to_jpg(input_path, str(tmp_path), dpi=ZOOM * 72, image_format='webp')
+    assert 'downscaled' not in result
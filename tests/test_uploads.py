@@ -0,0 +1,79 @@
+import io
+import os
+import hashlib
+
+from services import uploads
+
+PDF = b'%PDF-1.4\n' + b'0123456789' * 100
+
+def _write(upload_id, offset, data):
+    return uploads.write_chunk(upload_id, offset, io.BytesIO(data), len(data))
+
+def test_chunks_are_reassembled_and_hashed():
+    upload = uploads.init_upload('report.pdf', len(PDF))
+    assert _write(upload['upload_id'], 0, PDF[:400])['offset'] == 400
+    assert _write(upload['upload_id'], 400, PDF[400:])['offset'] == len(PDF)
+
+    result = uploads.finalize_upload(upload['upload_id'])
+    assert result['success']
+    assert result['sha256'] == hashlib.sha256(PDF).hexdigest()
+    with open(result['path'], 'rb') as f:
+        assert f.read() == PDF
+    assert uploads.get_upload(upload['upload_id']) is None
+
+def test_chunk_at_the_wrong_offset_is_a_conflict():
+    upload = uploads.init_upload('report.pdf', len(PDF))
+    _write(upload['upload_id'], 0, PDF[:400])
+
+    result = _write(upload['upload_id'], 600, PDF[600:800])
+    assert result['status'] == 409
+    assert result['offset'] == 400
+
+def test_resent_chunk_is_acknowledged_without_rewriting():
+    upload = uploads.init_upload('report.pdf', len(PDF))
+    _write(upload['upload_id'], 0, PDF[:400])
+
+    result = _write(upload['upload_id'], 0, PDF[:400])
+    assert result['success']
+    assert result['offset'] == 400
+
+def test_finalize_before_the_last_chunk_is_a_conflict():
+    upload = uploads.init_upload('report.pdf', len(PDF))
+    _write(upload['upload_id'], 0, PDF[:400])
+
+    result = uploads.finalize_upload(upload['upload_id'])
+    assert result['status'] == 409
+    assert result['offset'] == 400
+
+def test_chunk_past_the_declared_size_is_rejected():
+    upload = uploads.init_upload('report.pdf', 10)
+    assert _write(upload['upload_id'], 0, PDF[:20])['status'] == 400
+
+def test_content_must_match_the_file_type():
+    upload = uploads.init_upload('photo.png', len(PDF))
+    assert _write(upload['upload_id'], 0, PDF)['status'] == 415
+
+    upload = uploads.init_upload('report.pdf', 100)
+    assert _write(upload['upload_id'], 0, b'<html>' + b' ' * 94)['status'] == 415
+
+def test_pdf_header_may_follow_leading_junk():
+    data = b'\r\n\x00junk' + PDF
+    upload = uploads.init_upload('report.pdf', len(data))
+    assert _write(upload['upload_id'], 0, data)['success']
+
+def test_http_chunk_upload_reports_the_expected_offset():
+    from app import app
+    client = app.test_client()
+
+    upload = client.post('/api/upload/init', json={'filename': 'report.pdf', 'size': len(PDF)}).get_json()
+    url = f"/api/upload/{upload['upload_id']}"
+    assert client.put(f'{url}?offset=0', data=PDF[:400]).get_json()['offset'] == 400
+
+    response = client.put(f'{url}?offset=800', data=PDF[800:])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 400
+
+    client.put(f'{url}?offset=400', data=PDF[400:])
+    finalized = client.post(f'{url}/finalize').get_json()
+    assert finalized['sha256'] == hashlib.sha256(PDF).hexdigest()
+    assert os.path.exists(os.path.join(uploads.UPLOAD_FOLDER, finalized['filename']))
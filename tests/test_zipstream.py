@@ -0,0 +1,84 @@
+import io
+import os
+import zipfile
+import threading
+
+import pytest
+
+from services import zipstream
+
+def _folder(tmp_path, files):
+    folder = tmp_path / 'out'
+    folder.mkdir()
+    for name, data in files.items():
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return str(folder)
+
+def test_folder_members_sort_page_numbers_naturally(tmp_path):
+    folder = _folder(tmp_path, {'page_10.jpg': b'10', 'page_2.jpg': b'2', 'page_1.jpg': b'1'})
+    assert [arcname for path, arcname in zipstream.folder_members(folder)] == [
+        'page_1.jpg', 'page_2.jpg', 'page_10.jpg'
+    ]
+
+def test_stream_zip_yields_a_valid_archive_in_pieces(tmp_path):
+    files = {
+        'page_1.jpg': os.urandom(zipstream.READ_SIZE * 2 + 5),
+        'notes.txt': b'some text ' * 1000,
+        'sub/page_2.png': os.urandom(100),
+    }
+    folder = _folder(tmp_path, files)
+    pieces = list(zipstream.stream_zip(zipstream.folder_members(folder)))
+    assert len(pieces) > 1
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(pieces))) as archive:
+        assert archive.testzip() is None
+        for name, data in files.items():
+            assert archive.read(name) == data
+        # Already-compressed formats are stored, the rest deflated
+        assert archive.getinfo('page_1.jpg').compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo('notes.txt').compress_type == zipfile.ZIP_DEFLATED
+
+def test_stream_zip_keeps_the_archive_only_when_complete(tmp_path):
+    folder = _folder(tmp_path, {'a.txt': b'a' * 1000, 'b.txt': b'b' * 1000})
+    cache_path = str(tmp_path / 'out.zip')
+    completed = []
+
+    data = b''.join(zipstream.stream_zip(zipstream.folder_members(folder), cache_path, on_complete=completed.append))
+    assert completed == [cache_path]
+    with open(cache_path, 'rb') as f:
+        assert f.read() == data
+
+    os.remove(cache_path)
+    stream = zipstream.stream_zip(zipstream.folder_members(folder), cache_path)
+    next(stream)
+    stream.close()
+    assert not os.path.exists(cache_path)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.part')]
+
+def test_follow_members_waits_for_files_still_being_written(tmp_path):
+    folder = _folder(tmp_path, {'page_1.png': b'one'})
+    finished = threading.Event()
+
+    def write_the_rest():
+        with open(os.path.join(folder, 'page_2.png.part'), 'wb') as f:
+            f.write(b'two')
+        os.replace(os.path.join(folder, 'page_2.png.part'), os.path.join(folder, 'page_2.png'))
+        finished.set()
+
+    timer = threading.Timer(zipstream.FOLLOW_POLL_SECONDS * 2, write_the_rest)
+    timer.start()
+    members = zipstream.follow_members(folder, ['page_1.png', 'page_2.png'], finished.is_set)
+    data = b''.join(zipstream.stream_zip(members))
+    timer.join()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ['page_1.png', 'page_2.png']
+        assert archive.read('page_2.png') == b'two'
+
+def test_follow_members_fails_once_a_missing_file_cannot_appear(tmp_path):
+    folder = _folder(tmp_path, {'page_1.png': b'one'})
+    members = zipstream.follow_members(folder, ['page_1.png', 'page_2.png'], lambda: True)
+    with pytest.raises(FileNotFoundError):
+        b''.join(zipstream.stream_zip(members))
@@ -2,8 +2,805 @@ import fitz
 from PIL import Image
 import io
 import os
+import re
+import time
+import zlib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
-def compress_pdf(input_path, output_path, quality='medium'):
+from tools import image_codecs, sharding
+
+QUALITY_SETTINGS = {
+    'extreme': {
+        'image_quality': 10,  # Significantly lower quality
+        'max_image_width': 600,  # Lower resolution
+        'max_image_height': 600,
+        'grayscale': True,  # Add flag for grayscale
+        'garbage': 4,
+        'deflate': True,
+        'deflate_images': True,
+        'deflate_fonts': True,
+        'clean': True,
+        'pretty': False,
+        'linear': False,
+    },
+    'medium': {
+        'image_quality': 60,
+        'max_image_width': 1800,
+        'max_image_height': 1800,
+        'garbage': 4,
+        'deflate': True,
+        'deflate_images': True,
+        'deflate_fonts': True,
+        'clean': True,
+        'pretty': False,
+        'linear': False,
+    },
+    'less': {
+        'image_quality': 85,
+        'max_image_width': 2400,
+        'max_image_height': 2400,
+        'garbage': 3,
+        'deflate': True,
+        'deflate_images': True,
+        'deflate_fonts': True,
+        'clean': True,
+        'pretty': False,
+        'linear': False,
+    }
+}
+
+SAVE_OPTIONS = ('garbage', 'deflate', 'deflate_images', 'deflate_fonts', 'clean', 'pretty', 'linear')
+
+def _settings(quality):
+    return QUALITY_SETTINGS.get(quality, QUALITY_SETTINGS['medium'])
+
+def save_options(quality='medium', target_bytes=0, merge_similar=0, min_ssim=0):
+    """Options for Document.save at this quality level."""
+    # Target-size mode estimates sizes with the medium options
+    settings = _settings('medium' if target_bytes else quality)
+    return {name: settings[name] for name in SAVE_OPTIONS}
+
+# Unique images are encoded in batches, so a long document never has all
+# of its extracted images in memory at once
+IMAGE_BATCH_SIZE = 32
+# Classes whose encoding doesn't depend on JPEG quality
+LOSSLESS_CLASSES = (image_codecs.FLAT, image_codecs.BILEVEL)
+# Images of one size whose SSIM quality searches run in turn in one worker
+SSIM_GROUP_SIZE = 4
+# Starting the worker pool only pays off with a few images to encode
+MIN_PARALLEL_IMAGES = 4
+
+def _collect_images(pdf):
+    """
+    xref -> number of page references for every image the document places,
+    and xref -> the (page or form xref, resource name) pairs that place it.
+    """
+    references = {}
+    placements = {}
+    for page in pdf:
+        for img in page.get_images(full=True):
+            references[img[0]] = references.get(img[0], 0) + 1
+            placements.setdefault(img[0], set()).add((img[9] or page.xref, img[7]))
+    return references, placements
+
+def _fit(image, max_width, max_height):
+    """The image scaled down to fit the box, and whether it had to be."""
+    original_width, original_height = image.size
+    if original_width <= max_width and original_height <= max_height:
+        return image, False
+    ratio = min(max_width / original_width, max_height / original_height)
+    new_width = max(1, int(original_width * ratio))
+    new_height = max(1, int(original_height * ratio))
+    return image.resize((new_width, new_height), Image.LANCZOS), True
+
+def _open_scaled(image_bytes, max_width, max_height):
+    """
+    Open an image for downscaling into the box. JPEGs are decoded at a
+    reduced scale in the DCT domain (1/2, 1/4 or 1/8, the smallest that
+    still covers the box), so pixels the resize would throw away are never
+    decoded. Returns the image, not yet fitted, and its original size.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    original_size = image.size
+    width, height = original_size
+    if image.format == 'JPEG' and (width > max_width or height > max_height):
+        ratio = min(max_width / width, max_height / height)
+        image.draft(image.mode, (max(1, int(width * ratio)), max(1, int(height * ratio))))
+    return image, original_size
+
+def _flatten(image, grayscale=False):
+    """The image as L or RGB, alpha flattened onto white."""
+    if grayscale:
+        image = image.convert('L')
+    
+    if image.mode in ('RGBA', 'P', 'LA') and image.mode != 'L':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        if image.mode in ('RGBA', 'LA'):
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        else:
+            image = image.convert('RGB')
+    elif image.mode != 'RGB' and image.mode != 'L':
+        image = image.convert('RGB')
+    return image
+
+def _recompress(image_bytes, settings, quality_hint=None):
+    """
+    Downscale, classify and re-encode one image (see tools.image_codecs).
+    Runs in a worker process, so it only takes and returns bytes and plain
+    values: (data, dictionary entries, class, downscaled, JPEG quality) or
+    None. With settings['min_ssim'], JPEG quality is searched per image,
+    starting from `quality_hint`.
+    """
+    try:
+        image, original_size = _open_scaled(image_bytes, settings['max_image_width'], settings['max_image_height'])
+        image, downscaled = _fit(image, settings['max_image_width'], settings['max_image_height'])
+        downscaled = downscaled or image.size != original_size
+        image = _flatten(image, settings.get('grayscale'))
+        image_class = image_codecs.classify(image)
+        quality = None
+        if image_class not in LOSSLESS_CLASSES:
+            quality = settings['image_quality']
+            if settings.get('min_ssim'):
+                quality = image_codecs.lowest_quality(image, image_class, settings['min_ssim'], quality_hint)
+        data, entries = image_codecs.encode(image, image_class, quality)
+        entries.update(Width=str(image.width), Height=str(image.height))
+        return data, entries, image_class, downscaled, quality
+    except Exception as e:
+        return None
+
+def _recompress_group(group, settings):
+    """
+    _recompress for images of the same dimensions in turn, each quality
+    search starting from where the previous image's ended.
+    """
+    results = []
+    hint = None
+    for image_bytes in group:
+        result = _recompress(image_bytes, settings, hint)
+        if result is not None and result[4] is not None:
+            hint = result[4]
+        results.append(result)
+    return results
+
+def _groups(pdf, xrefs, size):
+    """Lists of at most `size` indexes into xrefs, each of images of the same dimensions."""
+    by_dimensions = {}
+    for index, xref in enumerate(xrefs):
+        dimensions = (pdf.xref_get_key(xref, 'Width')[1], pdf.xref_get_key(xref, 'Height')[1])
+        by_dimensions.setdefault(dimensions, []).append(index)
+    return [indexes[i:i + size] for indexes in by_dimensions.values() for i in range(0, len(indexes), size)]
+
+def _replace_image(pdf, xref, data, entries):
+    """Store an encoded image as the xref's stream and make its dictionary describe it."""
+    pdf.update_stream(xref, data, compress=0)
+    for key, value in entries.items():
+        pdf.xref_set_key(xref, key, value)
+    # Colour key masks are in terms of the old colour space
+    for key in ('DecodeParms', 'Decode', 'Mask'):
+        kind = pdf.xref_get_key(xref, key)[0]
+        if kind != 'null' and (key != 'Mask' or kind == 'array'):
+            pdf.xref_set_key(xref, key, 'null')
+
+def _count_class(image_classes, image_class, original_bytes, new_bytes):
+    counts = image_classes.setdefault(image_class, {'images': 0, 'original_bytes': 0, 'new_bytes': 0})
+    counts['images'] += 1
+    counts['original_bytes'] += original_bytes
+    counts['new_bytes'] += new_bytes
+
+# Decoded copies of an image are compared at this size at most
+FINGERPRINT_SIZE = 256
+# Width/height ratios of similar images may differ by this much
+MAX_ASPECT_DIFFERENCE = 0.02
+
+def _exact_key(pdf, xref, keys):
+    """
+    Digest of an object and everything it refers to, e.g. an image with its
+    colour space and soft mask, that is the same for identical copies.
+    `keys` caches digests by xref across calls.
+    """
+    if xref not in keys:
+        # Placeholder in case objects refer back to each other
+        keys[xref] = str(xref).encode()
+        digest = hashlib.blake2b(digest_size=16)
+        if pdf.xref_is_stream(xref):
+            digest.update(pdf.xref_stream_raw(xref))
+        # Length follows from the stream; other objects count by content, not number
+        text = re.sub(r'/Length\b[^/>]*', '', pdf.xref_object(xref, compressed=True))
+        text = re.sub(r'\b(\d+) 0 R\b', lambda match: _exact_key(pdf, int(match.group(1)), keys).hex(), text)
+        digest.update(text.encode())
+        keys[xref] = digest.digest()
+    return keys[xref]
+
+def _fingerprint(image_bytes):
+    """Original size and image_codecs.fingerprint of one image, or None. Runs in a worker process."""
+    try:
+        image, original_size = _open_scaled(image_bytes, FINGERPRINT_SIZE, FINGERPRINT_SIZE)
+        image = _flatten(_fit(image, FINGERPRINT_SIZE, FINGERPRINT_SIZE)[0])
+        return original_size, image_codecs.fingerprint(image)
+    except Exception as e:
+        return None
+
+def _similar_images(pdf, xrefs):
+    """duplicate xref -> xref of a similar, larger image it can be replaced with."""
+    candidates = []
+    for xref in xrefs:
+        if pdf.xref_get_key(xref, 'SMask')[0] != 'null' or pdf.xref_get_key(xref, 'ImageMask')[1] == 'true':
+            continue
+        try:
+            width, height = (int(pdf.xref_get_key(xref, key)[1]) for key in ('Width', 'Height'))
+        except ValueError:
+            continue
+        lossy = any(name in pdf.xref_get_key(xref, 'Filter')[1] for name in ('DCTDecode', 'JPXDecode'))
+        candidates.append((-width * height, lossy, xref))
+    # Largest and losslessly stored first, so every group keeps its sharpest copy
+    candidates = [xref for area, lossy, xref in sorted(candidates)]
+
+    duplicates = {}
+    kept = []
+    for i in range(0, len(candidates), IMAGE_BATCH_SIZE):
+        batch = []
+        for xref in candidates[i:i + IMAGE_BATCH_SIZE]:
+            try:
+                base_image = pdf.extract_image(xref)
+            except Exception as e:
+                continue
+            if base_image and base_image.get("image"):
+                batch.append((xref, base_image["image"]))
+        fingerprints = sharding.map_items(
+            _fingerprint, [image_bytes for xref, image_bytes in batch], min_items=MIN_PARALLEL_IMAGES
+        )
+        for (xref, image_bytes), result in zip(batch, fingerprints):
+            if result is None:
+                continue
+            (width, height), fingerprint = result
+            for kept_xref, kept_width, kept_height, kept_fingerprint in kept:
+                aspect_difference = abs(width * kept_height - kept_width * height) / (kept_width * height)
+                if aspect_difference <= MAX_ASPECT_DIFFERENCE and image_codecs.similar(fingerprint, kept_fingerprint):
+                    duplicates[xref] = kept_xref
+                    break
+            else:
+                kept.append((xref, width, height, fingerprint))
+    return duplicates
+
+def _xobject_resources(pdf, xref):
+    """(object xref, key path) of the XObject resources of a page or form, or None."""
+    seen = set()
+    kind, value = pdf.xref_get_key(xref, 'Resources')
+    # Pages can inherit resources from the page tree
+    while kind == 'null' and xref not in seen:
+        seen.add(xref)
+        kind, parent = pdf.xref_get_key(xref, 'Parent')
+        if kind != 'xref':
+            return None
+        xref = int(parent.split()[0])
+        kind, value = pdf.xref_get_key(xref, 'Resources')
+    # Setting a key through an indirect object replaces it, so resolve each level
+    path = 'Resources/'
+    if kind == 'xref':
+        xref, path = int(value.split()[0]), ''
+    kind, value = pdf.xref_get_key(xref, path + 'XObject')
+    if kind == 'xref':
+        return int(value.split()[0]), ''
+    if kind == 'dict':
+        return xref, path + 'XObject/'
+    return None
+
+def _repoint(pdf, xref, name, old, new):
+    """Make the page or form's resource `name` refer to image `new` instead of `old`."""
+    resources = _xobject_resources(pdf, xref)
+    if resources is None:
+        return False
+    holder, path = resources
+    current = pdf.xref_get_key(holder, path + name)
+    if current == ('xref', f'{new} 0 R'):
+        # Resources shared with a page already done
+        return True
+    if current != ('xref', f'{old} 0 R'):
+        return False
+    pdf.xref_set_key(holder, path + name, f'{new} 0 R')
+    return True
+
+def merge_duplicate_images(pdf, references, placements, similar=False):
+    """
+    Point every placement of a duplicated image at one copy; the copies left
+    unused are dropped by the save's garbage collection. Images whose stream
+    and dictionary are identical are always merged, and with `similar` so
+    are images that look the same decoded, e.g. a logo embedded once per
+    page at different qualities. Updates `references` in place and returns
+    the number of images merged and how many of those were only similar.
+    """
+    duplicates = {}
+    by_key = {}
+    keys = {}
+    for xref in references:
+        key = _exact_key(pdf, xref, keys)
+        if key in by_key:
+            duplicates[xref] = by_key[key]
+        else:
+            by_key[key] = xref
+    exact = set(duplicates)
+    if similar:
+        similar_images = _similar_images(pdf, list(by_key.values()))
+        # Copies of an image that is itself merged follow it
+        duplicates = {xref: similar_images.get(keep, keep) for xref, keep in duplicates.items()}
+        duplicates.update(similar_images)
+
+    merged = 0
+    merged_similar = 0
+    for duplicate, keep in duplicates.items():
+        # Every placement is tried; the image only goes if all were moved
+        if all([_repoint(pdf, xref, name, duplicate, keep) for xref, name in placements[duplicate]]):
+            references[keep] += references.pop(duplicate)
+            merged += 1
+            if duplicate not in exact:
+                merged_similar += 1
+    return merged, merged_similar
+
+def recompress_images(pdf, settings, merge_similar=False, min_ssim=0):
+    """
+    Downscale and re-encode the images of an open document in place. Copies
+    of an image are merged first (see merge_duplicate_images), each image
+    object is encoded once however many pages show it, and the encoding is
+    spread over the worker pool. With min_ssim, each JPEG gets the lowest
+    quality that keeps that SSIM instead of the level's quality. Returns
+    counts, stored bytes before and after per image class, how many images
+    got each JPEG quality, and per-phase timings.
+    """
+    settings = dict(settings, min_ssim=min_ssim)
+    timings = {'scan': 0.0, 'merge': 0.0, 'extract': 0.0, 'encode': 0.0, 'apply': 0.0}
+    started = time.perf_counter()
+    references, placements = _collect_images(pdf)
+    images_unique = len(references)
+    timings['scan'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    images_merged, images_merged_similar = merge_duplicate_images(pdf, references, placements, merge_similar)
+    xrefs = [xref for xref in references if pdf.xref_get_key(xref, 'ImageMask')[1] != 'true']
+    timings['merge'] = time.perf_counter() - started
+
+    images_compressed = 0
+    images_downscaled = 0
+    image_classes = {}
+    qualities = {}
+    parallel_threshold = MIN_PARALLEL_IMAGES if len(xrefs) >= MIN_PARALLEL_IMAGES else len(xrefs) + 1
+    
+    for i in range(0, len(xrefs), IMAGE_BATCH_SIZE):
+        started = time.perf_counter()
+        batch = []
+        for xref in xrefs[i:i + IMAGE_BATCH_SIZE]:
+            try:
+                base_image = pdf.extract_image(xref)
+            except Exception as e:
+                continue
+            if base_image and base_image.get("image"):
+                batch.append((xref, base_image["image"]))
+        timings['extract'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        # Quality searches are shared by images of the same size, which tend to be alike
+        groups = _groups(pdf, [xref for xref, image_bytes in batch], SSIM_GROUP_SIZE if settings.get('min_ssim') else 1)
+        encoded = [None] * len(batch)
+        for group, results in zip(groups, sharding.map_items(
+            _recompress_group, [[batch[index][1] for index in group] for group in groups], settings,
+            min_items=parallel_threshold
+        )):
+            for index, result in zip(group, results):
+                encoded[index] = result
+        timings['encode'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for (xref, image_bytes), result in zip(batch, encoded):
+            if result is None:
+                continue
+            data, entries, image_class, downscaled, quality = result
+            if downscaled:
+                images_downscaled += 1
+            if quality is not None:
+                qualities[quality] = qualities.get(quality, 0) + 1
+            # Compare with what the file stores, not the decoded extract
+            stored = len(pdf.xref_stream_raw(xref))
+            if len(data) < stored:
+                _replace_image(pdf, xref, data, entries)
+                images_compressed += 1
+            _count_class(image_classes, image_class, stored, min(len(data), stored))
+        timings['apply'] += time.perf_counter() - started
+
+    return {
+        'images_referenced': sum(references.values()),
+        'images_unique': images_unique,
+        'images_merged': images_merged,
+        'images_merged_similar': images_merged_similar,
+        'images_compressed': images_compressed,
+        'images_downscaled': images_downscaled,
+        'image_classes': image_classes,
+        'quality_distribution': dict(sorted(qualities.items())),
+        'timings': timings,
+    }
+
+# Target-size mode searches JPEG quality within each of these image size
+# limits, largest first; below TARGET_QUALITY_FLOOR it prefers smaller
+# images to blockier ones, except at the last step, which goes down to
+# the lowest quality before giving up.
+TARGET_MAX_DIMENSIONS = (2400, 1800, 1200, 900, 600, 400)
+TARGET_QUALITY_RANGE = (10, 85)
+TARGET_QUALITY_FLOOR = 40
+# Quality steps smaller than this barely change the size
+TARGET_QUALITY_STEP = 5
+
+def _saved_stream_size(pdf, xref):
+    """Length of the stream once saved: streams without a /Filter are deflated (deflate_images)."""
+    raw = pdf.xref_stream_raw(xref)
+    if pdf.xref_get_key(xref, 'Filter')[0] == 'null':
+        return len(zlib.compress(raw))
+    return len(raw)
+
+def _decode_images(pdf, xrefs, max_dimension):
+    """
+    [(xref, saved size, original size, class, bitmap)] for the images
+    Pillow can decode, with the bitmaps already scaled down to max_dimension.
+    """
+    images = []
+    for xref in xrefs:
+        try:
+            base_image = pdf.extract_image(xref)
+            if not base_image or not base_image.get("image"):
+                continue
+            image, original_size = _open_scaled(base_image["image"], max_dimension, max_dimension)
+            image, downscaled = _fit(image, max_dimension, max_dimension)
+            image = _flatten(image)
+            image.load()
+        except Exception as e:
+            continue
+        images.append((xref, _saved_stream_size(pdf, xref), original_size, image_codecs.classify(image), image))
+    return images
+
+def _encode_all(bitmaps, classes, quality, optimize=True, lossless=None):
+    """
+    [(data, dictionary entries)] for each bitmap. `lossless` caches the
+    quality-independent encodings by (index, size) across calls.
+    """
+    lossless = {} if lossless is None else lossless
+
+    def encode(index):
+        image, image_class = bitmaps[index], classes[index]
+        if image_class not in LOSSLESS_CLASSES:
+            return image_codecs.encode(image, image_class, quality, optimize)
+        key = (index, image.size)
+        if key not in lossless:
+            lossless[key] = image_codecs.encode(image, image_class, quality)
+        return lossless[key]
+
+    # Pillow releases the GIL while encoding, so threads share the cached bitmaps
+    if len(bitmaps) < 2 or sharding.workers() < 2:
+        return [encode(index) for index in range(len(bitmaps))]
+    with ThreadPoolExecutor(max_workers=sharding.workers()) as executor:
+        return list(executor.map(encode, range(len(bitmaps))))
+
+def compress_to_target(pdf, target_bytes, merge_similar=False):
+    """
+    Recompress the images of an open document in place so the saved file
+    comes in under target_bytes, keeping as much quality as that allows.
+    Each image is decoded once; every try re-encodes the cached bitmaps and
+    estimates the file size as the rest of the document (measured with one
+    save up front) plus the encoded images. Returns the same stats as
+    recompress_images plus the chosen settings under 'target'.
+    """
+    timings = {'merge': 0.0, 'measure': 0.0, 'scan': 0.0, 'decode': 0.0, 'search': 0.0, 'apply': 0.0}
+    started = time.perf_counter()
+    references, placements = _collect_images(pdf)
+    images_unique = len(references)
+    images_merged, images_merged_similar = merge_duplicate_images(pdf, references, placements, merge_similar)
+    timings['merge'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pdf.set_metadata({})
+    # Garbage collection renumbers objects in the open document (and drops
+    # the merged copies), so the images are looked up again afterwards
+    saved_size = len(pdf.tobytes(**save_options(target_bytes=target_bytes)))
+    timings['measure'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    references = _collect_images(pdf)[0]
+    xrefs = [xref for xref in references if pdf.xref_get_key(xref, 'ImageMask')[1] != 'true']
+    timings['scan'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    images = _decode_images(pdf, xrefs, TARGET_MAX_DIMENSIONS[0])
+    stored = [size for xref, size, original_size, image_class, image in images]
+    classes = [image_class for xref, size, original_size, image_class, image in images]
+    # Everything that isn't one of the images we can re-encode; zlib and
+    # MuPDF deflate the unfiltered images to slightly different sizes
+    rest = max(0, saved_size - sum(stored))
+    timings['decode'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tries = 0
+    lossless = {}
+
+    def estimate(bitmaps, quality):
+        nonlocal tries
+        tries += 1
+        # Baseline encodes are quick to size; the final optimized ones only come out smaller.
+        # Images that don't get smaller keep their original stream.
+        encoded = _encode_all(bitmaps, classes, quality, optimize=False, lossless=lossless)
+        return rest + sum(min(len(data), size) for (data, entries), size in zip(encoded, stored))
+
+    low, high = TARGET_QUALITY_RANGE
+    bitmaps = [image for xref, size, original_size, image_class, image in images]
+    # Only the bitmaps at the current size limit are kept
+    images = [(xref, size, original_size) for xref, size, original_size, image_class, image in images]
+    # Limits at or above the largest image change nothing, so start below it
+    top = max([max(image.size) for image in bitmaps] or [0])
+    dimensions = [top] + [d for d in TARGET_MAX_DIMENSIONS if d < top] if bitmaps else []
+
+    chosen = None
+    for index, dimension in enumerate(dimensions):
+        bitmaps = [_fit(image, dimension, dimension)[0] for image in bitmaps]
+        floor = low if index == len(dimensions) - 1 else TARGET_QUALITY_FLOOR
+
+        # Best case first at full size: often the budget is loose enough to stop
+        # there. Further down, the top is only worth trying once the floor fits.
+        if index == 0:
+            size = estimate(bitmaps, high)
+            if size <= target_bytes:
+                chosen = (dimension, high, size)
+                break
+        size = estimate(bitmaps, floor)
+        chosen = (dimension, floor, size)
+        if size > target_bytes:
+            continue
+        if index > 0:
+            size = estimate(bitmaps, high)
+            if size <= target_bytes:
+                chosen = (dimension, high, size)
+                break
+
+        # The floor fits and the top doesn't: find the highest quality that fits
+        fits, too_big = floor, high
+        while too_big - fits > TARGET_QUALITY_STEP:
+            quality = (fits + too_big) // 2
+            size = estimate(bitmaps, quality)
+            if size <= target_bytes:
+                fits = quality
+                chosen = (dimension, quality, size)
+            else:
+                too_big = quality
+        break
+    timings['search'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    images_compressed = 0
+    images_downscaled = 0
+    image_classes = {}
+    dimension, quality, estimated_size = chosen or (None, None, rest)
+    encoded = _encode_all(bitmaps, classes, quality, lossless=lossless) if chosen else []
+    for (xref, size, original_size), image_class, image, (data, entries) in zip(images, classes, bitmaps, encoded):
+        if len(data) < size:
+            _replace_image(pdf, xref, data, dict(entries, Width=str(image.width), Height=str(image.height)))
+            images_compressed += 1
+            if image.size != original_size:
+                images_downscaled += 1
+        _count_class(image_classes, image_class, size, min(len(data), size))
+    timings['apply'] = time.perf_counter() - started
+    photos = sum(1 for image_class in classes[:len(encoded)] if image_class not in LOSSLESS_CLASSES)
+
+    return {
+        'images_referenced': sum(references.values()),
+        'images_unique': images_unique,
+        'images_merged': images_merged,
+        'images_merged_similar': images_merged_similar,
+        'images_compressed': images_compressed,
+        'images_downscaled': images_downscaled,
+        'image_classes': image_classes,
+        'quality_distribution': {quality: photos} if photos else {},
+        'timings': timings,
+        'target': {
+            'max_dimension': dimension,
+            'quality': quality,
+            'estimated_size': estimated_size,
+            'tries': tries,
+        },
+    }
+
+# A compression estimate recompresses at most this many images at every
+# quality level, one from each stretch of the images sorted by size, and
+# stops sampling once it has used ESTIMATE_TIME_BUDGET seconds
+ESTIMATE_SAMPLE_IMAGES = 8
+ESTIMATE_TIME_BUDGET = 0.5
+# Only this many tiles of each sampled image are encoded and the size scaled
+# up by area; JPEG and Flate both code small neighbourhoods independently
+# enough for that to hold
+ESTIMATE_TILES = 4
+ESTIMATE_TILE_SIZE = 256
+# Copies of streams smaller than this aren't looked for; pages tend to have
+# many small streams of equal length that would all need reading
+ESTIMATE_MIN_COPY_BYTES = 2048
+
+def _streams(pdf):
+    """
+    xref -> stored size of every image stream that compression re-encodes,
+    then the bytes of exact copies among the images, which compression
+    merges, and among the other streams, which garbage=4 merges.
+    """
+    sizes = {}
+    images = set()
+    masks = set()
+    for xref in range(1, pdf.xref_length()):
+        if not pdf.xref_is_stream(xref):
+            continue
+        kind, value = pdf.xref_get_key(xref, 'Length')
+        if kind == 'xref':
+            value = pdf.xref_object(int(value.split()[0]))
+        try:
+            sizes[xref] = int(value)
+        except ValueError:
+            continue
+        if pdf.xref_get_key(xref, 'Subtype')[1] == '/Image':
+            kind, value = pdf.xref_get_key(xref, 'SMask')
+            if kind == 'xref':
+                masks.add(int(value.split()[0]))
+            if pdf.xref_get_key(xref, 'ImageMask')[1] != 'true':
+                images.add(xref)
+
+    # Only streams of the same length can be copies, so few get read
+    by_length = {}
+    for xref, size in sizes.items():
+        if size >= ESTIMATE_MIN_COPY_BYTES:
+            by_length.setdefault(size, []).append(xref)
+    image_copies = other_copies = 0
+    keys = {}
+    for size, xrefs in by_length.items():
+        if len(xrefs) < 2:
+            continue
+        seen = set()
+        for xref in xrefs:
+            key = _exact_key(pdf, xref, keys)
+            if key not in seen:
+                seen.add(key)
+            elif xref in images:
+                images.discard(xref)
+                image_copies += size
+            else:
+                other_copies += size
+    # Soft masks are kept as they are
+    return {xref: sizes[xref] for xref in images - masks}, image_copies, other_copies
+
+def _tiled_size(decoded, size, grayscale, image_class, quality):
+    """
+    Encoded size of the decoded image scaled to `size`, estimated from
+    ESTIMATE_TILES tiles so only they need scaling and encoding.
+    """
+    width, height = size
+    if width * height <= ESTIMATE_TILES * ESTIMATE_TILE_SIZE ** 2:
+        # reducing_gap halves first by whole pixels, close enough for a size estimate
+        image = decoded.resize(size, Image.LANCZOS, reducing_gap=2.0) if size != decoded.size else decoded
+        return len(image_codecs.encode(_flatten(image, grayscale), image_class, quality)[0])
+
+    scale_x, scale_y = decoded.width / width, decoded.height / height
+    tile_width, tile_height = min(width, ESTIMATE_TILE_SIZE), min(height, ESTIMATE_TILE_SIZE)
+    tiles = []
+    for i in range(ESTIMATE_TILES):
+        # Along the diagonal, to catch both edges and middle
+        left = (width - tile_width) * (i + 0.5) / ESTIMATE_TILES
+        top = (height - tile_height) * (i + 0.5) / ESTIMATE_TILES
+        box = (int(left * scale_x), int(top * scale_y), int((left + tile_width) * scale_x), int((top + tile_height) * scale_y))
+        # Cropped first: resizing with a box still works through whole rows
+        tiles.append(_flatten(decoded.crop(box).resize((tile_width, tile_height), Image.LANCZOS), grayscale))
+    # Headers and tables come once per image, not once per tile
+    overhead = len(image_codecs.encode(tiles[0].crop((0, 0, 8, 8)), image_class, quality)[0])
+    encoded = sum(max(0, len(image_codecs.encode(tile, image_class, quality)[0]) - overhead) for tile in tiles)
+    return overhead + encoded * width * height // (ESTIMATE_TILES * tile_width * tile_height)
+
+def _sample_ratios(pdf, xref, stored):
+    """quality level -> recompressed size over stored size for one image."""
+    base_image = pdf.extract_image(xref)
+    # Decoded once for the largest box; every level scales down from it
+    largest = max(max(settings['max_image_width'], settings['max_image_height']) for settings in QUALITY_SETTINGS.values())
+    decoded, (width, height) = _open_scaled(base_image["image"], largest, largest)
+    decoded = _flatten(decoded)
+    image_class = image_codecs.classify(decoded)
+    ratios = {}
+    for quality, settings in QUALITY_SETTINGS.items():
+        ratio = min(1, settings['max_image_width'] / width, settings['max_image_height'] / height)
+        size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+        new_bytes = _tiled_size(decoded, size, settings.get('grayscale'), image_class, settings['image_quality'])
+        # Images that don't get smaller keep their stream
+        ratios[quality] = min(new_bytes, stored) / stored
+    return ratios
+
+def estimate_compression(input_path):
+    """
+    Predict the compressed size at each quality level without compressing:
+    a few images are recompressed and the savings measured on them are
+    applied to all the images in proportion to their stored bytes. Exact
+    copies of a stream count as merged; everything else that isn't an
+    image is assumed to stay the same size.
+    """
+    try:
+        started = time.perf_counter()
+        original_size = os.path.getsize(input_path)
+        pdf = fitz.open(input_path)
+        try:
+            if pdf.is_encrypted:
+                return {'success': False, 'error': 'PDF is password protected'}
+            sizes, image_copies, other_copies = _streams(pdf)
+            image_bytes = min(sum(sizes.values()), original_size)
+
+            ordered = sorted(sizes, key=sizes.get)
+            stretch = max(1, -(-len(ordered) // ESTIMATE_SAMPLE_IMAGES))
+            strata = [ordered[i:i + stretch] for i in range(0, len(ordered), stretch)]
+            # The strata holding the most bytes are sampled first
+            strata.sort(key=lambda stratum: -sum(sizes[xref] for xref in stratum))
+
+            sampled = []
+            slowest = 0
+            for stratum in strata:
+                # Stop before a sample as slow as the slowest so far would overrun
+                if sampled and time.perf_counter() - started + slowest > ESTIMATE_TIME_BUDGET:
+                    break
+                sample_started = time.perf_counter()
+                xref = stratum[len(stratum) // 2]
+                try:
+                    ratios = _sample_ratios(pdf, xref, sizes[xref])
+                except Exception as e:
+                    continue
+                finally:
+                    slowest = max(slowest, time.perf_counter() - sample_started)
+                sampled.append((sum(sizes[x] for x in stratum), ratios))
+        finally:
+            pdf.close()
+
+        sampled_bytes = sum(stratum_bytes for stratum_bytes, ratios in sampled)
+        estimates = {}
+        for quality in QUALITY_SETTINGS:
+            if sampled_bytes:
+                # Strata that weren't sampled get the byte-weighted average ratio
+                ratio = sum(stratum_bytes * ratios[quality] for stratum_bytes, ratios in sampled) / sampled_bytes
+            else:
+                ratio = 1.0
+            copies = image_copies + (other_copies if QUALITY_SETTINGS[quality]['garbage'] >= 4 else 0)
+            new_size = max(0, min(original_size, round(original_size - copies - image_bytes * (1 - ratio))))
+            estimates[quality] = {
+                'new_size': new_size,
+                'reduction': round((original_size - new_size) / original_size * 100, 1) if original_size else 0,
+            }
+
+        return {
+            'success': True,
+            'original_size': original_size,
+            'image_bytes': image_bytes,
+            'images': len(sizes),
+            'images_sampled': len(sampled),
+            'duplicate_bytes': image_copies + other_copies,
+            'estimates': estimates,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+def compress_document(pdf, quality='medium', target_bytes=0, merge_similar=0, min_ssim=0):
+    """
+    Merge duplicate images, recompress them and drop metadata of an open
+    document in place. Returns the image stats of recompress_images (and
+    compress_to_target's 'target' with target_bytes).
+    """
+    if target_bytes:
+        stats = compress_to_target(pdf, target_bytes, bool(merge_similar))
+    else:
+        stats = recompress_images(pdf, _settings(quality), bool(merge_similar), min_ssim)
+    pdf.set_metadata({})
+    return stats
+
+def compress_pages(pdf, quality='medium', target_bytes=0, merge_similar=0, min_ssim=0):
+    """compress_document as a pipeline step: compress an open document in place and return it."""
+    compress_document(pdf, quality, target_bytes, merge_similar, min_ssim)
+    return pdf
+
+def compress_pdf(input_path, output_path, quality='medium', target_bytes=0, merge_similar=0, min_ssim=0):
     """
     Advanced PDF compression using dynamic techniques similar to iLovePDF.
     
@@ -19,138 +816,25 @@ def compress_pdf(input_path, output_path, quality='medium'):
     - 'extreme': Maximum compression, noticeable quality reduction (good for web/email)
     - 'recommended': Balanced compression, minimal quality loss (default)
     - 'less': Light compression, best quality preservation (for printing)
+    
+    With target_bytes set, the quality level is ignored: image quality and
+    resolution are chosen to bring the file under that size.
+
+    Identical copies of an image are stored once; with merge_similar, so
+    are copies that only look the same (re-encoded or rescaled).
+
+    With min_ssim (e.g. 0.995), each photo gets the lowest JPEG quality
+    that keeps its SSIM to the original at least that high, in place of
+    the level's quality; the level still sets the resolution.
     """
     try:
         pdf = fitz.open(input_path)
+        stats = compress_document(pdf, quality, target_bytes, merge_similar, min_ssim)
         
-        quality_settings = {
-            'extreme': {
-                'image_quality': 10,  # Significantly lower quality
-                'max_image_width': 600,  # Lower resolution
-                'max_image_height': 600,
-                'grayscale': True,  # Add flag for grayscale
-                'garbage': 4,
-                'deflate': True,
-                'deflate_images': True,
-                'deflate_fonts': True,
-                'clean': True,
-                'pretty': False,
-                'linear': False,
-            },
-            'medium': {
-                'image_quality': 60,
-                'max_image_width': 1800,
-                'max_image_height': 1800,
-                'garbage': 4,
-                'deflate': True,
-                'deflate_images': True,
-                'deflate_fonts': True,
-                'clean': True,
-                'pretty': False,
-                'linear': False,
-            },
-            'less': {
-                'image_quality': 85,
-                'max_image_width': 2400,
-                'max_image_height': 2400,
-                'garbage': 3,
-                'deflate': True,
-                'deflate_images': True,
-                'deflate_fonts': True,
-                'clean': True,
-                'pretty': False,
-                'linear': False,
-            }
-        }
-        
-        settings = quality_settings.get(quality, quality_settings['medium'])
-        
-        images_compressed = 0
-        images_downscaled = 0
-        
-        for page_num in range(len(pdf)):
-            page = pdf[page_num]
-            images = page.get_images(full=True)
-            
-            for img_index, img in enumerate(images):
-                try:
-                    xref = img[0]
-                    base_image = pdf.extract_image(xref)
-                    
-                    if not base_image:
-                        continue
-                    
-                    image_bytes = base_image.get("image")
-                    if not image_bytes:
-                        continue
-                    
-                    original_size = len(image_bytes)
-                    
-                    image = Image.open(io.BytesIO(image_bytes))
-                    original_width, original_height = image.size
-                    
-                    needs_resize = False
-                    new_width, new_height = original_width, original_height
-                    
-                    if original_width > settings['max_image_width'] or original_height > settings['max_image_height']:
-                        ratio = min(
-                            settings['max_image_width'] / original_width,
-                            settings['max_image_height'] / original_height
-                        )
-                        new_width = int(original_width * ratio)
-                        new_height = int(original_height * ratio)
-                        needs_resize = True
-                    
-                    if needs_resize:
-                        image = image.resize((new_width, new_height), Image.LANCZOS)
-                        images_downscaled += 1
-                    
-                    if settings.get('grayscale'):
-                        image = image.convert('L')
-                    
-                    if image.mode in ('RGBA', 'P', 'LA') and image.mode != 'L':
-                        background = Image.new('RGB', image.size, (255, 255, 255))
-                        if image.mode == 'P':
-                            image = image.convert('RGBA')
-                        if image.mode in ('RGBA', 'LA'):
-                            background.paste(image, mask=image.split()[-1])
-                            image = background
-                        else:
-                            image = image.convert('RGB')
-                    elif image.mode != 'RGB' and image.mode != 'L':
-                        image = image.convert('RGB')
-                    
-                    output_buffer = io.BytesIO()
-                    image.save(
-                        output_buffer, 
-                        format='JPEG', 
-                        quality=settings['image_quality'], 
-                        optimize=True,
-                        progressive=True
-                    )
-                    
-                    compressed_data = output_buffer.getvalue()
-                    
-                    if len(compressed_data) < original_size:
-                        pdf.update_stream(xref, compressed_data)
-                        images_compressed += 1
-                        
-                except Exception as e:
-                    continue
-        
-        pdf.set_metadata({})
-        
-        pdf.save(
-            output_path,
-            garbage=settings['garbage'],
-            deflate=settings['deflate'],
-            deflate_images=settings['deflate_images'],
-            deflate_fonts=settings['deflate_fonts'],
-            clean=settings['clean'],
-            pretty=settings['pretty'],
-            linear=settings['linear']
-        )
+        started = time.perf_counter()
+        pdf.save(output_path, **save_options(quality, target_bytes))
         pdf.close()
+        stats['timings']['save'] = time.perf_counter() - started
         
         original_size = os.path.getsize(input_path)
         new_size = os.path.getsize(output_path)
@@ -162,16 +846,26 @@ def compress_pdf(input_path, output_path, quality='medium'):
             new_size = original_size
             reduction = 0
         
-        return {
+        result = {
             'success': True, 
             'output_path': output_path, 
             'filename': os.path.basename(output_path),
             'original_size': original_size,
             'new_size': new_size,
             'reduction': round(reduction, 1),
-            'images_compressed': images_compressed,
-            'images_downscaled': images_downscaled
+            'images_compressed': stats['images_compressed'],
+            'images_downscaled': stats['images_downscaled'],
+            'images_unique': stats['images_unique'],
+            'images_merged': stats['images_merged'],
+            'images_merged_similar': stats['images_merged_similar'],
+            'images_referenced': stats['images_referenced'],
+            'image_classes': stats['image_classes'],
+            'quality_distribution': stats['quality_distribution'],
+            'timings': {phase: round(seconds, 3) for phase, seconds in stats['timings'].items()}
         }
+        if target_bytes:
+            result.update(stats['target'], target_bytes=target_bytes, target_met=new_size <= target_bytes)
+        return result
         
     except Exception as e:
         return {'success': False, 'error': str(e)}
@@ -102,143 +102,150 @@ def hex_to_rgb(hex_color):
         return (r, g, b)
     return (0, 0, 0)
 
-def edit_pdf(input_path, output_path, edits):
+def apply_edits(pdf, edits):
     """
-    Apply edits to a PDF.
+    Apply edits to an open document in place and return it.
     Supports: text, image, signature, whiteout, shape, modify, add, delete
     """
-    try:
-        pdf = fitz.open(input_path)
-        
-        for edit in edits:
-            try:
-                page_num = int(edit.get('page', 1)) - 1
-                if page_num < 0 or page_num >= len(pdf):
-                    continue
+    for edit in edits:
+        try:
+            page_num = int(edit.get('page', 1)) - 1
+            if page_num < 0 or page_num >= len(pdf):
+                continue
+            
+            page = pdf[page_num]
+            edit_type = edit.get('type', 'add')
+            
+            if edit_type == 'text':
+                x = float(edit.get('x', 100))
+                y = float(edit.get('y', 100))
+                content = edit.get('content', '')
+                font_size = float(edit.get('fontSize', 14))
+                color = edit.get('color', '#000000')
                 
-                page = pdf[page_num]
-                edit_type = edit.get('type', 'add')
+                if isinstance(color, str):
+                    color = hex_to_rgb(color)
+                elif isinstance(color, list):
+                    color = tuple(c if c <= 1 else c/255 for c in color)
                 
-                if edit_type == 'text':
-                    x = float(edit.get('x', 100))
-                    y = float(edit.get('y', 100))
-                    content = edit.get('content', '')
-                    font_size = float(edit.get('fontSize', 14))
-                    color = edit.get('color', '#000000')
-                    
-                    if isinstance(color, str):
-                        color = hex_to_rgb(color)
-                    elif isinstance(color, list):
-                        color = tuple(c if c <= 1 else c/255 for c in color)
-                    
-                    if content:
-                        text_point = fitz.Point(x, y + font_size)
-                        if has_hindi(content) and os.path.exists(UNICODE_FONT_PATH):
-                             page.insert_text(text_point, content, fontsize=font_size,
-                                           fontfile=UNICODE_FONT_PATH, color=color)
-                        else:
-                             page.insert_text(text_point, content, fontsize=font_size,
-                                           fontname="helv", color=color)
+                if content:
+                    text_point = fitz.Point(x, y + font_size)
+                    if has_hindi(content) and os.path.exists(UNICODE_FONT_PATH):
+                         page.insert_text(text_point, content, fontsize=font_size,
+                                       fontfile=UNICODE_FONT_PATH, color=color)
+                    else:
+                         page.insert_text(text_point, content, fontsize=font_size,
+                                       fontname="helv", color=color)
+            
+            elif edit_type in ('image', 'signature'):
+                x = float(edit.get('x', 100))
+                y = float(edit.get('y', 100))
+                width = float(edit.get('width', 150))
+                height = float(edit.get('height', 100))
+                data = edit.get('data', '')
                 
-                elif edit_type in ('image', 'signature'):
-                    x = float(edit.get('x', 100))
-                    y = float(edit.get('y', 100))
-                    width = float(edit.get('width', 150))
-                    height = float(edit.get('height', 100))
-                    data = edit.get('data', '')
+                if data and data.startswith('data:'):
+                    base64_data = data.split(',')[1] if ',' in data else data
+                    img_bytes = base64.b64decode(base64_data)
                     
-                    if data and data.startswith('data:'):
-                        base64_data = data.split(',')[1] if ',' in data else data
-                        img_bytes = base64.b64decode(base64_data)
-                        
-                        img_rect = fitz.Rect(x, y, x + width, y + height)
-                        page.insert_image(img_rect, stream=img_bytes)
+                    img_rect = fitz.Rect(x, y, x + width, y + height)
+                    page.insert_image(img_rect, stream=img_bytes)
+            
+            elif edit_type == 'whiteout':
+                x = float(edit.get('x', 0))
+                y = float(edit.get('y', 0))
+                width = float(edit.get('width', 100))
+                height = float(edit.get('height', 20))
                 
-                elif edit_type == 'whiteout':
-                    x = float(edit.get('x', 0))
-                    y = float(edit.get('y', 0))
-                    width = float(edit.get('width', 100))
-                    height = float(edit.get('height', 20))
-                    
-                    rect = fitz.Rect(x, y, x + width, y + height)
-                    page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1))
+                rect = fitz.Rect(x, y, x + width, y + height)
+                page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1))
+            
+            elif edit_type == 'shape':
+                x = float(edit.get('x', 0))
+                y = float(edit.get('y', 0))
+                width = float(edit.get('width', 100))
+                height = float(edit.get('height', 100))
+                shape_type = edit.get('shape', 'rectangle')
+                color = edit.get('color', '#000000')
                 
-                elif edit_type == 'shape':
-                    x = float(edit.get('x', 0))
-                    y = float(edit.get('y', 0))
-                    width = float(edit.get('width', 100))
-                    height = float(edit.get('height', 100))
-                    shape_type = edit.get('shape', 'rectangle')
-                    color = edit.get('color', '#000000')
-                    
-                    if isinstance(color, str):
-                        color = hex_to_rgb(color)
-                    
-                    rect = fitz.Rect(x, y, x + width, y + height)
-                    
-                    if shape_type == 'circle':
-                        center = fitz.Point(x + width/2, y + height/2)
-                        radius = min(width, height) / 2
-                        page.draw_circle(center, radius, color=color, width=2)
-                    else:
-                        page.draw_rect(rect, color=color, width=2)
+                if isinstance(color, str):
+                    color = hex_to_rgb(color)
                 
-                elif edit_type == 'modify':
-                    rect = edit.get('original_rect', [0, 0, 100, 20])
-                    fitz_rect = fitz.Rect(float(rect[0]), float(rect[1]), float(rect[0]) + float(rect[2]), float(rect[1]) + float(rect[3]))
-                    
-                    page.add_redact_annot(fitz_rect, fill=(1, 1, 1))
-                    page.apply_redactions()
-                    
-                    new_text = edit.get('new_text', '')
-                    font_size = float(edit.get('font_size', 12))
-                    font_name = edit.get('font_name', 'helv')
-                    color = edit.get('color', '#000000')
-                    
-                    if isinstance(color, str):
-                        color = hex_to_rgb(color)
-                    elif isinstance(color, list):
-                        color = tuple(c if c <= 1 else c/255 for c in color)
-                    
-                    if new_text:
-                        text_point = fitz.Point(float(rect[0]), float(rect[1]) + font_size)
-                        if has_hindi(new_text) and os.path.exists(UNICODE_FONT_PATH):
-                            page.insert_text(text_point, new_text, fontsize=font_size, 
-                                           fontfile=UNICODE_FONT_PATH, color=color)
-                        else:
-                            page.insert_text(text_point, new_text, fontsize=font_size, 
-                                           fontname=font_name, color=color)
+                rect = fitz.Rect(x, y, x + width, y + height)
                 
-                elif edit_type == 'add':
-                    x = float(edit.get('x', 100))
-                    y = float(edit.get('y', 100))
-                    text = edit.get('text', '')
-                    font_size = float(edit.get('font_size', 12))
-                    color = edit.get('color', '#000000')
-                    
-                    if isinstance(color, str):
-                        color = hex_to_rgb(color)
-                    elif isinstance(color, list):
-                        color = tuple(c if c <= 1 else c/255 for c in color)
-                    
-                    if text:
-                        text_point = fitz.Point(x, y + font_size)
-                        if has_hindi(text) and os.path.exists(UNICODE_FONT_PATH):
-                            page.insert_text(text_point, text, fontsize=font_size,
-                                           fontfile=UNICODE_FONT_PATH, color=color)
-                        else:
-                            page.insert_text(text_point, text, fontsize=font_size,
-                                           fontname="helv", color=color)
+                if shape_type == 'circle':
+                    center = fitz.Point(x + width/2, y + height/2)
+                    radius = min(width, height) / 2
+                    page.draw_circle(center, radius, color=color, width=2)
+                else:
+                    page.draw_rect(rect, color=color, width=2)
+            
+            elif edit_type == 'modify':
+                rect = edit.get('original_rect', [0, 0, 100, 20])
+                fitz_rect = fitz.Rect(float(rect[0]), float(rect[1]), float(rect[0]) + float(rect[2]), float(rect[1]) + float(rect[3]))
+                
+                page.add_redact_annot(fitz_rect, fill=(1, 1, 1))
+                page.apply_redactions()
+                
+                new_text = edit.get('new_text', '')
+                font_size = float(edit.get('font_size', 12))
+                font_name = edit.get('font_name', 'helv')
+                color = edit.get('color', '#000000')
+                
+                if isinstance(color, str):
+                    color = hex_to_rgb(color)
+                elif isinstance(color, list):
+                    color = tuple(c if c <= 1 else c/255 for c in color)
+                
+                if new_text:
+                    text_point = fitz.Point(float(rect[0]), float(rect[1]) + font_size)
+                    if has_hindi(new_text) and os.path.exists(UNICODE_FONT_PATH):
+                        page.insert_text(text_point, new_text, fontsize=font_size, 
+                                       fontfile=UNICODE_FONT_PATH, color=color)
+                    else:
+                        page.insert_text(text_point, new_text, fontsize=font_size, 
+                                       fontname=font_name, color=color)
+            
+            elif edit_type == 'add':
+                x = float(edit.get('x', 100))
+                y = float(edit.get('y', 100))
+                text = edit.get('text', '')
+                font_size = float(edit.get('font_size', 12))
+                color = edit.get('color', '#000000')
+                
+                if isinstance(color, str):
+                    color = hex_to_rgb(color)
+                elif isinstance(color, list):
+                    color = tuple(c if c <= 1 else c/255 for c in color)
                 
-                elif edit_type == 'delete':
-                    rect = edit.get('rect', [0, 0, 100, 20])
-                    fitz_rect = fitz.Rect(float(rect[0]), float(rect[1]), float(rect[0]) + float(rect[2]), float(rect[1]) + float(rect[3]))
-                    page.add_redact_annot(fitz_rect, fill=(1, 1, 1))
-                    page.apply_redactions()
+                if text:
+                    text_point = fitz.Point(x, y + font_size)
+                    if has_hindi(text) and os.path.exists(UNICODE_FONT_PATH):
+                        page.insert_text(text_point, text, fontsize=font_size,
+                                       fontfile=UNICODE_FONT_PATH, color=color)
+                    else:
+                        page.insert_text(text_point, text, fontsize=font_size,
+                                       fontname="helv", color=color)
+            
+            elif edit_type == 'delete':
+                rect = edit.get('rect', [0, 0, 100, 20])
+                fitz_rect = fitz.Rect(float(rect[0]), float(rect[1]), float(rect[0]) + float(rect[2]), float(rect[1]) + float(rect[3]))
+                page.add_redact_annot(fitz_rect, fill=(1, 1, 1))
+                page.apply_redactions()
 
-            except Exception as inner_e:
-                print(f"Error applying edit {edit}: {inner_e}")
-                continue
+        except Exception as inner_e:
+            print(f"Error applying edit {edit}: {inner_e}")
+            continue
+    return pdf
+
+def edit_pdf(input_path, output_path, edits):
+    """
+    Apply edits to a PDF.
+    Supports: text, image, signature, whiteout, shape, modify, add, delete
+    """
+    try:
+        pdf = fitz.open(input_path)
+        apply_edits(pdf, edits)
         
         pdf.save(output_path)
         pdf.close()
@@ -1,21 +1,19 @@
 import fitz
 import os
 
+from tools import sharding
+
+def _page_text(page):
+    return f"--- Page {page.number + 1} ---\n{page.get_text('text')}\n"
+
 def extract_text(input_path, output_folder):
     try:
-        pdf = fitz.open(input_path)
-        text_content = []
-        
-        for page_num in range(len(pdf)):
-            page = pdf[page_num]
-            text = page.get_text("text")
-            text_content.append(f"--- Page {page_num + 1} ---\n{text}\n")
+        text_content = sharding.map_pages(input_path, _page_text)
         
         output_path = os.path.join(output_folder, 'extracted_text.txt')
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write('\n'.join(text_content))
         
-        pdf.close()
         folder_id = os.path.basename(output_folder)
         return {'success': True, 'output_folder': folder_id, 'files': [output_path], 'is_folder': True}
     except Exception as e:
@@ -54,3 +52,8 @@ def extract_images(input_path, output_folder):
         return {'success': True, 'output_folder': folder_id, 'files': output_files, 'is_folder': True}
     except Exception as e:
         return {'success': False, 'error': str(e)}
+
+def extract_content(input_path, output_folder, extract_type='text'):
+    if extract_type == 'text':
+        return extract_text(input_path, output_folder)
+    return extract_images(input_path, output_folder)
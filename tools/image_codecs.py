@@ -0,0 +1,224 @@
+import io
+import zlib
+
+import numpy as np
+from PIL import Image
+
+# Images are sorted into classes that each have an encoding that suits them:
+#
+#   photo      continuous tone colour   -> JPEG
+#   grayscale  continuous tone, no hue  -> grey JPEG
+#   flat       few flat colours, e.g. charts, diagrams, line art
+#                                       -> 8-bit palette (Indexed), Flate
+#   bilevel    black and white, e.g. scanned text
+#                                       -> 1-bit DeviceGray, Flate
+PHOTO = 'photo'
+GRAYSCALE = 'grayscale'
+FLAT = 'flat'
+BILEVEL = 'bilevel'
+IMAGE_CLASSES = (PHOTO, GRAYSCALE, FLAT, BILEVEL)
+
+# Classification looks at a nearest-neighbour sample at most this big, so
+# colours aren't blended and big images cost the same as small ones
+SAMPLE_SIZE = 256
+# 99th percentile of max(R,G,B) - min(R,G,B) below this: the image has no hue
+GRAY_MAX_SATURATION = 16
+# Share of pixels within BILEVEL_MARGIN of black or white for a 1-bit image
+BILEVEL_MIN_EXTREMES = 0.9
+BILEVEL_MARGIN = 48
+# Flat images: this many most common colours cover FLAT_MIN_COVERAGE of the
+# pixels, and the luminance histogram is no busier than FLAT_MAX_ENTROPY bits
+FLAT_COLOURS = 64
+FLAT_MIN_COVERAGE = 0.97
+FLAT_MAX_ENTROPY = 6.0
+
+def _sample(image):
+    sample = image.convert('RGB')
+    if max(sample.size) > SAMPLE_SIZE:
+        sample = sample.copy()
+        sample.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.NEAREST)
+    return np.asarray(sample, dtype=np.int32).reshape(-1, 3)
+
+def features(image):
+    """The measurements classify() decides on, as plain floats."""
+    pixels = _sample(image)
+    saturation = pixels.max(axis=1) - pixels.min(axis=1)
+    luminance = (pixels[:, 0] * 299 + pixels[:, 1] * 587 + pixels[:, 2] * 114) // 1000
+
+    histogram = np.bincount(luminance, minlength=256) / len(luminance)
+    histogram = histogram[histogram > 0]
+    entropy = float(-(histogram * np.log2(histogram)).sum())
+
+    packed = (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+    counts = np.unique(packed, return_counts=True)[1]
+    top = np.sort(counts)[::-1][:FLAT_COLOURS]
+
+    extremes = (luminance < BILEVEL_MARGIN) | (luminance > 255 - BILEVEL_MARGIN)
+    return {
+        'saturation': float(np.percentile(saturation, 99)),
+        'entropy': entropy,
+        'colours': int(len(counts)),
+        'coverage': float(top.sum() / len(packed)),
+        'extremes': float(extremes.mean()),
+    }
+
+def classify(image):
+    """One of IMAGE_CLASSES for a decoded image."""
+    measured = features(image)
+    gray = image.mode in ('1', 'L') or measured['saturation'] < GRAY_MAX_SATURATION
+    if gray and measured['extremes'] >= BILEVEL_MIN_EXTREMES:
+        return BILEVEL
+    if measured['coverage'] >= FLAT_MIN_COVERAGE and measured['entropy'] <= FLAT_MAX_ENTROPY:
+        return FLAT
+    return GRAYSCALE if gray else PHOTO
+
+def _jpeg(image, quality, optimize):
+    output_buffer = io.BytesIO()
+    image.save(
+        output_buffer,
+        format='JPEG',
+        quality=quality,
+        optimize=optimize,
+        progressive=optimize
+    )
+    return output_buffer.getvalue()
+
+def encode(image, image_class, quality, optimize=True):
+    """
+    Encode an L or RGB image the way its class is best stored. Returns the
+    stream and the image dictionary entries that describe it, besides
+    Width and Height. `quality` only applies to the JPEG classes.
+    """
+    if image_class == BILEVEL:
+        bitmap = image.convert('L').convert('1', dither=Image.Dither.NONE)
+        # Pillow packs rows MSB first, padded to a byte, with 1 as white,
+        # which is exactly a 1-bit DeviceGray image
+        return zlib.compress(bitmap.tobytes(), 9), {
+            'Filter': '/FlateDecode', 'ColorSpace': '/DeviceGray', 'BitsPerComponent': '1',
+        }
+    if image_class == FLAT:
+        if image.mode == 'L':
+            return zlib.compress(image.tobytes(), 9), {
+                'Filter': '/FlateDecode', 'ColorSpace': '/DeviceGray', 'BitsPerComponent': '8',
+            }
+        indexed = image.convert('RGB').quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        palette = bytes(indexed.getpalette()[:768])
+        colours = len(palette) // 3
+        return zlib.compress(indexed.tobytes(), 9), {
+            'Filter': '/FlateDecode',
+            'ColorSpace': f'[/Indexed /DeviceRGB {colours - 1} <{palette.hex()}>]',
+            'BitsPerComponent': '8',
+        }
+    if image_class == GRAYSCALE and image.mode != 'L':
+        image = image.convert('L')
+    return _jpeg(image, quality, optimize), {
+        'Filter': '/DCTDecode',
+        'ColorSpace': '/DeviceGray' if image.mode == 'L' else '/DeviceRGB',
+        'BitsPerComponent': '8',
+    }
+
+# Copies of one picture that were re-encoded or rescaled on the way in are
+# found with a difference hash (one bit per neighbouring pixel pair of a
+# 9x8 grey thumbnail) and confirmed on a larger grey thumbnail, which must
+# match closely on average and nowhere differ by much; different pages of
+# text are alike on average but not everywhere.
+HASH_MAX_DISTANCE = 6
+THUMBNAIL_SIZE = 128
+THUMBNAIL_MAX_MEAN_DIFFERENCE = 2
+THUMBNAIL_MAX_PEAK_DIFFERENCE = 32
+
+def fingerprint(image):
+    """(difference hash, grey thumbnail) of an image, for similar()."""
+    grey = image.convert('L')
+    small = np.asarray(grey.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    difference_hash = int(''.join('1' if bit else '0' for bit in bits), 2)
+    thumbnail = np.asarray(grey.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR), dtype=np.int16)
+    return difference_hash, thumbnail
+
+def similar(first, second):
+    """Whether two fingerprints are of the same picture."""
+    if bin(first[0] ^ second[0]).count('1') > HASH_MAX_DISTANCE:
+        return False
+    difference = np.abs(first[1] - second[1])
+    return difference.mean() <= THUMBNAIL_MAX_MEAN_DIFFERENCE and difference.max() <= THUMBNAIL_MAX_PEAK_DIFFERENCE
+
+# Quality searches score each try by SSIM (structural similarity, 1.0 for
+# identical) of the decoded JPEG against the image, over SSIM_WINDOW pixel
+# square windows of grey copies, halved if bigger than SSIM_SIZE.
+SSIM_SIZE = 512
+SSIM_WINDOW = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+# Windows whose variances add up to less than this are blank and not scored
+SSIM_MIN_VARIANCE = 25
+# Searched qualities, in steps; smaller steps barely change the size
+SSIM_QUALITY_RANGE = (10, 95)
+SSIM_QUALITY_STEP = 5
+
+def _ssim_copy(image):
+    grey = image.convert('L')
+    # Halving at most: any further and the averaging hides JPEG's 8x8 blocks
+    if max(grey.size) > SSIM_SIZE:
+        grey = grey.reduce(2)
+    return np.asarray(grey, dtype=np.float64)
+
+def _window_means(pixels):
+    """Means over every SSIM_WINDOW square window, from a summed-area table."""
+    table = np.pad(pixels, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    w = SSIM_WINDOW
+    sums = table[w:, w:] - table[:-w, w:] - table[w:, :-w] + table[:-w, :-w]
+    return sums / (w * w)
+
+def ssim(first, second):
+    """
+    Mean SSIM of two equally sized grey arrays over the windows with some
+    detail in either; blank paper would otherwise outvote the text on it.
+    """
+    if min(first.shape) < SSIM_WINDOW:
+        return 1.0 if np.array_equal(first, second) else 0.0
+    mean_x, mean_y = _window_means(first), _window_means(second)
+    variance_x = _window_means(first * first) - mean_x * mean_x
+    variance_y = _window_means(second * second) - mean_y * mean_y
+    covariance = _window_means(first * second) - mean_x * mean_y
+    score = ((2 * mean_x * mean_y + SSIM_C1) * (2 * covariance + SSIM_C2)) / (
+        (mean_x * mean_x + mean_y * mean_y + SSIM_C1) * (variance_x + variance_y + SSIM_C2)
+    )
+    detail = variance_x + variance_y > SSIM_MIN_VARIANCE
+    return float(score[detail].mean() if detail.any() else score.mean())
+
+def lowest_quality(image, image_class, min_ssim, hint=None):
+    """
+    The lowest JPEG quality, in SSIM_QUALITY_STEP steps, at which the
+    image encoded the way encode() stores its class keeps an SSIM of at
+    least min_ssim; the top of SSIM_QUALITY_RANGE if none does. `hint`, a
+    quality that suited a similar image, is tried first to narrow the search.
+    """
+    if image_class == GRAYSCALE and image.mode != 'L':
+        image = image.convert('L')
+    reference = _ssim_copy(image)
+    scores = {}
+
+    def passes(quality):
+        if quality not in scores:
+            # Baseline encodes decode to the same pixels as optimized ones
+            decoded = Image.open(io.BytesIO(_jpeg(image, quality, False)))
+            scores[quality] = ssim(reference, _ssim_copy(decoded))
+        return scores[quality] >= min_ssim
+
+    low, high = SSIM_QUALITY_RANGE
+    step = SSIM_QUALITY_STEP
+    # Invariant: `high` is taken to pass and `low` to fail, unless low is the bottom
+    fails = low - step
+    if hint is not None and low <= hint < high:
+        if passes(hint):
+            high = hint
+        else:
+            fails = hint
+    while high - fails > step:
+        middle = fails + (high - fails) // step // 2 * step
+        if passes(middle):
+            high = middle
+        else:
+            fails = middle
+    return high
@@ -3,13 +3,71 @@ import os
 import pytesseract
 from PIL import Image
 import io
+import numpy as np
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 
+from tools import sharding, progress, tiling
+
+# Tesseract runs with one thread (OMP_THREAD_LIMIT, see services/jobs.py):
+# pages are read in parallel by the page workers instead
+OCR_ZOOM = 2
+# A page takes Tesseract a second or more, so even two are worth sharing out
+MIN_PARALLEL_PAGES = 2
+# Where an oversized page is cut into pieces for Tesseract: the emptiest row
+# of the lower half of each piece, counting pixels darker than this as ink
+INK_THRESHOLD = 128
+
+def _chunks(page, zoom):
+    """The page in greyscale pieces of about RENDER_PIXEL_BUDGET pixels, cut between lines of text."""
+    pending = None
+    for band in tiling.bands(page, zoom, gray=True):
+        rows = band[:, :, 0]
+        pending = rows if pending is None else np.concatenate([pending, rows])
+        if pending.size < tiling.RENDER_PIXEL_BUDGET:
+            continue
+        half = len(pending) // 2
+        ink = (pending[half:] < INK_THRESHOLD).sum(axis=1)
+        cut = half + int(ink.argmin()) + 1
+        yield pending[:cut]
+        pending = pending[cut:]
+    if pending is not None and len(pending):
+        yield pending
+
+def _page_text(page, zoom, language):
+    if tiling.needs_tiling(page, zoom):
+        return '\n'.join(
+            pytesseract.image_to_string(Image.fromarray(chunk), lang=language)
+            for chunk in _chunks(page, zoom)
+        )
+    mat = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=mat)
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    return pytesseract.image_to_string(img, lang=language)
+
+def _ocr_page(page, zoom, language):
+    try:
+        return _page_text(page, zoom, language)
+    except (pytesseract.TesseractError, pytesseract.TesseractNotFoundError) as e:
+        # pytesseract's exceptions can't be unpickled, so one raised in a page
+        # worker would break the pool rather than fail the job with its message
+        raise RuntimeError(str(e)) from None
+
 def ocr_pdf(input_path, output_path, language='eng'):
     try:
-        pdf = fitz.open(input_path)
+        with fitz.open(input_path) as pdf:
+            total = len(pdf)
+        read = []
+
+        def on_page(page_num, text):
+            read.append(page_num)
+            progress.report(len(read), total)
+
+        texts = sharding.map_pages(
+            input_path, _ocr_page, OCR_ZOOM, language,
+            pages=range(total), min_pages=MIN_PARALLEL_PAGES, on_result=on_page
+        )
         
         output_pdf = SimpleDocTemplate(output_path, pagesize=letter,
                                        rightMargin=72, leftMargin=72,
@@ -26,17 +84,7 @@ def ocr_pdf(input_path, output_path, language='eng'):
         
         story = []
         
-        for page_num in range(len(pdf)):
-            page = pdf[page_num]
-            
-            zoom = 2
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-            
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            
-            text = pytesseract.image_to_string(img, lang=language)
-            
+        for page_num, text in enumerate(texts):
             story.append(Paragraph(f"Page {page_num + 1}", styles['Heading3']))
             story.append(Spacer(1, 12))
             
@@ -45,11 +93,9 @@ def ocr_pdf(input_path, output_path, language='eng'):
                     safe_line = line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
                     story.append(Paragraph(safe_line, text_style))
             
-            if page_num < len(pdf) - 1:
+            if page_num < total - 1:
                 story.append(PageBreak())
         
-        pdf.close()
-        
         if story:
             output_pdf.build(story)
         else:
@@ -1,31 +1,37 @@
 import fitz
 import os
 
+def reorder_pages(pdf, order):
+    """Return a new document with the pages of `pdf` in `order` ('blank' inserts an empty page)."""
+    total_pages = len(pdf)
+    
+    if not order:
+        raise ValueError('No page order specified')
+    
+    new_pdf = fitz.open()
+    
+    for p in order.split(','):
+        p = p.strip()
+        if p == 'blank':
+            page_rect = pdf[0].rect if total_pages > 0 else fitz.Rect(0, 0, 595, 842)
+            new_pdf.new_page(width=page_rect.width, height=page_rect.height)
+        else:
+            try:
+                page_num = int(p) - 1
+                if 0 <= page_num < total_pages:
+                    new_pdf.insert_pdf(pdf, from_page=page_num, to_page=page_num)
+            except ValueError:
+                continue
+    
+    if len(new_pdf) == 0:
+        new_pdf.close()
+        raise ValueError('No valid pages to organize')
+    return new_pdf
+
 def organize_pdf(input_path, output_path, order):
     try:
         pdf = fitz.open(input_path)
-        total_pages = len(pdf)
-        
-        if not order:
-            return {'success': False, 'error': 'No page order specified'}
-        
-        new_pdf = fitz.open()
-        
-        for p in order.split(','):
-            p = p.strip()
-            if p == 'blank':
-                page_rect = pdf[0].rect if total_pages > 0 else fitz.Rect(0, 0, 595, 842)
-                new_pdf.new_page(width=page_rect.width, height=page_rect.height)
-            else:
-                try:
-                    page_num = int(p) - 1
-                    if 0 <= page_num < total_pages:
-                        new_pdf.insert_pdf(pdf, from_page=page_num, to_page=page_num)
-                except ValueError:
-                    continue
-        
-        if len(new_pdf) == 0:
-            return {'success': False, 'error': 'No valid pages to organize'}
+        new_pdf = reorder_pages(pdf, order)
         
         new_pdf.save(output_path)
         new_pdf.close()
@@ -1,41 +1,136 @@
+import math
 import fitz
 import os
+from PIL import Image
 
-def pdf_to_jpg(input_path, output_folder, dpi=150):
+from tools import sharding, progress, tiling
+
+# Output formats: file extension and Pillow encoder. Pages are encoded by
+# Pillow straight from the pixmap's memory; its JPEG encoder is several
+# times faster than MuPDF's and makes smaller files at the same quality.
+FORMATS = {
+    'jpeg': ('jpg', 'JPEG'),
+    'png': ('png', 'PNG'),
+    'webp': ('webp', 'WEBP'),
+}
+DEFAULT_QUALITY = 85
+# zlib level 1: higher levels take half as long again for a few percent
+PNG_COMPRESS_LEVEL = 1
+# WebP effort (0-6): 2 is twice as fast as the default 4 for ~3% more bytes
+WEBP_METHOD = 2
+
+def _encoder_options(image_format, quality, progressive):
+    if image_format == 'jpeg':
+        # Progressive scans are smaller with optimized Huffman tables too
+        return {'quality': quality, 'progressive': progressive, 'optimize': progressive}
+    if image_format == 'webp':
+        return {'quality': quality, 'method': WEBP_METHOD}
+    return {'compress_level': PNG_COMPRESS_LEVEL}
+
+def _page_zoom(page, zoom, max_pixels):
+    if max_pixels:
+        area = page.rect.width * page.rect.height
+        if area * zoom * zoom > max_pixels:
+            return math.sqrt(max_pixels / area)
+    return zoom
+
+def _encode(pix, f, options):
+    # The image is a view of the pixmap's samples rather than a copy, and
+    # must be gone before the pixmap is freed
+    mode = 'L' if pix.n == 1 else 'RGB'
+    image = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, 'raw', mode, pix.stride, 1)
+    image.save(f, FORMATS[options['format']][1], **options['encoder'])
+
+def _encode_tiled(page, zoom, f, options):
+    gray = options['grayscale']
+    width, height = tiling.page_pixels(page, zoom)
+    bands = tiling.bands(page, zoom, gray=gray)
+    if options['format'] == 'png':
+        tiling.write_png(f, width, height, gray, bands)
+    else:
+        # Band by band is always baseline: progressive and optimized JPEGs
+        # need the whole image in the encoder
+        tiling.write_jpeg(f, width, height, gray, bands, options['encoder']['quality'])
+
+def _render_page(page, output_folder, zoom, options):
+    """Write one page; returns its path and, if a format limit made it smaller than asked, its [width, height]."""
+    zoom = requested_zoom = _page_zoom(page, zoom, options['max_pixels'])
+    tiled = tiling.needs_tiling(page, zoom)
+    if tiled and options['format'] == 'webp':
+        # WebP can't be encoded a band at a time, nor be over 16383 pixels a side
+        zoom, tiled = _page_zoom(page, zoom, tiling.RENDER_PIXEL_BUDGET), False
+    elif tiled and options['format'] == 'jpeg':
+        # JPEG sides are 16-bit
+        zoom = min(zoom, tiling.JPEG_MAX_SIDE / max(page.rect.width, page.rect.height))
+    output_path = os.path.join(output_folder, options['filename'].format(page.number + 1))
+    # Pages can be zipped while the rest render, so one only appears once written
+    with open(output_path + '.part', 'wb') as f:
+        if tiled:
+            _encode_tiled(page, zoom, f, options)
+        else:
+            pix = page.get_pixmap(
+                matrix=fitz.Matrix(zoom, zoom),
+                colorspace=fitz.csGRAY if options['grayscale'] else fitz.csRGB
+            )
+            _encode(pix, f, options)
+    os.replace(output_path + '.part', output_path)
+    return output_path, list(tiling.page_pixels(page, zoom)) if zoom < requested_zoom else None
+
+def pdf_to_jpg(input_path, output_folder, dpi=150, image_format='jpeg', quality=DEFAULT_QUALITY,
+               progressive=0, grayscale=0, max_pixels=0):
     try:
-        pdf = fitz.open(input_path)
-        output_files = []
-        
-        zoom = dpi / 72
-        matrix = fitz.Matrix(zoom, zoom)
-        
-        for page_num in range(len(pdf)):
-            page = pdf[page_num]
-            pix = page.get_pixmap(matrix=matrix)
-            output_path = os.path.join(output_folder, f'page_{page_num + 1}.jpg')
-            pix.save(output_path)
-            output_files.append(output_path)
-        
-        pdf.close()
+        if image_format not in FORMATS:
+            return {'success': False, 'error': f'Unsupported image format: {image_format}'}
+        quality = max(1, min(100, quality))
+        options = {
+            'format': image_format,
+            'filename': 'page_{}.' + FORMATS[image_format][0],
+            'encoder': _encoder_options(image_format, quality, bool(progressive)),
+            'grayscale': bool(grayscale),
+            'max_pixels': max(0, max_pixels),
+        }
+
+        with fitz.open(input_path) as pdf:
+            total = len(pdf)
         folder_id = os.path.basename(output_folder)
-        
+        rendered = []
+
+        def on_page(page_num, page_result):
+            rendered.append(page_num)
+            progress.report(len(rendered), total, output_folder=folder_id, filename=options['filename'])
+
+        # Rendering is CPU bound, so long documents are spread over processes
+        page_results = sharding.map_pages(
+            input_path, _render_page, output_folder, dpi / 72, options,
+            pages=range(total), min_pages=4, on_result=on_page
+        )
+        output_files = [output_path for output_path, reduced in page_results]
+        # Pages the format couldn't hold at the asked-for DPI, so the UI can say so
+        downscaled = [
+            {'page': page_num + 1, 'width': reduced[0], 'height': reduced[1]}
+            for page_num, (output_path, reduced) in enumerate(page_results) if reduced
+        ]
+
         if len(output_files) == 1:
             filename = os.path.basename(output_files[0])
-            return {
-                'success': True, 
+            result = {
+                'success': True,
                 'output_path': output_files[0],
                 'filename': filename,
-                'files': output_files, 
+                'files': output_files,
                 'is_folder': False,
                 'file_count': 1
             }
         else:
-            return {
-                'success': True, 
-                'output_folder': folder_id, 
-                'files': output_files, 
+            result = {
+                'success': True,
+                'output_folder': folder_id,
+                'files': output_files,
                 'is_folder': True,
                 'file_count': len(output_files)
             }
+        if downscaled:
+            result['downscaled'] = downscaled
+        return result
     except Exception as e:
         return {'success': False, 'error': str(e)}
@@ -3,19 +3,34 @@ import os
 from pptx import Presentation
 from pptx.util import Inches, Pt
 
+from tools import sharding
+
+def _page_content(page):
+    """Text blocks and (image bytes, placements) of a page."""
+    images = []
+    for img in page.get_images():
+        xref = img[0]
+        try:
+            base_image = page.parent.extract_image(xref)
+            # This finds usages of the image on the current page
+            rects = [tuple(rect) for rect in page.get_image_rects(xref)]
+            images.append((base_image["image"], rects))
+        except Exception:
+            continue
+    return page.get_text("blocks"), images
+
 def pdf_to_powerpoint(input_path, output_path):
     try:
-        doc = fitz.open(input_path)
+        pages = sharding.map_pages(input_path, _page_content)
         prs = Presentation()
         
         # Define a blank slide layout (usually index 6 in default template)
         blank_slide_layout = prs.slide_layouts[6]
         
-        for page_num, page in enumerate(doc):
+        for blocks, images in pages:
             slide = prs.slides.add_slide(blank_slide_layout)
             
             # Extract text blocks
-            blocks = page.get_text("blocks")
             for block in blocks:
                 # fitz block: (x0, y0, x1, y1, "text", block_no, block_type)
                 x0, y0, x1, y1, text, _, _ = block
@@ -34,18 +49,10 @@ def pdf_to_powerpoint(input_path, output_path):
                 tf.text = text.strip()
             
             # Extract images
-            image_list = page.get_images()
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
+            for image_bytes, rects in images:
                 try:
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    ext = base_image["ext"]
-                    
-                    # Get image position on page
-                    # This finds usages of the image on the current page
-                    rects = page.get_image_rects(xref)
                     for rect in rects:
+                        rect = fitz.Rect(rect)
                         left = Inches(rect.x0 / 72)
                         top = Inches(rect.y0 / 72)
                         width = Inches(rect.width / 72)
@@ -59,7 +66,6 @@ def pdf_to_powerpoint(input_path, output_path):
                     continue
 
         prs.save(output_path)
-        doc.close()
         
         return {'success': True, 'output_path': output_path, 'filename': os.path.basename(output_path)}
     except Exception as e:
@@ -1,28 +1,28 @@
-import fitz
 import os
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
+from tools import sharding
+
+def _page_text(page):
+    return page.get_text("text")
+
 def pdf_to_word(input_path, output_path):
     try:
-        pdf = fitz.open(input_path)
+        page_texts = sharding.map_pages(input_path, _page_text)
         doc = Document()
         
-        for page_num in range(len(pdf)):
-            page = pdf[page_num]
-            text = page.get_text("text")
-            
+        for page_num, text in enumerate(page_texts):
             if text.strip():
                 for line in text.split('\n'):
                     if line.strip():
                         para = doc.add_paragraph(line)
             
-            if page_num < len(pdf) - 1:
+            if page_num < len(page_texts) - 1:
                 doc.add_page_break()
         
         doc.save(output_path)
-        pdf.close()
         
         return {'success': True, 'output_path': output_path, 'filename': os.path.basename(output_path)}
     except Exception as e:
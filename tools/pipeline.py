@@ -0,0 +1,78 @@
+import fitz
+import os
+
+from tools import registry
+
+# Options of Document.save where a larger value / True is the stronger choice
+MAX_SAVE_OPTIONS = ('garbage',)
+ANY_SAVE_OPTIONS = ('deflate', 'deflate_images', 'deflate_fonts', 'clean', 'linear')
+
+def _merge_save_options(merged, options):
+    for name, value in options.items():
+        if name in MAX_SAVE_OPTIONS:
+            merged[name] = max(merged.get(name, 0), value)
+        elif name in ANY_SAVE_OPTIONS:
+            merged[name] = merged.get(name, False) or value
+        elif name != 'pretty':
+            # Encryption settings: the last step that asks for them wins
+            merged[name] = value
+    return merged
+
+def _plan(steps):
+    """Validate the steps and resolve each to (tool, step function, save_options function, args)."""
+    if not isinstance(steps, list) or not steps:
+        raise ValueError('No pipeline steps specified')
+    plan = []
+    for step in steps:
+        tool_name = step.get('tool') if isinstance(step, dict) else None
+        spec = registry.get_tool(tool_name) if tool_name else None
+        if spec is None or not (spec.get('step') or spec.get('save_options')):
+            raise ValueError(f'Unsupported pipeline step: {tool_name}')
+        plan.append((
+            tool_name,
+            registry.load_attribute(tool_name, 'step'),
+            registry.load_attribute(tool_name, 'save_options'),
+            registry.parse_params(tool_name, step),
+        ))
+    return plan
+
+def run_pipeline(input_path, output_path, steps):
+    """
+    Apply several tools to one document: open it once, run each step on the
+    in-memory document in order, then save once. Page numbers in a step
+    refer to the document as the previous steps left it.
+    """
+    try:
+        plan = _plan(steps)
+        pdf = fitz.open(input_path)
+
+        save_options = {}
+        for tool_name, step, options, args in plan:
+            if step:
+                result = step(pdf, *args)
+                if result is not pdf:
+                    pdf.close()
+                    pdf = result
+            if options:
+                _merge_save_options(save_options, options(*args))
+
+        pdf.save(output_path, **save_options)
+        page_count = len(pdf)
+        pdf.close()
+
+        original_size = os.path.getsize(input_path)
+        new_size = os.path.getsize(output_path)
+        reduction = ((original_size - new_size) / original_size) * 100 if original_size > 0 else 0
+
+        return {
+            'success': True,
+            'output_path': output_path,
+            'filename': os.path.basename(output_path),
+            'steps': [tool_name for tool_name, step, options, args in plan],
+            'pages': page_count,
+            'original_size': original_size,
+            'new_size': new_size,
+            'reduction': round(reduction, 1)
+        }
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
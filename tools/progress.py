@@ -0,0 +1,13 @@
+# Long-running tools say how far they have got with report(). The job runner
+# installs a reporter that records it where /jobs/<id> can see it; outside a
+# job nothing is installed and reports go nowhere.
+_reporter = None
+
+def set_reporter(reporter):
+    """Send reports to `reporter(done, total, details)`, or nowhere if None."""
+    global _reporter
+    _reporter = reporter
+
+def report(done, total, **details):
+    if _reporter is not None:
+        _reporter(done, total, details)
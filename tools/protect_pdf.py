@@ -1,6 +1,17 @@
 import fitz
 import os
 
+def save_options(password):
+    """Options for Document.save that encrypt the output with `password`."""
+    if not password:
+        raise ValueError('Password is required')
+    return {
+        'encryption': fitz.PDF_ENCRYPT_AES_256,
+        'user_pw': password,
+        'owner_pw': password,
+        'permissions': fitz.PDF_PERM_ACCESSIBILITY,
+    }
+
 def protect_pdf(input_path, output_path, password):
     try:
         if not password:
@@ -8,13 +19,7 @@ def protect_pdf(input_path, output_path, password):
         
         pdf = fitz.open(input_path)
         
-        perm = fitz.PDF_PERM_ACCESSIBILITY
-        
-        pdf.save(output_path, 
-                encryption=fitz.PDF_ENCRYPT_AES_256,
-                user_pw=password,
-                owner_pw=password,
-                permissions=perm)
+        pdf.save(output_path, **save_options(password))
         pdf.close()
         
         return {'success': True, 'output_path': output_path, 'filename': os.path.basename(output_path)}
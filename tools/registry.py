@@ -0,0 +1,256 @@
+import json
+import importlib
+
+# Declarative description of every tool served by /process/<tool_name>.
+#
+#   module/function  implementation, imported the first time the tool runs
+#   inputs           accepted input kind(s); 'multiple' tools take a list
+#   output           'file' (written to a new file named after output_name)
+#                    or 'folder' (written into a fresh output folder)
+#   params           (form field, type, default) in the order the function
+#                    takes them after input and output; a tuple of fields
+#                    under a name is passed as one dict (e.g. crop margins)
+#   cost             'light' (default), 'medium' or 'heavy'; each class has
+#                    its own concurrency limit (see services/admission.py)
+#   step             optional in-memory form of the tool for /pipeline:
+#                    step(doc, *params) changes an open fitz document and
+#                    returns the document to continue with
+#   save_options     optional save_options(*params) -> Document.save kwargs
+#                    the pipeline merges into its single final save
+#
+# Keeping the heavy libraries (PyMuPDF, reportlab, openpyxl, python-docx,
+# python-pptx, pytesseract, Pillow) out of the web worker's import path
+# means they are only loaded by the processes that actually run tools.
+TOOLS = {
+    'merge': {
+        'module': 'tools.merge_pdf', 'function': 'merge_pdfs',
+        'inputs': ['pdf'], 'multiple': True,
+        'output': 'file', 'output_name': 'merged.pdf',
+        'params': [],
+    },
+    'split': {
+        'module': 'tools.split_pdf', 'function': 'split_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'folder',
+        'params': [('split_type', 'str', 'all'), ('pages', 'str', '')],
+    },
+    'compress': {
+        'module': 'tools.compress_pdf', 'function': 'compress_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'heavy',
+        'output': 'file', 'output_name': 'compressed.pdf',
+        'step': 'compress_pages', 'save_options': 'save_options',
+        'params': [
+            ('quality', 'str', 'medium'), ('target_bytes', 'int', 0), ('merge_similar', 'int', 0),
+            ('min_ssim', 'float', 0.0),
+        ],
+    },
+    'rotate': {
+        'module': 'tools.rotate_pdf', 'function': 'rotate_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'rotated.pdf',
+        'step': 'rotate_pages',
+        'params': [('angle', 'int', 90), ('pages', 'str', 'all'), ('rotations', 'json', None)],
+    },
+    'crop': {
+        'module': 'tools.crop_pdf', 'function': 'crop_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'cropped.pdf',
+        'step': 'crop_pages',
+        'params': [
+            ('margins', (('top', 'float', 0), ('bottom', 'float', 0), ('left', 'float', 0), ('right', 'float', 0))),
+            ('pages', 'str', 'all'),
+            ('current_page', 'int', 1),
+        ],
+    },
+    'remove-pages': {
+        'module': 'tools.remove_pages', 'function': 'remove_pages',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'pages_removed.pdf',
+        'step': 'delete_pages',
+        'params': [('pages', 'str', '')],
+    },
+    'organize': {
+        'module': 'tools.organize_pdf', 'function': 'organize_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'organized.pdf',
+        'step': 'reorder_pages',
+        'params': [('order', 'str', '')],
+    },
+    'pdf-to-jpg': {
+        'module': 'tools.pdf_to_jpg', 'function': 'pdf_to_jpg',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'medium',
+        # A single page comes back as a plain file rather than a folder,
+        # with the extension of the chosen format
+        'output': 'folder', 'single_output_name': 'converted.jpg',
+        'params': [
+            ('dpi', 'int', 150), ('format', 'str', 'jpeg'), ('quality', 'int', 85),
+            ('progressive', 'int', 0), ('grayscale', 'int', 0), ('max_pixels', 'int', 0),
+        ],
+    },
+    'jpg-to-pdf': {
+        'module': 'tools.jpg_to_pdf', 'function': 'jpg_to_pdf',
+        'inputs': ['jpg', 'jpeg', 'png'], 'multiple': True,
+        'cost': 'medium',
+        'output': 'file', 'output_name': 'images.pdf',
+        'params': [],
+    },
+    'pdf-to-word': {
+        'module': 'tools.pdf_to_word', 'function': 'pdf_to_word',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'medium',
+        'output': 'file', 'output_name': 'document.docx',
+        'params': [],
+    },
+    'word-to-pdf': {
+        'module': 'tools.word_to_pdf', 'function': 'word_to_pdf',
+        'inputs': ['docx'], 'multiple': False,
+        'cost': 'medium',
+        'output': 'file', 'output_name': 'document.pdf',
+        'params': [],
+    },
+    'excel-to-pdf': {
+        'module': 'tools.excel_to_pdf', 'function': 'excel_to_pdf',
+        'inputs': ['xlsx'], 'multiple': False,
+        'cost': 'medium',
+        'output': 'file', 'output_name': 'spreadsheet.pdf',
+        'params': [],
+    },
+    'pptx-to-pdf': {
+        'module': 'tools.pptx_to_pdf', 'function': 'pptx_to_pdf',
+        'inputs': ['pptx'], 'multiple': False,
+        'cost': 'medium',
+        'output': 'file', 'output_name': 'presentation.pdf',
+        'params': [],
+    },
+    'extract': {
+        'module': 'tools.extract_pdf', 'function': 'extract_content',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'medium',
+        'output': 'folder',
+        'params': [('extract_type', 'str', 'text')],
+    },
+    'ocr': {
+        'module': 'tools.ocr_pdf', 'function': 'ocr_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'heavy',
+        'output': 'file', 'output_name': 'ocr_result.pdf',
+        'params': [('language', 'str', 'eng')],
+    },
+    'unlock': {
+        'module': 'tools.unlock_pdf', 'function': 'unlock_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'unlocked.pdf',
+        'params': [('password', 'str', '')],
+    },
+    'protect': {
+        'module': 'tools.protect_pdf', 'function': 'protect_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'protected.pdf',
+        'save_options': 'save_options',
+        'params': [('password', 'str', '')],
+    },
+    'sign': {
+        'module': 'tools.sign_pdf', 'function': 'sign_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'medium',
+        'output': 'file', 'output_name': 'signed.pdf',
+        'params': [
+            ('signature', 'str', ''),
+            ('position', (('x', 'float', 100), ('y', 'float', 100), ('width', 'float', 200),
+                          ('height', 'float', 80), ('page', 'int', 1))),
+        ],
+    },
+    'watermark': {
+        'module': 'tools.watermark_pdf', 'function': 'watermark_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'watermarked.pdf',
+        'step': 'watermark_pages',
+        'params': [('text', 'str', 'WATERMARK'), ('opacity', 'float', 0.3)],
+    },
+    'edit': {
+        'module': 'tools.edit_pdf', 'function': 'edit_pdf',
+        'inputs': ['pdf'], 'multiple': False,
+        'output': 'file', 'output_name': 'edited.pdf',
+        'step': 'apply_edits',
+        'params': [('edits', 'json', [])],
+    },
+    'pdf-to-excel': {
+        'module': 'tools.pdf_to_excel', 'function': 'pdf_to_excel',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'heavy',
+        'output': 'file', 'output_name': 'converted.xlsx',
+        'params': [],
+    },
+    'pdf-to-powerpoint': {
+        'module': 'tools.pdf_to_powerpoint', 'function': 'pdf_to_powerpoint',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'medium',
+        'output': 'file', 'output_name': 'converted.pptx',
+        'params': [],
+    },
+    'pipeline': {
+        'module': 'tools.pipeline', 'function': 'run_pipeline',
+        'inputs': ['pdf'], 'multiple': False,
+        'cost': 'heavy',
+        'output': 'file', 'output_name': 'processed.pdf',
+        # [{"tool": "rotate", "angle": 90}, {"tool": "compress", "quality": "medium"}, ...]
+        'params': [('steps', 'json', [])],
+    },
+}
+
+_loaded = {}
+
+def get_tool(tool_name):
+    return TOOLS.get(tool_name)
+
+def load_function(tool_name):
+    """Import the tool's module on first use and return its entry point."""
+    func = _loaded.get(tool_name)
+    if func is None:
+        spec = TOOLS[tool_name]
+        func = getattr(importlib.import_module(spec['module']), spec['function'])
+        _loaded[tool_name] = func
+    return func
+
+def load_attribute(tool_name, key):
+    """The tool module's function named by spec[key] (e.g. 'step'), or None."""
+    spec = TOOLS[tool_name]
+    if not spec.get(key):
+        return None
+    return getattr(importlib.import_module(spec['module']), spec[key])
+
+def load_all():
+    for tool_name in TOOLS:
+        load_function(tool_name)
+
+def _convert(value, kind, default):
+    if value is None:
+        return default
+    if kind == 'int':
+        return int(value)
+    if kind == 'float':
+        return float(value)
+    if kind == 'json':
+        if not isinstance(value, str):
+            return value
+        if value == '':
+            return default
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return str(value)
+
+def parse_params(tool_name, form):
+    """Convert submitted form fields into the tool's positional arguments."""
+    args = []
+    for param in TOOLS[tool_name]['params']:
+        if len(param) == 2:
+            name, fields = param
+            args.append({field: _convert(form.get(field), kind, default) for field, kind, default in fields})
+        else:
+            name, kind, default = param
+            args.append(_convert(form.get(name), kind, default))
+    return args
@@ -1,34 +1,39 @@
 import fitz
 import os
 
+def rotate_pages(pdf, angle=90, pages='all', rotations=None):
+    """Rotate pages of an open document in place and return it."""
+    total_pages = len(pdf)
+    
+    if rotations:
+        for page_str, rotation_angle in rotations.items():
+            page_num = int(page_str) - 1
+            if 0 <= page_num < total_pages:
+                page = pdf[page_num]
+                page.set_rotation(page.rotation + rotation_angle)
+    else:
+        if pages == 'all':
+            page_list = list(range(total_pages))
+        else:
+            page_list = []
+            for p in pages.split(','):
+                p = p.strip()
+                if '-' in p:
+                    start, end = map(int, p.split('-'))
+                    page_list.extend(range(start-1, end))
+                else:
+                    page_list.append(int(p) - 1)
+        
+        for page_num in page_list:
+            if 0 <= page_num < total_pages:
+                page = pdf[page_num]
+                page.set_rotation(page.rotation + angle)
+    return pdf
+
 def rotate_pdf(input_path, output_path, angle=90, pages='all', rotations=None):
     try:
         pdf = fitz.open(input_path)
-        total_pages = len(pdf)
-        
-        if rotations:
-            for page_str, rotation_angle in rotations.items():
-                page_num = int(page_str) - 1
-                if 0 <= page_num < total_pages:
-                    page = pdf[page_num]
-                    page.set_rotation(page.rotation + rotation_angle)
-        else:
-            if pages == 'all':
-                page_list = list(range(total_pages))
-            else:
-                page_list = []
-                for p in pages.split(','):
-                    p = p.strip()
-                    if '-' in p:
-                        start, end = map(int, p.split('-'))
-                        page_list.extend(range(start-1, end))
-                    else:
-                        page_list.append(int(p) - 1)
-            
-            for page_num in page_list:
-                if 0 <= page_num < total_pages:
-                    page = pdf[page_num]
-                    page.set_rotation(page.rotation + angle)
+        rotate_pages(pdf, angle, pages, rotations)
         
         pdf.save(output_path)
         pdf.close()
@@ -0,0 +1,184 @@
+import os
+import logging
+import multiprocessing
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+
+logger = logging.getLogger(__name__)
+
+# Per-page tools hand a page function to map_pages, which splits the page
+# range into contiguous shards and runs them in worker processes. Each worker
+# opens the document itself, so only file paths and page results cross the
+# process boundary. Short documents stay in-process: starting workers costs
+# more than it saves.
+#
+#   PAGE_WORKERS=4        processes per tool run (1 disables sharding); a job
+#                         keeps no more than its share of the cores busy, and
+#                         services/jobs.py shuts them down once it finishes
+#   MIN_PARALLEL_PAGES=16 documents shorter than this run serially
+def available_cpus():
+    """The cores this process may run on; under a container's cpuset or taskset, fewer than the machine has."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+PAGE_WORKERS = max(1, int(os.environ.get('PAGE_WORKERS', min(4, available_cpus()))))
+MIN_PARALLEL_PAGES = max(1, int(os.environ.get('MIN_PARALLEL_PAGES', 16)))
+# More shards than workers so one slow stretch of pages doesn't hold up the rest
+SHARDS_PER_WORKER = 4
+# Callers that follow pages as they finish get shards no longer than this
+REPORTED_SHARD_PAGES = 4
+
+_pool = None
+# Cores the job being run may use (set by services/jobs.py from how many jobs
+# are running at once), or None outside a job
+_job_cores = None
+
+def set_job_cores(cores):
+    """Keep at most `cores` workers busy for the current job, or up to PAGE_WORKERS if None."""
+    global _job_cores
+    _job_cores = cores
+
+def workers():
+    """How many processes a map_pages or map_items call may keep busy."""
+    return min(PAGE_WORKERS, _job_cores or PAGE_WORKERS)
+
+def shutdown_pool(wait=True):
+    """Stop the page workers, if any; the next parallel call starts new ones."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PAGE_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        # A job worker process exits through multiprocessing, which joins its
+        # children without running the executor's own atexit hook. This must
+        # run before the finalizers that close the pool's queues (priority 10).
+        multiprocessing.util.Finalize(None, shutdown_pool, exitpriority=20)
+    return _pool
+
+def _run_shard(input_path, page_numbers, func, args, on_result=None):
+    pdf = fitz.open(input_path)
+    try:
+        results = []
+        for page_num in page_numbers:
+            results.append(func(pdf[page_num], *args))
+            if on_result:
+                on_result(page_num, results[-1])
+        return results
+    finally:
+        pdf.close()
+
+def _shards(page_numbers, count):
+    size = -(-len(page_numbers) // count)
+    return [page_numbers[i:i + size] for i in range(0, len(page_numbers), size)]
+
+def _parallel(count, minimum):
+    if workers() < 2 or count < (minimum or MIN_PARALLEL_PAGES):
+        return False
+    # Daemonic processes (e.g. multiprocessing.Pool workers) can't start children
+    return not multiprocessing.current_process().daemon
+
+def _run_bounded(calls, limit):
+    """
+    Run `calls`, (function, args) pairs, in the pool with at most `limit` at
+    a time and yield (index, result) as each finishes.
+    """
+    pool = _get_pool()
+    queued = iter(enumerate(calls))
+    running = {}
+
+    def submit_next():
+        call = next(queued, None)
+        if call is not None:
+            index, (function, args) = call
+            running[pool.submit(function, *args)] = index
+
+    try:
+        for _ in range(limit):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                submit_next()
+                yield index, future.result()
+    finally:
+        # Stop calls that haven't started if an earlier one failed
+        for future in running:
+            future.cancel()
+
+def map_pages(input_path, func, *args, pages=None, min_pages=None, on_result=None):
+    """
+    Call `func(page, *args)` for each page of the document and return the
+    results in page order. `pages` is a list of 0-based page numbers
+    (default: all). `func` must be a module-level function and its
+    arguments and results picklable, as it may run in another process.
+    `on_result(page_num, result)` is called in this process as pages
+    finish, in the order they finish.
+    """
+    if pages is None:
+        pdf = fitz.open(input_path)
+        pages = list(range(len(pdf)))
+        pdf.close()
+    else:
+        pages = list(pages)
+
+    if not _parallel(len(pages), min_pages):
+        return _run_shard(input_path, pages, func, args, on_result)
+
+    limit = workers()
+    count = limit * SHARDS_PER_WORKER
+    if on_result:
+        # A finished shard is reported all at once, so keep them short
+        count = max(count, -(-len(pages) // REPORTED_SHARD_PAGES))
+    shards = _shards(pages, count)
+    results = [None] * len(shards)
+    try:
+        calls = [(_run_shard, (input_path, shard, func, args)) for shard in shards]
+        for index, shard_results in _run_bounded(calls, limit):
+            results[index] = shard_results
+            if on_result:
+                for page_num, result in zip(shards[index], shard_results):
+                    on_result(page_num, result)
+        return [result for shard_results in results for result in shard_results]
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        logger.error(f"Page worker pool broke while processing {os.path.basename(input_path)}")
+        shutdown_pool(wait=False)
+        raise
+
+def _call_chunk(func, args, chunk):
+    return [func(item, *args) for item in chunk]
+
+def map_items(func, items, *args, min_items=None):
+    """
+    Call `func(item, *args)` for each item in the worker pool and return the
+    results in order; for work that isn't tied to a page, such as encoding
+    images already read from a document. Same pickling rules as map_pages.
+    """
+    items = list(items)
+    if not _parallel(len(items), min_items):
+        return [func(item, *args) for item in items]
+
+    limit = workers()
+    size = max(1, -(-len(items) // (limit * SHARDS_PER_WORKER)))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    results = [None] * len(chunks)
+    try:
+        for index, chunk_results in _run_bounded([(_call_chunk, (func, args, chunk)) for chunk in chunks], limit):
+            results[index] = chunk_results
+        return [result for chunk_results in results for result in chunk_results]
+    except BrokenProcessPool:
+        logger.error("Page worker pool broke while processing items")
+        shutdown_pool(wait=False)
+        raise
@@ -0,0 +1,134 @@
+import io
+import os
+import zlib
+import struct
+
+import fitz
+import numpy as np
+from PIL import Image
+
+# A page whose pixmap would hold more than RENDER_PIXEL_BUDGET pixels is
+# rendered as horizontal bands of at most that many, one at a time, and
+# passed on band by band, so an A0 drawing or a poster at 300 dpi never has
+# its whole pixmap in memory. Below the budget pages render in one go.
+#
+#   RENDER_PIXEL_BUDGET=16777216   pixels per band (16 Mpx: 48 MB of RGB)
+RENDER_PIXEL_BUDGET = max(1 << 20, int(os.environ.get('RENDER_PIXEL_BUDGET', 16 << 20)))
+PNG_COMPRESS_LEVEL = 1
+
+def page_pixels(page, zoom):
+    """(width, height) of the page's pixmap at `zoom`."""
+    irect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    return irect.width, irect.height
+
+def needs_tiling(page, zoom, budget=None):
+    width, height = page_pixels(page, zoom)
+    return width * height > (budget or RENDER_PIXEL_BUDGET)
+
+def bands(page, zoom, gray=False, budget=None):
+    """
+    Yield the page rendered at `zoom` as uint8 arrays of whole rows (rows,
+    width, channels), top to bottom, each at most `budget` pixels.
+    """
+    width, height = page_pixels(page, zoom)
+    rows = max(1, (budget or RENDER_PIXEL_BUDGET) // width)
+    matrix = fitz.Matrix(zoom, zoom)
+    rect = page.rect
+    top = (rect * matrix).irect.y0
+    colorspace = fitz.csGRAY if gray else fitz.csRGB
+    done = 0
+    while done < height:
+        clip = fitz.Rect(rect.x0, rect.y0 + done / zoom, rect.x1, rect.y0 + min(done + rows, height) / zoom)
+        pix = page.get_pixmap(matrix=matrix, clip=clip, colorspace=colorspace)
+        band = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        # Clip edges are rounded outwards, so a band can repeat the row above it
+        skip = max(0, done - (pix.y - top))
+        band = band[skip:skip + height - done, :width]
+        del pix
+        if not len(band):
+            return
+        yield band
+        done += len(band)
+
+def write_png(f, width, height, gray, row_bands):
+    """Write the rows of `row_bands` to `f` as a PNG, one band at a time."""
+    def chunk(kind, data):
+        f.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+    f.write(b'\x89PNG\r\n\x1a\n')
+    chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0 if gray else 2, 0, 0, 0))
+    compressor = zlib.compressobj(PNG_COMPRESS_LEVEL)
+    previous = np.zeros(width * (1 if gray else 3), dtype=np.uint8)
+    for band in row_bands:
+        rows = band.reshape(len(band), -1)
+        # The Up filter (each row less the one above) turns the plain
+        # stretches of a rendered page into runs of zeros
+        filtered = rows - np.vstack([previous[None], rows[:-1]])
+        data = np.hstack([np.full((len(rows), 1), 2, dtype=np.uint8), filtered])
+        compressed = compressor.compress(data.tobytes())
+        if compressed:
+            chunk(b'IDAT', compressed)
+        previous = rows[-1]
+    chunk(b'IDAT', compressor.flush())
+    chunk(b'IEND', b'')
+
+# JPEGs are written a band at a time by encoding each band on its own and
+# joining them with restart markers. A decoder resets at each marker just as
+# each band's encoder started afresh, so with the same tables (a fixed
+# quality and the standard Huffman tables) and bands a whole number of MCUs
+# high (16 rows with 4:2:0 chroma, 8 for grey) the result is one valid JPEG.
+# The restart interval, in MCUs, has to fit in 16 bits.
+MAX_RESTART_INTERVAL = 65535
+JPEG_MAX_SIDE = 65535
+
+def _segments(row_bands, rows):
+    """Regroup `row_bands` into arrays of exactly `rows` rows (the last may be shorter)."""
+    pending, count = [], 0
+    for band in row_bands:
+        pending.append(band)
+        count += len(band)
+        while count >= rows:
+            joined = np.concatenate(pending) if len(pending) > 1 else pending[0]
+            yield joined[:rows]
+            pending = [joined[rows:]] if count > rows else []
+            count -= rows
+    if count:
+        yield np.concatenate(pending) if len(pending) > 1 else pending[0]
+
+def _markers(data):
+    """Offsets of the SOF0 and SOS segments of a baseline JPEG, and where its scan data starts."""
+    offsets = {}
+    position = 2
+    while True:
+        marker = data[position + 1]
+        length = struct.unpack('>H', data[position + 2:position + 4])[0]
+        offsets[marker] = position
+        if marker == 0xDA:
+            return offsets[0xC0], position, position + 2 + length
+        position += 2 + length
+
+def write_jpeg(f, width, height, gray, row_bands, quality, budget=None):
+    """Write the rows of `row_bands` to `f` as a baseline JPEG, one band at a time."""
+    mcu = 8 if gray else 16
+    mcus_per_row = -(-width // mcu)
+    mcu_rows = max(1, min(MAX_RESTART_INTERVAL // mcus_per_row, (budget or RENDER_PIXEL_BUDGET) // width // mcu))
+    rows = mcu_rows * mcu
+    for index, segment in enumerate(_segments(row_bands, rows)):
+        encoded = io.BytesIO()
+        if gray:
+            Image.fromarray(segment[:, :, 0]).save(encoded, 'JPEG', quality=quality)
+        else:
+            Image.fromarray(segment).save(encoded, 'JPEG', quality=quality, subsampling=2)
+        data = encoded.getvalue()
+        sof, sos, scan = _markers(data)
+        if index == 0:
+            header = bytearray(data[:sos])
+            header[sof + 5:sof + 7] = struct.pack('>H', height)
+            f.write(header)
+            f.write(b'\xff\xdd' + struct.pack('>HH', 4, mcu_rows * mcus_per_row))
+            f.write(data[sos:scan])
+        else:
+            f.write(bytes([0xFF, 0xD0 + (index - 1) % 8]))
+        # Everything up to the band's EOI
+        f.write(data[scan:-2])
+    f.write(b'\xff\xd9')